@@ -0,0 +1,326 @@
+"""Barras intradiarias OHLCV/VWAP (1/5/15 minutos) calculadas de forma incremental.
+
+Cada snapshot de un panel de IOL (mercado.py) y cada actualizacion del stream de ROFEX
+(rofex_stream.py) actualiza la barra en curso de cada simbolo; nada se recalcula desde el
+historico. Por intervalo hay un `BarStore` con arrays preasignados: la barra en curso y un
+ring buffer con las ultimas BARS_HISTORY barras cerradas de cada simbolo. La memoria depende
+de la cantidad de simbolos, no del largo de la rueda.
+
+- Precio: ultimo operado (IOL `ultimoPrecio`, ROFEX `LA`). Un dato sin operado no mueve
+  OHLC ni VWAP; solo suma su volumen a la barra en curso.
+- Volumen: IOL (`volumen`) y ROFEX (`TV`) informan el acumulado del dia; la barra suma la
+  diferencia contra el dato anterior. Un acumulado menor (otra rueda) cuenta desde cero.
+- VWAP: sum(precio * volumen) / sum(volumen) sobre los datos con precio; NaN si la barra no
+  tuvo volumen operado con precio.
+
+Una barra cierra cuando llega un dato de un intervalo posterior o con `close_due(ahora)`.
+`drain()` devuelve las cerradas que todavia no se publicaron leyendolas del ring buffer (no
+hay cola aparte): si se juntan mas de BARS_HISTORY sin publicar, las mas viejas se pierden y
+se cuentan en `dropped`.
+"""
+
+import logging
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from config import BARS_HISTORY, BARS_INTERVALS
+
+logger = logging.getLogger(__name__)
+
+BAR_COLUMNS = ["simbolo", "intervalo", "inicio", "apertura", "maximo", "minimo", "cierre", "volumen", "vwap", "ticks"]
+
+# Campos de cada barra (ultima dimension de `cur` y `ring`)
+# _PV_VOLUME: volumen con precio operado (denominador del VWAP)
+_OPEN, _HIGH, _LOW, _CLOSE, _VOLUME, _PV, _TICKS, _PV_VOLUME = range(8)
+_NFIELDS = 8
+
+
+class BarStore:
+    """Barras de un intervalo para todos los simbolos. No es thread-safe: el que escribe sincroniza."""
+
+    def __init__(self, interval_min: int, history: int = BARS_HISTORY, symbols: Iterable[str] = (), capacity: int = 8) -> None:
+        symbols = list(symbols)
+        capacity = max(capacity, len(symbols), 1)
+        self.interval_min = interval_min
+        self.interval_ms = interval_min * 60_000
+        self.history = max(history, 1)
+        self.late = 0
+        self.dropped = 0
+        self._index: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        # Barra en curso (inicio 0 = sin barra abierta) y ultimo acumulado de volumen
+        self.cur_start = np.zeros(capacity, dtype=np.int64)
+        self.cur = np.zeros((capacity, _NFIELDS))
+        self.last_cum = np.full(capacity, np.nan)
+        # Ring buffer de cerradas: la k-esima barra cerrada del simbolo va a la posicion k % history
+        self.ring_start = np.zeros((capacity, self.history), dtype=np.int64)
+        self.ring = np.zeros((capacity, self.history, _NFIELDS))
+        self.closed = np.zeros(capacity, dtype=np.int64)
+        self.emitted = np.zeros(capacity, dtype=np.int64)
+        for symbol in symbols:
+            self._row(symbol)
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._symbols)
+
+    @property
+    def label(self) -> str:
+        return f"{self.interval_min}min"
+
+    def _row(self, symbol: str) -> int:
+        row = self._index.get(symbol)
+        if row is not None:
+            return row
+        row = len(self._symbols)
+        if row == self.cur_start.shape[0]:
+            self._grow(2 * row)
+        self._index[symbol] = row
+        self._symbols.append(symbol)
+        return row
+
+    def rows(self, symbols: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self._row(s) for s in symbols), dtype=np.intp)
+
+    def _grow(self, capacity: int) -> None:
+        def _pad(arr: np.ndarray, fill) -> np.ndarray:
+            out = np.full((capacity,) + arr.shape[1:], fill, dtype=arr.dtype)
+            out[: arr.shape[0]] = arr
+            return out
+
+        self.cur_start = _pad(self.cur_start, 0)
+        self.cur = _pad(self.cur, 0.0)
+        self.last_cum = _pad(self.last_cum, np.nan)
+        self.ring_start = _pad(self.ring_start, 0)
+        self.ring = _pad(self.ring, 0.0)
+        self.closed = _pad(self.closed, 0)
+        self.emitted = _pad(self.emitted, 0)
+
+    # --------------------
+    # Actualizacion
+    # --------------------
+    def _close(self, rows) -> None:
+        """Pasa la barra en curso de `rows` al ring buffer."""
+        pos = self.closed[rows] % self.history
+        self.ring_start[rows, pos] = self.cur_start[rows]
+        self.ring[rows, pos] = self.cur[rows]
+        self.closed[rows] += 1
+        self.cur_start[rows] = 0
+
+    def _volume_delta(self, rows, cum: np.ndarray) -> np.ndarray:
+        prev = self.last_cum[rows]
+        known = ~np.isnan(cum)
+        with np.errstate(invalid="ignore"):
+            delta = np.where(cum >= prev, cum - prev, cum)
+        # Primer dato del simbolo: lo operado antes no pertenece a esta barra
+        delta = np.where(known & ~np.isnan(prev), delta, 0.0)
+        self.last_cum[rows] = np.where(known, cum, prev)
+        return delta
+
+    def update_many(self, rows: np.ndarray, ts_ms: int, price: np.ndarray, cum_volume: np.ndarray) -> None:
+        """Snapshot de varios simbolos con el mismo timestamp (un panel de IOL). `rows` sin repetidos."""
+        start = ts_ms - ts_ms % self.interval_ms
+        cur = self.cur_start[rows]
+        late = cur > start
+        if late.any():
+            self.late += int(late.sum())
+            rows, price, cum_volume, cur = rows[~late], price[~late], cum_volume[~late], cur[~late]
+        volume = self._volume_delta(rows, cum_volume)
+
+        valid = np.isfinite(price) & (price > 0)
+        roll = valid & (cur != start)
+        self._close(rows[roll & (cur > 0)])
+        # Barra nueva
+        r, p, v = rows[roll], price[roll], volume[roll]
+        self.cur_start[r] = start
+        self.cur[r] = np.column_stack([p, p, p, p, v, p * v, np.ones_like(p), v])
+        # Barra en curso: solo max/min/cierre y acumulados
+        same = valid & ~roll
+        r, p, v = rows[same], price[same], volume[same]
+        self.cur[r, _HIGH] = np.maximum(self.cur[r, _HIGH], p)
+        self.cur[r, _LOW] = np.minimum(self.cur[r, _LOW], p)
+        self.cur[r, _CLOSE] = p
+        self.cur[r, _VOLUME] += v
+        self.cur[r, _PV] += p * v
+        self.cur[r, _PV_VOLUME] += v
+        self.cur[r, _TICKS] += 1
+        # Sin precio: el volumen igual se suma a la barra abierta del intervalo
+        extra = ~valid & (self.cur_start[rows] == start)
+        self.cur[rows[extra], _VOLUME] += volume[extra]
+
+    def update(self, symbol: str, ts_ms: int, price: float, cum_volume: float = np.nan) -> None:
+        """Un dato de un simbolo (mensaje del stream de ROFEX); camino escalar, sin arrays temporales."""
+        row = self._row(symbol)
+        start = ts_ms - ts_ms % self.interval_ms
+        cur = self.cur_start[row]
+        if cur > start:
+            self.late += 1
+            return
+        volume = 0.0
+        if cum_volume == cum_volume:  # no NaN
+            prev = self.last_cum[row]
+            if prev == prev:
+                volume = cum_volume - prev if cum_volume >= prev else cum_volume
+            self.last_cum[row] = cum_volume
+        if not price > 0:
+            if cur == start:
+                self.cur[row, _VOLUME] += volume
+            return
+        bar = self.cur[row]
+        if cur != start:
+            if cur > 0:
+                self._close(row)
+            self.cur_start[row] = start
+            bar[:] = (price, price, price, price, volume, price * volume, 1.0, volume)
+            return
+        if price > bar[_HIGH]:
+            bar[_HIGH] = price
+        if price < bar[_LOW]:
+            bar[_LOW] = price
+        bar[_CLOSE] = price
+        bar[_VOLUME] += volume
+        bar[_PV] += price * volume
+        bar[_PV_VOLUME] += volume
+        bar[_TICKS] += 1
+
+    def close_due(self, now_ms: int) -> int:
+        """Cierra las barras cuyo intervalo ya termino aunque no haya llegado otro dato."""
+        n = len(self._symbols)
+        cur = self.cur_start[:n]
+        due = np.flatnonzero((cur > 0) & (cur + self.interval_ms <= now_ms))
+        if len(due):
+            self._close(due)
+        return len(due)
+
+    # --------------------
+    # Lectura
+    # --------------------
+    def _frame(self, rows: np.ndarray, pos: np.ndarray) -> pd.DataFrame:
+        data = self.ring[rows, pos]
+        volume = data[:, _VOLUME]
+        priced = data[:, _PV_VOLUME]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vwap = np.where(priced > 0, data[:, _PV] / priced, np.nan)
+        return pd.DataFrame(
+            {
+                "simbolo": np.array(self._symbols, dtype=object)[rows],
+                "intervalo": self.label,
+                "inicio": pd.to_datetime(self.ring_start[rows, pos], unit="ms", utc=True),
+                "apertura": data[:, _OPEN],
+                "maximo": data[:, _HIGH],
+                "minimo": data[:, _LOW],
+                "cierre": data[:, _CLOSE],
+                "volumen": volume,
+                "vwap": vwap,
+                "ticks": data[:, _TICKS].astype(np.int64),
+            },
+            columns=BAR_COLUMNS,
+        )
+
+    def _pending(self, first: np.ndarray) -> pd.DataFrame:
+        """Barras cerradas desde la numero `first[row]` de cada simbolo, en orden."""
+        n = len(self._symbols)
+        last = self.closed[:n]
+        first = np.maximum(first, last - self.history)
+        counts = last - first
+        if not counts.any():
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        rows = np.repeat(np.arange(n), counts)
+        # k-esima barra de cada simbolo: first[row] + offset dentro de su grupo
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return self._frame(rows, (first[rows] + offsets) % self.history)
+
+    def drain(self) -> pd.DataFrame:
+        """Barras cerradas que todavia no se publicaron."""
+        n = len(self._symbols)
+        lost = np.maximum(self.closed[:n] - self.emitted[:n] - self.history, 0)
+        if lost.any():
+            self.dropped += int(lost.sum())
+            logger.warning("Barras %s: %s cerradas se perdieron sin publicar (ring de %s)", self.label, int(lost.sum()), self.history)
+        out = self._pending(self.emitted[:n])
+        self.emitted[:n] = self.closed[:n]
+        return out
+
+    def history_frame(self) -> pd.DataFrame:
+        """Las ultimas `history` barras cerradas de cada simbolo (para graficos)."""
+        return self._pending(np.zeros(len(self._symbols), dtype=np.int64))
+
+    def latest_frame(self) -> pd.DataFrame:
+        """La ultima barra cerrada de cada simbolo (los que ya cerraron alguna)."""
+        rows = np.flatnonzero(self.closed[: len(self._symbols)] > 0)
+        return self._frame(rows, (self.closed[rows] - 1) % self.history)
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.cur_start, self.cur, self.last_cum, self.ring_start, self.ring, self.closed, self.emitted))
+
+
+class BarAggregator:
+    """Un BarStore por intervalo alimentado con los mismos datos."""
+
+    def __init__(self, intervals: Iterable[int] = BARS_INTERVALS, history: int = BARS_HISTORY, symbols: Iterable[str] = ()) -> None:
+        symbols = list(symbols)
+        self.stores = [BarStore(m, history, symbols) for m in intervals]
+        # Posiciones del ultimo panel visto: mientras no cambie la lista de simbolos no se recalculan
+        self._rows_key: tuple | None = None
+        self._first: np.ndarray | None = None
+        self._rows: List[np.ndarray] = []
+
+    def update_frame(self, symbols, ts_ms: int, price, cum_volume=None) -> None:
+        """Snapshot de un panel: series/arrays alineados de simbolo, precio y volumen acumulado."""
+        symbols = pd.Series(symbols).astype(str).to_numpy()
+        price = pd.to_numeric(pd.Series(price), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        if cum_volume is None:
+            cum_volume = np.full(len(price), np.nan)
+        else:
+            cum_volume = pd.to_numeric(pd.Series(cum_volume), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        key = tuple(symbols)
+        if key != self._rows_key:
+            # Si un simbolo se repite vale la primera aparicion
+            _, first = np.unique(symbols, return_index=True)
+            first.sort()
+            self._first = first
+            self._rows = [store.rows(symbols[first]) for store in self.stores]
+            self._rows_key = key
+        price, cum_volume = price[self._first], cum_volume[self._first]
+        for store, rows in zip(self.stores, self._rows):
+            store.update_many(rows, int(ts_ms), price, cum_volume)
+
+    def update(self, symbol: str, ts_ms: int, price: float, cum_volume: float = np.nan) -> None:
+        for store in self.stores:
+            store.update(symbol, ts_ms, price, cum_volume)
+
+    def close_due(self, now_ms: int) -> int:
+        return sum(store.close_due(now_ms) for store in self.stores)
+
+    def drain(self) -> pd.DataFrame:
+        frames = [f for f in (store.drain() for store in self.stores) if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def history_frame(self) -> pd.DataFrame:
+        return pd.concat([store.history_frame() for store in self.stores], ignore_index=True)
+
+    def latest_frame(self) -> pd.DataFrame:
+        return pd.concat([store.latest_frame() for store in self.stores], ignore_index=True)
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            s.label: {"simbolos": len(s), "late": s.late, "dropped": s.dropped, "bytes": s.nbytes()} for s in self.stores
+        }
+
+
+_aggregators: Dict[str, BarAggregator] = {}
+
+
+def aggregator(key: str) -> BarAggregator:
+    """Agregador por fuente (ej. 'Bonos/BYMA', 'DLR'); vive mientras viva el proceso."""
+    agg = _aggregators.get(key)
+    if agg is None:
+        agg = _aggregators[key] = BarAggregator()
+    return agg
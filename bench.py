@@ -0,0 +1,713 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks del pipeline.
+
+Uso:
+    python bench.py transform [--rows 5000] [--repeat 20]
+    python bench.py book [--messages 20000] [--symbols 5]
+    python bench.py json [--rows 20000 | --payload fixtures/iol/<panel>.json] [--columns simbolo,ultimoPrecio]
+    python bench.py schema [--rows 20000 | --payload fixtures/iol/<panel>.json] [--instrumento Bonos]
+    python bench.py analytics [--rows 3000]
+    python bench.py fx [--rows 3000]
+    python bench.py bars [--symbols 1000] [--every 20] [--hours 6]
+    python bench.py importtime [--budget-ms 150] [--repeat 5]
+    python bench.py cycle [--cycles 5] [--rows 3000] [--latency 0.02] [--fault-rate 0] [--sheets-latency 0.1]
+
+`cycle` corre mercado.main() completo contra el stand-in local de replay.py (fixtures
+sinteticos o grabados con --fixtures) y un FakeSheetsClient, y mide cada etapa.
+
+`importtime` es el control de regresion del arranque: sale con codigo 1 si `import mercado`
+supera el presupuesto o ejecuta alguna dependencia pesada que deberia ser diferida.
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+import replay
+from rofex_book import BookStore
+
+
+def _synthetic_bonos(rows: int, seed: int = 7) -> pd.DataFrame:
+    """Panel de bonos sintetico con la forma de la respuesta de IOL (puntas como dict)."""
+    return pd.DataFrame(replay.synthetic_titulos(rows, seed))
+
+
+def _transform_bonos_legacy(bonos_df: pd.DataFrame) -> pd.DataFrame:
+    """Implementacion anterior de transform_bonos (split de str(puntas)), solo para comparar."""
+    columnas_a_eliminar = [
+        "puntas", "puntas_col1", "puntas_col2", "puntas_col3", "puntas_col4", "puntas_col1_part1",
+        "precioEjercicio", "tipoOpcion", "fechaVencimiento", "mercado",
+        "puntas_col2_part1", "puntas_col3_part1", "puntas_col4_part1",
+    ]
+    bonos_df["puntas"] = bonos_df["puntas"].astype(str)
+    split_columns = bonos_df["puntas"].str.split(",", expand=True)
+    for idx, col in enumerate(["puntas_col1", "puntas_col2", "puntas_col3", "puntas_col4"]):
+        if idx in split_columns.columns:
+            bonos_df[col] = split_columns[idx]
+    if "puntas_col4" in bonos_df.columns:
+        bonos_df["puntas_col4"] = bonos_df["puntas_col4"].str.replace("}", "", regex=False)
+    for i in range(1, 5):
+        col_name = f"puntas_col{i}"
+        if col_name in bonos_df.columns:
+            split_again = bonos_df[col_name].str.split(": ", expand=True)
+            if len(split_again.columns) >= 2:
+                bonos_df[f"{col_name}_part1"] = split_again[0]
+                bonos_df[f"{col_name}_part2"] = split_again[1]
+
+    def convert_to_number(x):
+        if pd.isna(x) or x == "":
+            return None
+        try:
+            return float(str(x).strip().replace(",", "."))
+        except Exception:
+            return None
+
+    for i in range(1, 5):
+        for j in range(1, 3):
+            col_name = f"puntas_col{i}_part{j}"
+            if col_name in bonos_df.columns:
+                bonos_df[col_name] = bonos_df[col_name].apply(convert_to_number)
+    return bonos_df.drop(columns=[c for c in columnas_a_eliminar if c in bonos_df.columns])
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_transform(rows: int, repeat: int) -> None:
+    import mercado
+
+    raw = _synthetic_bonos(rows)
+
+    legacy = _transform_bonos_legacy(raw.copy())
+    nuevo = mercado.transform_bonos(raw.copy())
+    pd.testing.assert_frame_equal(legacy, nuevo, check_dtype=False)
+
+    t_legacy = _best_of(lambda: _transform_bonos_legacy(raw.copy()), repeat)
+    t_nuevo = _best_of(lambda: mercado.transform_bonos(raw.copy()), repeat)
+    print(f"transform_bonos ({rows} filas, mejor de {repeat}) - salida identica")
+    print(f"  split de str(puntas): {t_legacy * 1000:8.2f} ms")
+    print(f"  vectorizado:          {t_nuevo * 1000:8.2f} ms")
+    print(f"  speedup:              {t_legacy / t_nuevo:8.1f}x")
+
+
+def _synthetic_md(messages: int, symbols: int, depth: int = 2, seed: int = 11) -> list[dict]:
+    """Mensajes Md de Primary ya decodificados, repartidos entre los simbolos."""
+    return replay.synthetic_md(messages, [f"DLR/M{i:02d}" for i in range(symbols)], depth, seed)
+
+
+def _book_dataframe_legacy(response: dict) -> pd.DataFrame:
+    """Camino anterior de subscribe_to_market: dos DataFrames, concat, renombres y timestamp."""
+    df_bi = pd.DataFrame(response["marketData"]["BI"])
+    df_bi.columns = [f"BI_{col}" for col in df_bi.columns]
+    df_of = pd.DataFrame(response["marketData"]["OF"])
+    df_of.columns = [f"OF_{col}" for col in df_of.columns]
+    df = pd.concat([df_bi, df_of], axis=1)
+    df["timestamp"] = pd.to_datetime(float(response["timestamp"]) / 1000, unit="s")
+    column_order = ["timestamp", "BI_size", "BI_price", "OF_price", "OF_size"]
+    return df[[col for col in column_order if col in df.columns]]
+
+
+def bench_book(messages: int, symbols: int) -> None:
+    msgs = _synthetic_md(messages, symbols)
+
+    legacy_n = min(messages, 2000)
+    t0 = time.perf_counter()
+    for msg in msgs[:legacy_n]:
+        _book_dataframe_legacy(msg)
+    t_legacy = time.perf_counter() - t0
+
+    store = BookStore(depth=2)
+    t0 = time.perf_counter()
+    for msg in msgs:
+        store.update(msg["instrumentId"]["symbol"], msg["marketData"], msg["timestamp"])
+    t_store = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    store.to_frames()
+    t_frames = time.perf_counter() - t0
+
+    legacy_rate = legacy_n / t_legacy
+    store_rate = messages / t_store
+    print(f"order book ({messages} mensajes, {symbols} simbolos, depth 2)")
+    print(f"  DataFrame por mensaje: {legacy_rate:12,.0f} updates/s")
+    print(f"  BookStore in-place:    {store_rate:12,.0f} updates/s")
+    print(f"  speedup:               {store_rate / legacy_rate:12.1f}x")
+    print(f"  snapshot a DataFrames: {t_frames * 1000:12.2f} ms (solo al exportar)")
+
+
+def _memory(fn) -> tuple[int, int]:
+    """(pico, retenido) en bytes: retenido es lo que sigue vivo mientras se conserva el resultado."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+        return peak, current
+    finally:
+        tracemalloc.stop()
+
+
+def _json_cases(body: bytes, columns: list[str] | None) -> dict:
+    """Caminos de decode a comparar; cada uno devuelve solo el DataFrame (lo que queda vivo)."""
+    import fastjson
+
+    cases = {
+        # Camino original de mercado.panel: response.json() y DataFrame(list[dict])
+        "json + DataFrame(list[dict])": lambda: pd.DataFrame(json.loads(body)["titulos"]),
+        f"{fastjson.BACKEND} + columnas": lambda: fastjson.records_frame(fastjson.loads(body)["titulos"]),
+        "stream por lotes": lambda: fastjson.stream_frame(body),
+    }
+    if columns:
+        cases[f"stream + {len(columns)} columnas"] = lambda: fastjson.stream_frame(body, keep=set(columns).__contains__)
+    return cases
+
+
+def _peak_rss_mb() -> float | None:
+    """Pico de RSS del proceso. En Linux VmHWM: ru_maxrss arrastra el pico del padre tras el exec."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+
+
+def _json_case_rss(path: str, name: str, columns: str) -> str:
+    """Pico de RSS (MB) de un caso sobre el RSS previo; corre en un proceso nuevo."""
+    body = Path(path).read_bytes()
+    fn = _json_cases(body, [c for c in columns.split(",") if c])[name]
+    gc.collect()
+    base = _peak_rss_mb()
+    if base is None:
+        return ""
+    fn()
+    return f"{_peak_rss_mb() - base:.1f}"
+
+
+def bench_json(rows: int, payload: Path | None, columns: list[str] | None, repeat: int) -> None:
+    if payload is not None:
+        body = payload.read_bytes()
+        origen = str(payload)
+    else:
+        body = json.dumps({"titulos": replay.synthetic_titulos(rows)}).encode()
+        origen = f"sintetico, {rows} titulos"
+        payload = Path(tempfile.mkdtemp(prefix="bench-json-")) / "panel.json"
+        payload.write_bytes(body)
+
+    cases = _json_cases(body, columns)
+    legacy = next(iter(cases.values()))()
+    for fn in list(cases.values())[1:3]:
+        pd.testing.assert_frame_equal(legacy, fn())
+    del legacy
+
+    print(f"decode de panel IOL ({origen}, {len(body) / 1e6:.1f} MB, mejor de {repeat}) - salida identica")
+    print("  pico RSS: proceso nuevo por caso; retenido: tracemalloc con el resultado vivo")
+    base_t = None
+    for nombre, fn in cases.items():
+        t = _best_of(fn, repeat)
+        _, kept = _memory(fn)
+        code = "import sys, bench; print(bench._json_case_rss(*sys.argv[1:]))"
+        r, _ = _run_clean(["-c", code, str(payload), nombre, ",".join(columns or [])], Path(__file__).resolve().parent)
+        rss = f"{r.stdout.strip()} MB" if r.returncode == 0 and r.stdout.strip() else "n/d"
+        base_t = base_t or t
+        print(f"  {nombre:<32} {t * 1000:8.1f} ms ({base_t / t:4.1f}x)  pico RSS {rss:>8}  retenido {kept / 1e6:6.1f} MB")
+
+
+def bench_schema(rows: int, payload: Path | None, instrumento: str, repeat: int) -> None:
+    import fastjson
+    import mercado
+    import panel_schema
+    import sheets
+
+    if payload is not None:
+        body = payload.read_bytes()
+        origen = str(payload)
+    else:
+        body = json.dumps({"titulos": replay.synthetic_titulos(rows)}).encode()
+        origen = f"sintetico, {rows} titulos"
+    titulos = fastjson.loads(body)["titulos"]
+
+    raw = fastjson.records_frame(titulos)
+    typed = panel_schema.apply(
+        fastjson.records_frame(titulos, panel_schema.columns(instrumento, fastjson.record_columns(titulos))), instrumento
+    )
+
+    def filas_legacy(df):
+        return [[sheets.cell_value(v) for v in row] for row in df.to_numpy("object")]
+
+    print(f"esquema de panel {instrumento} ({origen}, mejor de {repeat})")
+    mem_raw = raw.memory_usage(deep=True).sum()
+    mem_typed = typed.memory_usage(deep=True).sum()
+    print(f"  memoria del snapshot: {mem_raw / 1e6:8.2f} MB -> {mem_typed / 1e6:8.2f} MB ({mem_typed / mem_raw:.0%})")
+
+    if instrumento == "Bonos":
+        t_raw = _best_of(lambda: mercado.transform_bonos(raw), repeat)
+        t_typed = _best_of(lambda: mercado.transform_bonos(typed), repeat)
+        print(f"  transform_bonos:      {t_raw * 1000:8.2f} ms -> {t_typed * 1000:8.2f} ms ({t_raw / t_typed:.1f}x)")
+        raw, typed = mercado.transform_bonos(raw), mercado.transform_bonos(typed)
+
+    t_raw = _best_of(lambda: filas_legacy(raw), repeat)
+    t_typed = _best_of(lambda: sheets._frame_rows(typed), repeat)
+    print(f"  celdas para Sheets:   {t_raw * 1000:8.2f} ms -> {t_typed * 1000:8.2f} ms ({t_raw / t_typed:.1f}x)")
+
+
+def _ytm_scalar(price: float, years: list, flows: list) -> float:
+    """Newton bono por bono (lo que hacia la planilla con TIR.NO.PER fila a fila)."""
+    y = 0.10
+    for _ in range(50):
+        pv = sum(cf * (1 + y) ** -t for t, cf in zip(years, flows))
+        dpv = -sum(t * cf * (1 + y) ** (-t - 1) for t, cf in zip(years, flows))
+        step = (pv - price) / dpv
+        y = max(y - step, -0.99)
+        if abs(step) <= 1e-10:
+            return y
+    return float("nan")
+
+
+def bench_analytics(rows: int, repeat: int) -> None:
+    import datetime as dt
+
+    import numpy as np
+
+    import bond_analytics
+
+    titulos = replay.synthetic_titulos(rows, seed=1)
+    path = Path(tempfile.mkdtemp(prefix="bench-analytics-")) / "cashflows.csv"
+    replay.write_cashflows(path, replay.synthetic_cashflows(titulos))
+    bond_analytics.CASHFLOWS_FILE = str(path)
+
+    simbolos = np.array([t["simbolo"] for t in titulos], dtype=object)
+    precios = np.array([t["ultimoPrecio"] for t in titulos])
+    settlement = dt.date.today()
+
+    t0 = time.perf_counter()
+    result = bond_analytics.analyze(simbolos, precios, settlement)
+    t_first = time.perf_counter() - t0
+    t_vec = _best_of(lambda: bond_analytics.analyze(simbolos, precios, settlement), repeat)
+
+    table = bond_analytics._get_table()
+    settled = bond_analytics._settle(table, settlement)
+    idx = table.tickers.get_indexer(simbolos)
+    schedules = [
+        ([t for t, cf in zip(settled.years[i], settled.flows[i]) if cf], [cf for cf in settled.flows[i] if cf]) for i in idx
+    ]
+
+    def scalar():
+        return [_ytm_scalar(p, yrs, cfs) for p, (yrs, cfs) in zip(precios, schedules)]
+
+    t_scalar = _best_of(scalar, 1)
+    diff = np.nanmax(np.abs(np.array(scalar()) - result["tir"].to_numpy()))
+
+    print(f"analitica de bonos, {rows} bonos (mejor de {repeat})")
+    print(f"  primer ciclo (lee CSV y precalcula): {t_first * 1000:8.2f} ms")
+    print(f"  vectorizado (cacheado):              {t_vec * 1000:8.2f} ms")
+    print(f"  Newton bono por bono:                {t_scalar * 1000:8.2f} ms ({t_scalar / t_vec:.0f}x)")
+    print(f"  convergieron {result['tir'].notna().sum()}/{rows}, diferencia maxima de TIR {diff:.2e}")
+
+
+def _fx_per_row(bonos_df: pd.DataFrame, bid: str, ask: str) -> list[tuple]:
+    """MEP/CCL buscando cada especie en dolares con un filtro por fila."""
+    out = []
+    for s in bonos_df["simbolo"].astype(str):
+        if len(s) < 2 or s[-1] not in ("D", "C"):
+            continue
+        peso = bonos_df[bonos_df["simbolo"] == s[:-1]]
+        usd = bonos_df[bonos_df["simbolo"] == s]
+        if peso.empty:
+            continue
+        p, u = peso.iloc[0], usd.iloc[0]
+        out.append((s[:-1], s, p["ultimoPrecio"] / u["ultimoPrecio"], p[ask] / u[bid], p[bid] / u[ask]))
+    return out
+
+
+def bench_fx(rows: int, repeat: int) -> None:
+    import fastjson
+    import implied_fx
+    import mercado
+
+    pares = rows // 10
+    bonos = replay.synthetic_titulos(rows - 2 * pares, seed=1)
+    titulos = bonos + replay.synthetic_fx_pairs(bonos[:pares])
+    bonos_df = mercado._transform_bonos(fastjson.records_frame(titulos))
+    bid, ask = mercado.PUNTAS_COLUMNS["precioCompra"], mercado.PUNTAS_COLUMNS["precioVenta"]
+
+    implied_fx._index_key = None
+    t0 = time.perf_counter()
+    fx = implied_fx.compute(bonos_df, bid, ask)
+    t_first = time.perf_counter() - t0
+    t_vec = _best_of(lambda: implied_fx.compute(bonos_df, bid, ask), repeat)
+    t_row = _best_of(lambda: _fx_per_row(bonos_df, bid, ask), 1)
+
+    print(f"MEP/CCL implicito, {rows} bonos, {len(fx)} pares (mejor de {repeat})")
+    print(f"  primer ciclo (arma el indice): {t_first * 1000:8.2f} ms")
+    print(f"  vectorizado (indice cacheado): {t_vec * 1000:8.2f} ms")
+    print(f"  busqueda por fila:             {t_row * 1000:8.2f} ms ({t_row / t_vec:.0f}x)")
+    for tipo, st in implied_fx.summary(fx).items():
+        print(f"  {tipo}: mediana {st['mediana']:.2f} [{st['min']:.2f}, {st['max']:.2f}], spread medio {st['spread_medio']:.2%}")
+
+
+def _bars_recompute(ticks: pd.DataFrame, interval_min: int) -> pd.DataFrame:
+    """Barras armadas desde todo el historico del dia (lo que se evita con bars.py)."""
+    df = ticks.assign(inicio=ticks["ts"] - ticks["ts"] % (interval_min * 60_000))
+    df["volumen"] = df.groupby("simbolo")["cum"].diff().fillna(0.0)
+    df["pv"] = df["precio"] * df["volumen"]
+    g = df.groupby(["simbolo", "inicio"], sort=True)
+    out = g.agg(
+        apertura=("precio", "first"),
+        maximo=("precio", "max"),
+        minimo=("precio", "min"),
+        cierre=("precio", "last"),
+        volumen=("volumen", "sum"),
+        pv=("pv", "sum"),
+    ).reset_index()
+    out["vwap"] = out["pv"] / out["volumen"].where(out["volumen"] > 0)
+    return out.drop(columns="pv")
+
+
+def bench_bars(symbols: int, every: float, hours: float) -> None:
+    import numpy as np
+
+    import bars
+
+    rng = np.random.default_rng(5)
+    simbolos = np.array([f"S{i:04d}" for i in range(symbols)], dtype=object)
+    steps = int(hours * 3600 / every)
+    t0_ms = 1718000000000 - 1718000000000 % 900_000
+    precio = 100 + rng.standard_normal(symbols).cumsum() * 0.1
+    cum = np.zeros(symbols)
+
+    agg = bars.BarAggregator([1, 5, 15], history=32, symbols=simbolos)
+    bytes_inicio = sum(s.nbytes() for s in agg.stores)
+    history = []
+    t_inc = []
+    publicadas = 0
+    solo_bars = [tracemalloc.Filter(True, bars.__file__)]
+
+    def mem_bars() -> int:
+        return sum(st.size for st in tracemalloc.take_snapshot().filter_traces(solo_bars).statistics("filename"))
+
+    # El primer cuarto de la rueda se mide sin tracemalloc (tiempos); desde ahi se traza lo que
+    # bars.py deja vivo, que tiene que quedar plano hasta el cierre
+    traza_desde = steps // 4
+    mem_mitad = 0
+    for step in range(steps):
+        if step == traza_desde:
+            gc.collect()
+            tracemalloc.start()
+        precio = precio * (1 + rng.standard_normal(symbols) * 0.001)
+        cum = cum + rng.integers(0, 100, symbols)
+        ts = t0_ms + int(step * every * 1000)
+        t = time.perf_counter()
+        agg.update_frame(simbolos, ts, precio, cum)
+        agg.close_due(ts)
+        publicadas += len(agg.drain())
+        if step < traza_desde:
+            t_inc.append(time.perf_counter() - t)
+        history.append(pd.DataFrame({"simbolo": simbolos, "ts": ts, "precio": precio, "cum": cum}))
+        if step == steps // 2:
+            mem_mitad = mem_bars()
+    mem_fin = mem_bars()
+    tracemalloc.stop()
+    bytes_fin = sum(s.nbytes() for s in agg.stores)
+
+    ticks = pd.concat(history, ignore_index=True)
+    t = time.perf_counter()
+    ref = _bars_recompute(ticks, 1)
+    t_recompute = time.perf_counter() - t
+
+    # Las ultimas barras de 1 minuto cerradas tienen que coincidir con el recalculo completo
+    got = agg.stores[0].history_frame().sort_values(["simbolo", "inicio"])
+    ref = ref[ref["inicio"] < got["inicio"].max().value // 1_000_000 + 60_000]
+    ref = ref.groupby("simbolo").tail(agg.stores[0].history)
+    cols = ["apertura", "maximo", "minimo", "cierre", "volumen", "vwap"]
+    iguales = len(got) == len(ref) and np.allclose(got[cols].to_numpy(float), ref[cols].to_numpy(float), equal_nan=True)
+
+    t_inc = np.array(t_inc)
+    print(f"barras 1/5/15 min, {symbols} simbolos, snapshot cada {every:.0f}s durante {hours:.1f}h ({steps} snapshots)")
+    print(f"  incremental:         {np.median(t_inc) * 1000:8.2f} ms/snapshot (p95 {np.percentile(t_inc, 95) * 1000:.2f} ms)")
+    print(f"  recalculo historico: {t_recompute * 1000:8.2f} ms/snapshot al final del dia ({len(ticks):,} ticks)")
+    print(f"  ring buffers:        {bytes_inicio / 2**20:8.2f} MB al inicio, {bytes_fin / 2**20:.2f} MB al final")
+    print(f"  memoria nueva retenida por bars.py: {mem_mitad / 2**10:.1f} KB a mitad de rueda, {mem_fin / 2**10:.1f} KB al cierre")
+    print(f"  barras publicadas:   {publicadas:,}; iguales al recalculo: {iguales}")
+
+    msgs = replay.synthetic_md(50000, [f"DLR/M{i}" for i in range(5)])
+    store, agg_rofex = BookStore(depth=2), bars.BarAggregator([1, 5, 15])
+    t = time.perf_counter()
+    for msg in msgs:
+        md = msg["marketData"]
+        store.update(msg["instrumentId"]["symbol"], md, msg["timestamp"])
+    t_book = time.perf_counter() - t
+    t = time.perf_counter()
+    for msg in msgs:
+        md = msg["marketData"]
+        store.update(msg["instrumentId"]["symbol"], md, msg["timestamp"])
+        agg_rofex.update(msg["instrumentId"]["symbol"], msg["timestamp"], md["LA"]["price"], md["TV"])
+    t_both = time.perf_counter() - t
+    print(f"  ROFEX: {len(msgs) / t_book:,.0f} updates/s solo book, {len(msgs) / t_both:,.0f} updates/s book + barras")
+
+
+# Dependencias que `import mercado` no debe ejecutar: se cargan al usar su etapa (lazy.py)
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "requests", "gspread", "gspread_dataframe", "google.oauth2.service_account")
+# Presupuesto de `import mercado` (bench importtime y tests/test_importtime.py)
+IMPORT_BUDGET_MS = 150.0
+
+
+def _run_clean(args: list[str], cwd: Path) -> tuple[subprocess.CompletedProcess, float]:
+    """Corre python con un entorno minimo (sin credenciales ni .env) y el repo en PYTHONPATH."""
+    env = {k: v for k, v in os.environ.items() if k in ("PATH", "HOME", "SYSTEMROOT", "TEMP", "TMP")}
+    env["PYTHONPATH"] = str(Path(__file__).resolve().parent)
+    t0 = time.perf_counter()
+    r = subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True)
+    return r, time.perf_counter() - t0
+
+
+def _importtime(code: str, cwd: Path) -> dict[str, int]:
+    """Cumulativo en microsegundos por modulo segun `python -X importtime`."""
+    r, _ = _run_clean(["-X", "importtime", "-c", code], cwd)
+    if r.returncode:
+        raise RuntimeError(r.stderr[-500:])
+    out = {}
+    for line in r.stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            out[parts[2].strip()] = int(parts[1])
+    return out
+
+
+def bench_importtime(budget_ms: float, repeat: int) -> int:
+    cwd = Path(tempfile.mkdtemp(prefix="bench-import-"))
+    runs = [_importtime("import mercado", cwd) for _ in range(repeat)]
+    best = min(runs, key=lambda r: r["mercado"])
+    startup = _importtime("pass", cwd)  # lo que importa el interprete solo (site, .pth)
+    mercado_ms = best["mercado"] / 1000
+
+    r, _ = _run_clean(
+        ["-c", f"import json, lazy, mercado; print(json.dumps([m for m in {HEAVY_MODULES!r} if lazy.is_loaded(m)]))"], cwd
+    )
+    eager = json.loads(r.stdout) if r.returncode == 0 else ["(error: " + r.stderr[-200:] + ")"]
+    check_s = min(_run_clean(["-m", "mercado", "check"], cwd)[1] for _ in range(repeat))
+
+    print(f"import mercado: {mercado_ms:.1f} ms (mejor de {repeat}, presupuesto {budget_ms:.0f} ms)")
+    print(f"python -m mercado check: {check_s * 1000:.0f} ms de reloj (incluye arranque del interprete)")
+    print("  imports mas lentos dentro de mercado:")
+    own = sorted((kv for kv in best.items() if kv[0] != "mercado" and kv[0] not in startup), key=lambda kv: -kv[1])
+    for name, us in own[:8]:
+        print(f"    {name:<24} {us / 1000:7.1f} ms")
+
+    failed = False
+    if mercado_ms > budget_ms:
+        print(f"REGRESION: import mercado tarda {mercado_ms:.1f} ms > {budget_ms:.0f} ms", file=sys.stderr)
+        failed = True
+    if eager:
+        print(f"REGRESION: import mercado ejecuta {', '.join(eager)} (deberian cargarse al usarse)", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+def _timed(stages: dict, name: str, fn):
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stages.setdefault(name, []).append(time.perf_counter() - t0)
+
+    return wrapper
+
+
+def bench_cycle(
+    cycles: int,
+    rows: int,
+    latency: float,
+    fault_rate: float,
+    sheets_latency: float,
+    fixtures: Path | None,
+    warm: bool,
+    ws_seconds: float,
+) -> None:
+    import shutil
+
+    fixtures = fixtures.resolve() if fixtures else None
+    workdir = Path(tempfile.mkdtemp(prefix="bench-cycle-"))
+    os.chdir(workdir)
+    if fixtures is None:
+        fixtures = workdir / "fixtures"
+        replay.write_synthetic_fixtures(fixtures, rows)
+
+    standin = replay.StandIn(fixtures, latency=latency, fault_rate=fault_rate).start()
+    sa = workdir / "service_account.json"
+    sa.write_text("{}", encoding="utf-8")
+    # config.py se evalua al importar mercado: las URLs tienen que estar antes del import
+    os.environ.update(standin.env())
+    os.environ.update({"SHEETS_ENABLED": "true", "TICKSTORE_DIR": str(workdir / "data")})
+    if (fixtures / "cashflows.csv").exists():
+        os.environ.setdefault("CASHFLOWS_FILE", str(fixtures / "cashflows.csv"))
+    for key, value in {
+        "IOL_USER": "bench",
+        "IOL_PASS": "bench",
+        "GOOGLE_SERVICE_ACCOUNT_JSON": str(sa),
+        "SHEET_BONOS_ID": "bench",
+        "ACCIONES_PANEL": "Merval",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    import instrumentos
+    import mercado
+    import sheets
+    from rofex_stream import MarketDataStream
+
+    fake = replay.FakeSheetsClient(latency=sheets_latency)
+    sheets.use_client(fake)
+
+    stages: dict = {}
+    mercado.get_iol_token = _timed(stages, "token", mercado.get_iol_token)
+    mercado.fetch_paneles = _timed(stages, "fetch", mercado.fetch_paneles)
+    mercado.transform_bonos = _timed(stages, "transform", mercado.transform_bonos)
+    mercado.bond_analytics.enrich = _timed(stages, "analytics", mercado.bond_analytics.enrich)
+    mercado.implied_fx.compute = _timed(stages, "fx", mercado.implied_fx.compute)
+    mercado._publish_bars = _timed(stages, "bars", mercado._publish_bars)
+    mercado.tickstore.append = _timed(stages, "tickstore", mercado.tickstore.append)
+    mercado.export_df_to_sheet = _timed(stages, "export", mercado.export_df_to_sheet)
+
+    totals = []
+    failures = 0
+    try:
+        for _ in range(cycles):
+            if not warm:
+                # Peor caso: sin cache HTTP ni snapshot de Sheets, todo se descarga y se escribe
+                mercado._get_response_cache().clear()
+                shutil.rmtree(sheets.SNAPSHOT_DIR, ignore_errors=True)
+            t0 = time.perf_counter()
+            try:
+                mercado.main()
+            except Exception as e:
+                # Igual que el scheduler: un ciclo fallido no corta la corrida
+                failures += 1
+                print(f"ciclo fallido: {e}", file=sys.stderr)
+            totals.append(time.perf_counter() - t0)
+
+        stream = MarketDataStream(
+            "standin-rofex", instrumentos.futures_strip("standin-rofex"), standin.ws_url, bars=mercado.bars.BarAggregator()
+        )
+        stream.start()
+        stream.wait_first_update(5)
+        t0 = time.perf_counter()
+        start_messages = stream.messages
+        time.sleep(ws_seconds)
+        ws_rate = (stream.messages - start_messages) / (time.perf_counter() - t0)
+        stream.stop()
+    finally:
+        standin.stop()
+
+    print(f"ciclo mercado.main() x{cycles} ({'warm' if warm else 'cold'}, latencia HTTP {latency * 1000:.0f} ms, fallas {fault_rate:.0%})")
+    for name in ("token", "fetch", "transform", "analytics", "fx", "bars", "tickstore", "export"):
+        times = stages.get(name, [])
+        if times:
+            print(f"  {name:<10} {sum(times) / cycles * 1000:10.2f} ms/ciclo  (max {max(times) * 1000:.2f} ms, {len(times)} llamadas)")
+    print(f"  {'total':<10} {sum(totals) / cycles * 1000:10.2f} ms/ciclo  (max {max(totals) * 1000:.2f} ms, {failures} fallidos)")
+    print(f"  sheets     {fake.calls / cycles:10.1f} llamadas/ciclo, {fake.cells / cycles:,.0f} celdas/ciclo")
+    print(f"  stand-in   {standin.stats}")
+    print(f"ROFEX WebSocket: {ws_rate:,.0f} mensajes/s procesados ({ws_seconds:.1f} s)")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_transform = sub.add_parser("transform", help="transform_bonos: parseo de puntas")
+    p_transform.add_argument("--rows", type=int, default=5000)
+    p_transform.add_argument("--repeat", type=int, default=20)
+
+    p_book = sub.add_parser("book", help="ROFEX: BookStore contra DataFrame por mensaje")
+    p_book.add_argument("--messages", type=int, default=20000)
+    p_book.add_argument("--symbols", type=int, default=5)
+
+    p_json = sub.add_parser("json", help="decode de paneles IOL: json + DataFrame contra el camino rapido")
+    p_json.add_argument("--rows", type=int, default=20000)
+    p_json.add_argument("--payload", type=Path, default=None, help="body grabado (replay.py record-iol)")
+    p_json.add_argument("--columns", default="", help="proyeccion a medir, separada por comas")
+    p_json.add_argument("--repeat", type=int, default=5)
+
+    p_schema = sub.add_parser("schema", help="panel_schema: memoria, transform y serializacion a Sheets")
+    p_schema.add_argument("--rows", type=int, default=20000)
+    p_schema.add_argument("--payload", type=Path, default=None, help="body grabado (replay.py record-iol)")
+    p_schema.add_argument("--instrumento", default="Bonos", choices=["Bonos", "Acciones"])
+    p_schema.add_argument("--repeat", type=int, default=5)
+
+    p_analytics = sub.add_parser("analytics", help="bond_analytics: TIR/duration vectorizadas contra bono por bono")
+    p_analytics.add_argument("--rows", type=int, default=3000)
+    p_analytics.add_argument("--repeat", type=int, default=10)
+
+    p_fx = sub.add_parser("fx", help="implied_fx: MEP/CCL vectorizado contra busqueda por fila")
+    p_fx.add_argument("--rows", type=int, default=3000)
+    p_fx.add_argument("--repeat", type=int, default=10)
+
+    p_bars = sub.add_parser("bars", help="bars: barras incrementales contra recalcular desde el historico")
+    p_bars.add_argument("--symbols", type=int, default=1000)
+    p_bars.add_argument("--every", type=float, default=20.0, help="segundos entre snapshots")
+    p_bars.add_argument("--hours", type=float, default=6.0)
+
+    p_import = sub.add_parser("importtime", help="presupuesto de import de mercado (-X importtime); exit 1 si se pasa")
+    p_import.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    p_import.add_argument("--repeat", type=int, default=5)
+
+    p_cycle = sub.add_parser("cycle", help="mercado.main() completo contra el stand-in de replay.py")
+    p_cycle.add_argument("--cycles", type=int, default=5)
+    p_cycle.add_argument("--rows", type=int, default=3000, help="filas del panel de bonos sintetico")
+    p_cycle.add_argument("--latency", type=float, default=0.02, help="segundos agregados a cada request HTTP")
+    p_cycle.add_argument("--fault-rate", type=float, default=0.0)
+    p_cycle.add_argument("--sheets-latency", type=float, default=0.1, help="segundos por llamada al fake de Sheets")
+    p_cycle.add_argument("--fixtures", type=Path, default=None, help="fixtures grabados (default: sinteticos)")
+    p_cycle.add_argument("--warm", action="store_true", help="conserva cache HTTP y snapshots de Sheets entre ciclos")
+    p_cycle.add_argument("--ws-seconds", type=float, default=3.0)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "transform":
+        bench_transform(args.rows, args.repeat)
+    elif args.cmd == "book":
+        bench_book(args.messages, args.symbols)
+    elif args.cmd == "json":
+        columns = [c.strip() for c in args.columns.split(",") if c.strip()] or None
+        bench_json(args.rows, args.payload, columns, args.repeat)
+    elif args.cmd == "schema":
+        bench_schema(args.rows, args.payload, args.instrumento, args.repeat)
+    elif args.cmd == "analytics":
+        bench_analytics(args.rows, args.repeat)
+    elif args.cmd == "fx":
+        bench_fx(args.rows, args.repeat)
+    elif args.cmd == "bars":
+        bench_bars(args.symbols, args.every, args.hours)
+    elif args.cmd == "importtime":
+        return bench_importtime(args.budget_ms, args.repeat)
+    elif args.cmd == "cycle":
+        bench_cycle(
+            args.cycles, args.rows, args.latency, args.fault_rate, args.sheets_latency, args.fixtures, args.warm, args.ws_seconds
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
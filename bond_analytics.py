@@ -0,0 +1,270 @@
+"""TIR, duration modificada, valor tecnico y paridad de los bonos, vectorizado con NumPy.
+
+Los flujos salen de CASHFLOWS_FILE, un CSV con una fila por pago:
+
+    ticker,fecha,cupon,amortizacion,moneda
+    AL30,2026-01-09,0.375,4,USD
+
+- `fecha` en ISO (YYYY-MM-DD); `cupon` y `amortizacion` por cada 100 de valor nominal original.
+- `emision` (opcional) es la fecha de emision del ticker: el cupon corrido del primer periodo
+  se devenga desde ahi. Sin ella se toma el primer pago menos un periodo (la distancia entre
+  el primer y el segundo pago).
+- `moneda` (opcional, default USD) es la moneda de los flujos. Un cronograma en USD se aplica
+  a las especies D (MEP) y C (cable) del ticker base (AL30D, AL30C); la especie en pesos
+  (AL30) no tiene TIR directa y se omite. Un cronograma en ARS aplica solo al ticker exacto.
+
+El archivo se lee una vez (se recarga si cambia su mtime) y se arma una matriz de flujos
+por ticker; por cada fecha de liquidacion se precalculan plazos, flujos futuros, residual y
+cupon corrido. En cada ciclo solo se indexan las filas del panel y se resuelve la TIR de todos
+los bonos a la vez con iteraciones de Newton sobre la matriz.
+
+TIR efectiva anual (base actual/365) sobre `ultimoPrecio`, que en BYMA incluye el cupon
+corrido. Las columnas nuevas (`tir`, `duracion_modificada`, `valor_tecnico`, `paridad`) van
+como fraccion (0.12 = 12%) salvo el valor tecnico, por 100 VN original.
+"""
+
+import datetime as dt
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from config import BOND_ANALYTICS_ENABLED, BOND_SETTLEMENT_DAYS, CASHFLOWS_FILE
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMN = "ultimoPrecio"
+OUTPUT_COLUMNS = ("tir", "duracion_modificada", "valor_tecnico", "paridad")
+# Sufijos de las especies en dolares de un mismo bono (MEP y cable)
+USD_SUFFIXES = ("D", "C")
+
+NEWTON_MAX_ITER = 50
+NEWTON_TOL = 1e-10
+NEWTON_GUESS = 0.10
+
+
+@dataclass
+class _Table:
+    """Cronogramas de CASHFLOWS_FILE como matrices (un ticker por fila, pagos ordenados, padding NaT/0)."""
+
+    tickers: pd.Index
+    usd: np.ndarray  # bool (M,)
+    dates: np.ndarray  # datetime64[D] (M, K)
+    cupon: np.ndarray  # float (M, K)
+    amort: np.ndarray  # float (M, K)
+    issue: np.ndarray  # datetime64[D] (M,) fecha de emision; NaT si no se informa
+
+
+@dataclass
+class _Settled:
+    """Flujos de cada ticker vistos desde una fecha de liquidacion."""
+
+    years: np.ndarray  # (M, K) plazo en anos; 0 en flujos pasados
+    flows: np.ndarray  # (M, K) cupon + amortizacion futuros; 0 en los pasados
+    residual: np.ndarray  # (M,)
+    accrued: np.ndarray  # (M,)
+
+
+_table: _Table | None = None
+_table_key: Tuple[str, float] | None = None
+_settled: Dict[dt.date, _Settled] = {}
+_missing_logged = False
+
+
+# --------------------
+# Carga y precalculo
+# --------------------
+def _load_table(path: Path) -> _Table:
+    df = pd.read_csv(path, dtype={"ticker": str})
+    df.columns = [c.strip().lower() for c in df.columns]
+    faltantes = {"ticker", "fecha", "cupon", "amortizacion"} - set(df.columns)
+    if faltantes:
+        raise ValueError(f"{path}: faltan columnas {sorted(faltantes)}")
+    if "moneda" not in df.columns:
+        df["moneda"] = "USD"
+
+    df["ticker"] = df["ticker"].str.strip().str.upper()
+    df["fecha"] = pd.to_datetime(df["fecha"], format="ISO8601").dt.normalize()
+    for col in ("cupon", "amortizacion"):
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+    df["moneda"] = df["moneda"].fillna("USD").str.strip().str.upper()
+    if "emision" not in df.columns:
+        df["emision"] = pd.NaT
+    df["emision"] = pd.to_datetime(df["emision"], format="ISO8601").dt.normalize()
+    df = df.sort_values(["ticker", "fecha"], kind="stable")
+
+    # Posicion de cada pago dentro de su ticker -> matriz (M, K) con padding
+    codes, tickers = pd.factorize(df["ticker"], sort=True)
+    pos = df.groupby("ticker", sort=True).cumcount().to_numpy()
+    m, k = len(tickers), int(pos.max()) + 1 if len(pos) else 0
+    dates = np.full((m, k), np.datetime64("NaT"), dtype="datetime64[D]")
+    cupon = np.zeros((m, k))
+    amort = np.zeros((m, k))
+    dates[codes, pos] = df["fecha"].to_numpy().astype("datetime64[D]")
+    cupon[codes, pos] = df["cupon"].to_numpy()
+    amort[codes, pos] = df["amortizacion"].to_numpy()
+    by_ticker = df.groupby("ticker", sort=True)
+    usd = by_ticker["moneda"].first().to_numpy() == "USD"
+    issue = by_ticker["emision"].first().to_numpy().astype("datetime64[D]")
+    return _Table(pd.Index(tickers), usd, dates, cupon, amort, issue)
+
+
+def _get_table() -> _Table | None:
+    """Tabla cacheada; se vuelve a leer solo si cambia el mtime del archivo."""
+    global _table, _table_key, _missing_logged
+    path = Path(CASHFLOWS_FILE)
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        if not _missing_logged:
+            logger.info("No existe %s: se omite la analitica de bonos", path)
+            _missing_logged = True
+        return None
+    key = (str(path), mtime)
+    if key != _table_key:
+        _table = _load_table(path)
+        _table_key = key
+        _settled.clear()
+        logger.info("Flujos de %s bonos cargados desde %s", len(_table.tickers), path)
+    return _table
+
+
+def _settle(table: _Table, settlement: dt.date) -> _Settled:
+    cached = _settled.get(settlement)
+    if cached is not None:
+        return cached
+
+    day = np.datetime64(settlement, "D")
+    valid = ~np.isnat(table.dates)
+    days = np.where(valid, (table.dates - day).astype("float64"), np.nan)
+    with np.errstate(invalid="ignore"):
+        future = valid & (days > 0)
+    past = valid & ~future
+
+    years = np.where(future, days / 365.0, 0.0)
+    flows = np.where(future, table.cupon + table.amort, 0.0)
+    residual = np.where(future, table.amort, 0.0).sum(axis=1)
+
+    # Cupon corrido: proporcion del proximo cupon devengada desde el ultimo pago; en el primer
+    # periodo, desde la emision o (sin emision) desde el primer pago menos un periodo
+    rows = np.arange(len(table.tickers))
+    has_next = (future & (table.cupon > 0)).any(axis=1)
+    nxt = np.argmax(future & (table.cupon > 0), axis=1)
+    n_past = past.sum(axis=1)
+    k = table.dates.shape[1]
+    nxt_date = table.dates[rows, nxt]
+    following = table.dates[rows, np.minimum(nxt + 1, max(k - 1, 0))]
+    first_start = np.where(np.isnat(table.issue), nxt_date - (following - nxt_date), table.issue)
+    prev = np.where(n_past > 0, table.dates[rows, np.maximum(n_past - 1, 0)], first_start)
+    with_prev = has_next & ~np.isnat(prev) & (prev < nxt_date)
+    period = np.where(with_prev, (nxt_date - prev).astype("float64"), 1.0)
+    elapsed = np.where(with_prev, (day - prev).astype("float64"), 0.0)
+    frac = np.clip(elapsed / np.maximum(period, 1.0), 0.0, 1.0)
+    accrued = np.where(with_prev, table.cupon[rows, nxt] * frac, 0.0)
+
+    settled = _Settled(years, flows, residual, accrued)
+    _settled.clear()  # solo interesa la fecha de hoy
+    _settled[settlement] = settled
+    return settled
+
+
+# --------------------
+# Calculo
+# --------------------
+def _resolve(table: _Table, simbolos: np.ndarray) -> np.ndarray:
+    """Fila de la tabla para cada simbolo (-1 si no hay cronograma aplicable)."""
+    idx = table.tickers.get_indexer(simbolos)
+    dolar = np.array([len(s) > 1 and s[-1] in USD_SUFFIXES for s in simbolos], dtype=bool)
+    base = np.array([s[:-1] for s in simbolos], dtype=object)
+    idx_base = table.tickers.get_indexer(base)
+    # Sin cronograma propio, las especies D/C toman el del ticker base
+    idx = np.where((idx < 0) & dolar, idx_base, idx)
+    # Cronograma en USD solo con precio en USD (y viceversa)
+    ok = idx >= 0
+    ok[ok] = table.usd[idx[ok]] == dolar[ok]
+    return np.where(ok, idx, -1)
+
+
+def solve_ytm(price: np.ndarray, years: np.ndarray, flows: np.ndarray) -> np.ndarray:
+    """TIR efectiva anual de N bonos a la vez: sum(flows / (1+y)^years) = price. NaN si no converge."""
+    n = len(price)
+    y = np.full(n, NEWTON_GUESS)
+    step = np.full(n, np.inf)
+    active = np.isfinite(price) & (price > 0) & (flows.sum(axis=1) > 0)
+    for _ in range(NEWTON_MAX_ITER):
+        if not active.any():
+            break
+        yy = y[active][:, None]
+        t = years[active]
+        cf = flows[active]
+        disc = (1.0 + yy) ** -t
+        pv = (cf * disc).sum(axis=1)
+        dpv = -(t * cf * disc).sum(axis=1) / (1.0 + yy[:, 0])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            s = (pv - price[active]) / dpv
+        # Acotado para que (1+y) no se haga negativo en precios muy altos
+        y[active] = np.maximum(y[active] - s, -0.99)
+        step[active] = s
+        active &= np.abs(step) > NEWTON_TOL
+    converged = np.abs(step) <= NEWTON_TOL
+    return np.where(converged, y, np.nan)
+
+
+def modified_duration(ytm: np.ndarray, years: np.ndarray, flows: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        disc = (1.0 + ytm[:, None]) ** -years
+        pv = (flows * disc).sum(axis=1)
+        macaulay = (years * flows * disc).sum(axis=1) / pv
+        return macaulay / (1.0 + ytm)
+
+
+def analyze(simbolos, precios, settlement: dt.date | None = None) -> pd.DataFrame | None:
+    """Analitica para arrays de simbolos y precios; None si no hay archivo de flujos."""
+    table = _get_table()
+    if table is None:
+        return None
+    settlement = settlement or dt.date.today() + dt.timedelta(days=BOND_SETTLEMENT_DAYS)
+    settled = _settle(table, settlement)
+
+    simbolos = np.asarray(simbolos, dtype=object)
+    precios = np.asarray(precios, dtype="float64")
+    n = len(simbolos)
+    out = {c: np.full(n, np.nan) for c in OUTPUT_COLUMNS}
+
+    idx = _resolve(table, simbolos)
+    hit = idx >= 0
+    if hit.any():
+        rows = idx[hit]
+        years, flows = settled.years[rows], settled.flows[rows]
+        price = precios[hit]
+        ytm = solve_ytm(price, years, flows)
+        vt = settled.residual[rows] + settled.accrued[rows]
+        out["tir"][hit] = ytm
+        out["duracion_modificada"][hit] = modified_duration(ytm, years, flows)
+        out["valor_tecnico"][hit] = np.where(vt > 0, vt, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["paridad"][hit] = price / out["valor_tecnico"][hit]
+    return pd.DataFrame(out)
+
+
+def enrich(bonos_df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega tir/duracion_modificada/valor_tecnico/paridad a la salida de transform_bonos."""
+    if not BOND_ANALYTICS_ENABLED or bonos_df.empty or "simbolo" not in bonos_df.columns:
+        return bonos_df
+    if PRICE_COLUMN not in bonos_df.columns:
+        logger.warning("No '%s' column found in bonos_df", PRICE_COLUMN)
+        return bonos_df
+
+    with metrics.stage("analytics", rows=len(bonos_df)) as m:
+        simbolos = bonos_df["simbolo"].astype(str).str.upper().to_numpy(dtype=object)
+        result = analyze(simbolos, bonos_df[PRICE_COLUMN].to_numpy(dtype="float64", na_value=np.nan))
+        if result is None:
+            return bonos_df
+        result.index = bonos_df.index
+        m["priced"] = int(result["tir"].notna().sum())
+        bonos_df = bonos_df.drop(columns=[c for c in OUTPUT_COLUMNS if c in bonos_df.columns])
+        return pd.concat([bonos_df, result], axis=1)
@@ -35,27 +35,153 @@ def _parse_time(value: str) -> _dt.time:
         raise RuntimeError(f"Invalid time format for {value}, expected HH:MM")
 
 
-IOL_USER = _get_env_var("IOL_USER")
-IOL_PASS = _get_env_var("IOL_PASS")
-
 ENABLE_ROFEX = _get_env_var_optional("ENABLE_ROFEX", "false").strip().lower() in ("1", "true", "yes", "y")
 
 ROFEX_USER = os.getenv("ROFEX_USER", "")
 ROFEX_PASS = os.getenv("ROFEX_PASS", "")
 
-if ENABLE_ROFEX and (not ROFEX_USER or not ROFEX_PASS):
-    raise RuntimeError("ENABLE_ROFEX=true but ROFEX_USER/ROFEX_PASS are missing")
+ROFEX_API_URL = _get_env_var_optional("ROFEX_API_URL", "https://api.remarkets.primary.com.ar").rstrip("/")
+ROFEX_WS_URL = _get_env_var_optional("ROFEX_WS_URL", "wss://api.remarkets.primary.com.ar/")
+# Strip de futuros a seguir: los proximos ROFEX_STRIP_SIZE contratos vivos del subyacente,
+# tomados del maestro de instrumentos (instrumentos.py, refresco diario por CFI code)
+ROFEX_UNDERLYING = _get_env_var_optional("ROFEX_UNDERLYING", "DLR")
+ROFEX_STRIP_SIZE = int(_get_env_var_optional("ROFEX_STRIP_SIZE", "5"))
+ROFEX_FUTURES_CFI = _get_env_var_optional("ROFEX_FUTURES_CFI", "FXXXSX")
+# Streaming: una suscripcion por sesion y snapshots a Sheets cada ROFEX_FLUSH_SECONDS
+ROFEX_STREAMING = _get_env_var_optional("ROFEX_STREAMING", "true").strip().lower() in ("1", "true", "yes", "y")
+ROFEX_FLUSH_SECONDS = float(_get_env_var_optional("ROFEX_FLUSH_SECONDS", "60"))
 
+# Google Sheets (dolar futuro ROFEX)
+ROFEX_SHEET_ID = _get_env_var_optional("ROFEX_SHEET_ID", "1ywgBZAwzBZlALK1g-rEg9E017XwWXzSaQQx7BU3zm3w")
+ROFEX_SHEET_TAB = _get_env_var_optional("ROFEX_SHEET_TAB", "Dólar futuro")
 
-# Path to the Google service account JSON file (kept outside the repo).
-GOOGLE_SERVICE_ACCOUNT_JSON = _get_file_path("GOOGLE_SERVICE_ACCOUNT_JSON")
 
 # Scheduler parameters (optional with defaults)
 MERCADO_START = _parse_time(_get_env_var_optional("MERCADO_START", "11:00"))
 MERCADO_END = _parse_time(_get_env_var_optional("MERCADO_END", "17:00"))
 MERCADO_EVERY_MIN = int(_get_env_var_optional("MERCADO_EVERY_MIN", "15"))
+# Que hacer si un ciclo se pasa del siguiente slot: skip | coalesce | immediate
+MERCADO_OVERRUN = _get_env_var_optional("MERCADO_OVERRUN", "skip").strip().lower()
+if MERCADO_OVERRUN not in ("skip", "coalesce", "immediate"):
+    raise RuntimeError(f"Invalid MERCADO_OVERRUN={MERCADO_OVERRUN!r}, expected skip, coalesce or immediate")
+# Ejecuta mercado.py en un interprete nuevo por ciclo (aislamiento) en vez de en el mismo proceso
+MERCADO_SUBPROCESS = _get_env_var_optional("MERCADO_SUBPROCESS", "false").strip().lower() in ("1", "true", "yes", "y")
+
+# Base de la API de IOL (se puede apuntar al stand-in local de replay.py)
+IOL_BASE_URL = _get_env_var_optional("IOL_BASE_URL", "https://api.invertironline.com").rstrip("/")
+
+# IOL fetch: paneles a descargar en cada ciclo y limites de concurrencia
+BONOS_PANELS = [p.strip() for p in _get_env_var_optional("BONOS_PANELS", "BYMA").split(",") if p.strip()]
+IOL_MAX_WORKERS = int(_get_env_var_optional("IOL_MAX_WORKERS", "4"))
+IOL_TIMEOUT = float(_get_env_var_optional("IOL_TIMEOUT", "10"))
+# Aplica panel_schema.py al ingresar cada panel (dtypes compactos, fechas parseadas)
+IOL_PANEL_SCHEMA = _get_env_var_optional("IOL_PANEL_SCHEMA", "true").strip().lower() in ("1", "true", "yes", "y")
+# Columnas a conservar de cada panel (vacio = todas); las demas no se materializan
+IOL_PANEL_COLUMNS = [c.strip() for c in os.getenv("IOL_PANEL_COLUMNS", "").split(",") if c.strip()]
+# Decodifica los paneles recorriendo `titulos` por lotes (menos pico de memoria, mas lento que orjson)
+IOL_JSON_STREAM = _get_env_var_optional("IOL_JSON_STREAM", "true").strip().lower() in ("1", "true", "yes", "y")
+
+# Cache de respuestas IOL (ETag/Last-Modified o hash del body); TTL en segundos por endpoint
+IOL_CACHE_ENABLED = _get_env_var_optional("IOL_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "y")
+IOL_CACHE_TTL_COTIZACIONES = float(_get_env_var_optional("IOL_CACHE_TTL_COTIZACIONES", "0"))
+IOL_CACHE_TTL_PANELES = float(_get_env_var_optional("IOL_CACHE_TTL_PANELES", "86400"))
+IOL_CACHE_MAX_MB = float(_get_env_var_optional("IOL_CACHE_MAX_MB", "64"))
+
+# Almacen local de snapshots (Arrow IPC particionado por fecha/instrumento)
+TICKSTORE_ENABLED = _get_env_var_optional("TICKSTORE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "y")
+TICKSTORE_DIR = _get_env_var_optional("TICKSTORE_DIR", "data")
+
+# Reintentos con backoff, rate limit por host y circuit breaker (IOL, auth ROFEX, Sheets)
+RETRY_MAX_ATTEMPTS = int(_get_env_var_optional("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_SECONDS = float(_get_env_var_optional("RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(_get_env_var_optional("RETRY_MAX_SECONDS", "30"))
+IOL_RATE_PER_SEC = float(_get_env_var_optional("IOL_RATE_PER_SEC", "5"))
+SHEETS_RATE_PER_MIN = float(_get_env_var_optional("SHEETS_RATE_PER_MIN", "60"))
+CIRCUIT_FAILURES = int(_get_env_var_optional("CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET_SECONDS = float(_get_env_var_optional("CIRCUIT_RESET_SECONDS", "60"))
+
+# Pipeline captura -> sinks: colas coalescentes por pestaña/panel y un hilo por destino
+PIPELINE_ASYNC = _get_env_var_optional("PIPELINE_ASYNC", "true").strip().lower() in ("1", "true", "yes", "y")
+PIPELINE_MAX_PENDING = int(_get_env_var_optional("PIPELINE_MAX_PENDING", "32"))
+# Si se configura, cada snapshot tambien se escribe como <dir>/<tab>.csv
+PIPELINE_CSV_DIR = os.getenv("PIPELINE_CSV_DIR", "")
+
+# Metricas por etapa: lineas JSON en el log, un registro por ciclo en METRICS_FILE y
+# opcionalmente un archivo de texto para el textfile collector de Prometheus
+METRICS_ENABLED = _get_env_var_optional("METRICS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "y")
+METRICS_FILE = _get_env_var_optional("METRICS_FILE", "logs/metrics.jsonl")
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE", "")
+
+# Analitica de bonos (TIR, duration, valor tecnico, paridad) con los flujos de CASHFLOWS_FILE
+BOND_ANALYTICS_ENABLED = _get_env_var_optional("BOND_ANALYTICS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "y")
+CASHFLOWS_FILE = _get_env_var_optional("CASHFLOWS_FILE", "cashflows.csv")
+# Liquidacion en dias corridos desde hoy (24hs = 1)
+BOND_SETTLEMENT_DAYS = int(_get_env_var_optional("BOND_SETTLEMENT_DAYS", "1"))
+
+# Dolar MEP/CCL implicito en los pares peso/D/C del panel de bonos, en su propia pestaña
+FX_ENABLED = _get_env_var_optional("FX_ENABLED", "true").strip().lower() in ("1", "true", "yes", "y")
+SHEET_FX_TAB = _get_env_var_optional("SHEET_FX_TAB", "FX")
+
+# Barras intradiarias OHLCV/VWAP incrementales (bars.py) de los paneles de IOL y del stream de ROFEX
+BARS_ENABLED = _get_env_var_optional("BARS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "y")
+BARS_INTERVALS = [int(m) for m in _get_env_var_optional("BARS_INTERVALS", "1,5,15").split(",") if m.strip()]
+# Barras cerradas que se conservan en memoria por simbolo e intervalo (ring buffer)
+BARS_HISTORY = int(_get_env_var_optional("BARS_HISTORY", "32"))
+SHEET_BARS_TAB = _get_env_var_optional("SHEET_BARS_TAB", "BARRAS")
 
 # Google Sheets (bonos)
-SHEET_BONOS_ID = _get_env_var("SHEET_BONOS_ID")
 SHEET_BONOS_TAB = _get_env_var_optional("SHEET_BONOS_TAB", "BONOS")
+# Con SHEETS_ENABLED=false la planilla deja de actualizarse y solo queda el tickstore
+SHEETS_ENABLED = _get_env_var_optional("SHEETS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "y")
 SHEET_CLEAR = _get_env_var_optional("SHEET_CLEAR", "false").lower() in ("1", "true", "yes", "y")
+# Escribe solo las celdas que cambiaron respecto del ultimo ciclo (ignorado si SHEET_CLEAR=true)
+SHEET_INCREMENTAL = _get_env_var_optional("SHEET_INCREMENTAL", "true").lower() in ("1", "true", "yes", "y")
+
+
+# --------------------
+# Variables obligatorias por subsistema
+# --------------------
+# Se validan recien cuando el subsistema las usa (config.IOL_USER, etc.), asi un fetch a
+# disco no necesita credenciales de Google ni `python -m mercado check` falla al importar.
+_REQUIRED = {
+    "IOL_USER": lambda: _get_env_var("IOL_USER"),
+    "IOL_PASS": lambda: _get_env_var("IOL_PASS"),
+    # Path to the Google service account JSON file (kept outside the repo).
+    "GOOGLE_SERVICE_ACCOUNT_JSON": lambda: _get_file_path("GOOGLE_SERVICE_ACCOUNT_JSON"),
+    "SHEET_BONOS_ID": lambda: _get_env_var("SHEET_BONOS_ID"),
+}
+
+SUBSYSTEMS = {
+    "iol": ("IOL_USER", "IOL_PASS"),
+    "sheets": ("GOOGLE_SERVICE_ACCOUNT_JSON", "SHEET_BONOS_ID"),
+    "rofex": (),
+}
+
+
+def __getattr__(name: str):
+    if name in _REQUIRED:
+        value = _REQUIRED[name]()
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def require(subsystem: str) -> None:
+    """Valida las variables de un subsistema (iol, sheets, rofex); levanta RuntimeError/FileNotFoundError."""
+    for name in SUBSYSTEMS[subsystem]:
+        if name not in globals():
+            __getattr__(name)
+    if subsystem == "rofex" and ENABLE_ROFEX and (not ROFEX_USER or not ROFEX_PASS):
+        raise RuntimeError("ENABLE_ROFEX=true but ROFEX_USER/ROFEX_PASS are missing")
+
+
+def check(subsystems=None) -> dict:
+    """Estado de cada subsistema: None si esta bien configurado o el mensaje de error."""
+    out = {}
+    for subsystem in subsystems or SUBSYSTEMS:
+        try:
+            require(subsystem)
+            out[subsystem] = None
+        except (RuntimeError, FileNotFoundError) as e:
+            out[subsystem] = str(e)
+    return out
@@ -0,0 +1,149 @@
+"""Decodificacion rapida de los paneles de IOL.
+
+- `loads` usa orjson si esta instalado (opcional, `pip install orjson`) y json de la
+  stdlib si no.
+- `records_frame` arma el DataFrame columna por columna a partir de la lista de titulos,
+  en vez de `pd.DataFrame(lista_de_dicts)`, que primero copia todo a una matriz 2D de
+  objetos. Acepta una proyeccion de columnas para no materializar las que no se usan.
+  El resultado es identico al de `pd.DataFrame(records)` (mismo orden de columnas, NaN
+  para claves ausentes).
+- `stream_frame` recorre el array `titulos` del body por lotes de titulos (scanner de la
+  stdlib) y agrega cada lote a sus columnas: nunca existe la lista completa de dicts y las
+  columnas que no pasan la proyeccion se descartan al vuelo. Es mas lento que orjson pero
+  baja el pico de memoria, que es lo que importa en los paneles grandes.
+"""
+
+import json
+import re
+from typing import Any, Callable, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+_skip_ws = re.compile(r"[ \t\n\r]*").match
+
+
+def loads(body: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def record_columns(records: List[dict]) -> List[str]:
+    """Orden de columnas de pd.DataFrame(records): claves en orden de aparicion."""
+    first = records[0].keys()
+    if all(r.keys() == first for r in records):
+        return list(first)
+    return list(dict.fromkeys(k for r in records for k in r))
+
+
+def records_frame(records: List[dict], columns: Iterable[str] | None = None) -> pd.DataFrame:
+    """DataFrame desde una lista de dicts construyendo cada columna directamente."""
+    if not records:
+        return pd.DataFrame(columns=list(columns) if columns else None)
+    cols = list(columns) if columns else record_columns(records)
+    nan = np.nan
+    # Cada columna se tipa apenas se arma: no conviven todas las listas intermedias
+    data = {c: pd.Series([r.get(c, nan) for r in records], name=c) for c in cols}
+    return pd.DataFrame(data, columns=cols, copy=False)
+
+
+def _ws(s: str, i: int) -> int:
+    return _skip_ws(s, i).end()
+
+
+def _scanner() -> Callable[[str, int], tuple[Any, int]]:
+    """raw_decode que comparte las claves entre titulos (el memo del scanner se vacia en cada llamada)."""
+    keys: dict = {}
+
+    def pairs(items, _key=keys.setdefault):
+        return {_key(k, k): v for k, v in items}
+
+    return json.JSONDecoder(object_pairs_hook=pairs).raw_decode
+
+
+def _stream_columns(s: str, i: int, keep: Callable[[str], bool] | None, batch: int = 256) -> tuple[dict, int]:
+    """Array de objetos que empieza en s[i] ('[') -> columnas; devuelve tambien donde termina.
+
+    Los titulos se decodifican de a `batch`: solo ese lote de dicts existe a la vez.
+    """
+    cols: dict = {}
+    n = 0
+    nan = np.nan
+    seen: set = set()
+    pending: List[dict] = []
+    scan = _scanner()
+
+    def flush() -> None:
+        nonlocal n
+        for r in pending:
+            if not seen.issuperset(r):
+                for c in r:
+                    if c not in seen:
+                        seen.add(c)
+                        if keep is None or keep(c):
+                            cols[c] = [nan] * n
+        for c, col in cols.items():
+            col.extend([r.get(c, nan) for r in pending])
+        n += len(pending)
+        pending.clear()
+
+    i = _ws(s, i + 1)
+    while s[i] != "]":
+        rec, i = scan(s, i)
+        pending.append(rec)
+        if len(pending) >= batch:
+            flush()
+        i = _ws(s, i)
+        if s[i] == ",":
+            i = _ws(s, i + 1)
+        elif s[i] != "]":
+            raise ValueError(f"JSON invalido en la posicion {i}")
+    flush()
+    return cols, i + 1
+
+
+def stream_frame(body: bytes | str, key: str = "titulos", keep: Callable[[str], bool] | None = None) -> pd.DataFrame | None:
+    """DataFrame del array `body[key]` sin materializar la lista de dicts.
+
+    `keep(columna)` proyecta las columnas. Devuelve None si el body no es un objeto con
+    `key` como array (el que llama decide como decodificarlo). JSON mal formado: ValueError.
+    """
+    s = body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body
+    scan = _scanner()
+    try:
+        i = _ws(s, 0)
+        if s[i] != "{":
+            return None
+        i = _ws(s, i + 1)
+        cols = None
+        while s[i] != "}":
+            name, i = scan(s, i)
+            i = _ws(s, i)
+            if s[i] != ":":
+                raise ValueError(f"JSON invalido en la posicion {i}")
+            i = _ws(s, i + 1)
+            if name == key and cols is None and s[i] == "[":
+                cols, i = _stream_columns(s, i, keep)
+            else:
+                _, i = scan(s, i)
+            i = _ws(s, i)
+            if s[i] == ",":
+                i = _ws(s, i + 1)
+            elif s[i] != "}":
+                raise ValueError(f"JSON invalido en la posicion {i}")
+    except IndexError:
+        raise ValueError("JSON incompleto") from None
+    if cols is None:
+        return None
+    del s
+    # Cada lista se libera apenas se convierte en Series
+    data = {c: pd.Series(cols.pop(c), name=c) for c in list(cols)}
+    return pd.DataFrame(data, columns=list(data), copy=False)
@@ -0,0 +1,161 @@
+"""Cache de respuestas HTTP (GET JSON) para los endpoints de IOL.
+
+- Dentro del TTL del endpoint se responde desde memoria, sin ir a la red.
+- Vencido el TTL se revalida con If-None-Match / If-Modified-Since cuando el servidor
+  mando ETag / Last-Modified; un 304 reutiliza el JSON ya parseado.
+- Si el servidor no manda validadores, se compara un hash del body: si no cambio,
+  no se vuelve a parsear.
+- El tamaño total se acota por bytes y se desaloja lo usado hace mas tiempo (LRU).
+
+`CachedResponse.changed` indica si el payload es distinto del que ya se habia visto,
+para que el pipeline pueda saltear transformacion y exportacion.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+import requests
+
+import fastjson
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    etag: str | None
+    last_modified: str | None
+    digest: str
+    data: Any
+    size: int
+    fetched_at: float
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    data: Any = None
+    changed: bool = True
+    from_cache: bool = False
+    response: requests.Response | None = None
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.response.text if self.response is not None else ""
+
+
+class ResponseCache:
+    """LRU acotado por bytes con revalidacion condicional."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, url: str) -> _Entry | None:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def _put(self, url: str, entry: _Entry) -> None:
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self._bytes -= old.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[url] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def invalidate(self, url: str) -> None:
+        """Olvida una URL: el proximo GET se considera cambiado aunque el payload sea igual."""
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_json(
+        self,
+        session: requests.Session,
+        url: str,
+        headers: Dict[str, str] | None = None,
+        ttl: float = 0,
+        timeout: float = 10,
+        decode: Callable[[bytes], Any] = fastjson.loads,
+    ) -> CachedResponse:
+        """GET con cache. Errores HTTP se devuelven sin cachear; errores de red o de JSON se propagan.
+
+        `decode` convierte el body en lo que se guarda y se devuelve en `data` (por defecto el JSON).
+        """
+        entry = self._get(url)
+        now = time.monotonic()
+        if entry is not None and now - entry.fetched_at < ttl:
+            self.hits += 1
+            return CachedResponse(200, entry.data, changed=False, from_cache=True)
+
+        req_headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                req_headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                req_headers["If-Modified-Since"] = entry.last_modified
+
+        response = session.get(url, headers=req_headers, timeout=timeout)
+
+        if response.status_code == 304 and entry is not None:
+            self.revalidated += 1
+            entry.fetched_at = now
+            return CachedResponse(200, entry.data, changed=False, from_cache=True, response=response)
+
+        if not response.ok:
+            return CachedResponse(response.status_code, changed=True, response=response)
+
+        body = response.content
+        digest = hashlib.sha1(body).hexdigest()
+        if entry is not None and entry.digest == digest:
+            self.revalidated += 1
+            entry.fetched_at = now
+            entry.etag = response.headers.get("ETag") or entry.etag
+            entry.last_modified = response.headers.get("Last-Modified") or entry.last_modified
+            return CachedResponse(response.status_code, entry.data, changed=False, from_cache=True, response=response)
+
+        self.misses += 1
+        data = decode(body)
+        self._put(
+            url,
+            _Entry(
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                digest=digest,
+                data=data,
+                size=len(body),
+                fetched_at=now,
+            ),
+        )
+        return CachedResponse(response.status_code, data, changed=True, response=response)
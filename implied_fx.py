@@ -0,0 +1,144 @@
+"""Dolar MEP y CCL implicitos en los pares peso/dolar del panel de bonos.
+
+El panel de Bonos trae la especie en pesos y sus lineas en dolares del mismo bono:
+AL30 (pesos), AL30D (MEP) y AL30C (cable). Para cada par:
+
+    compra = ask pesos / bid dolar   (comprar el bono en pesos y venderlo en dolares)
+    venta  = bid pesos / ask dolar   (comprar en dolares y vender en pesos)
+    ultimo = ultimo pesos / ultimo dolar
+
+`spread` es (compra - venta) / punto medio y `vs_mediana` el desvio del ultimo contra la
+mediana de su tipo (MEP o CCL) en el snapshot, para detectar pares desalineados.
+
+El indice de pares (posicion de la especie en pesos y en dolares dentro del frame) se arma
+una vez por lista de simbolos; mientras IOL devuelva el mismo panel, cada ciclo es solo un
+take de NumPy sobre las columnas de precios.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Sufijo de la especie en dolares -> tipo de cambio implicito
+FX_SUFFIXES = {"D": "MEP", "C": "CCL"}
+FX_COLUMNS = ["bono", "tipo", "simbolo_usd", "ultimo", "compra", "venta", "spread", "vs_mediana"]
+# Una fila por bono y tipo: clave de la pestaña para la escritura incremental
+FX_KEY = ("bono", "tipo")
+
+
+@dataclass
+class _PairIndex:
+    bono: np.ndarray  # simbolo en pesos (P,)
+    tipo: np.ndarray  # "MEP" / "CCL" (P,)
+    simbolo_usd: np.ndarray  # (P,)
+    peso_pos: np.ndarray  # posicion de la especie en pesos en el frame (P,)
+    usd_pos: np.ndarray  # posicion de la especie en dolares (P,)
+
+
+_index: _PairIndex | None = None
+_index_key: Tuple[str, ...] | None = None
+
+
+def _build_index(simbolos: Tuple[str, ...]) -> _PairIndex:
+    # Si un simbolo se repite vale la primera aparicion
+    pos: Dict[str, int] = {}
+    for i, s in enumerate(simbolos):
+        pos.setdefault(s, i)
+
+    pairs = []
+    for s, i in pos.items():
+        if len(s) < 2 or s[-1] not in FX_SUFFIXES:
+            continue
+        base = pos.get(s[:-1])
+        if base is not None:
+            pairs.append((s[:-1], FX_SUFFIXES[s[-1]], s, base, i))
+    pairs.sort(key=lambda p: (p[1], p[0]))
+
+    cols = list(zip(*pairs)) if pairs else [(), (), (), (), ()]
+    return _PairIndex(
+        bono=np.array(cols[0], dtype=object),
+        tipo=np.array(cols[1], dtype=object),
+        simbolo_usd=np.array(cols[2], dtype=object),
+        peso_pos=np.array(cols[3], dtype=np.intp),
+        usd_pos=np.array(cols[4], dtype=np.intp),
+    )
+
+
+def pair_index(simbolos) -> _PairIndex:
+    """Indice de pares cacheado; se reconstruye solo si cambia la lista de simbolos."""
+    global _index, _index_key
+    key = tuple(simbolos)
+    if key != _index_key:
+        _index = _build_index(key)
+        _index_key = key
+        logger.debug("Indice de pares MEP/CCL: %s pares sobre %s simbolos", len(_index.bono), len(key))
+    return _index
+
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = num / den
+    return np.where((num > 0) & (den > 0), out, np.nan)
+
+
+def compute(bonos_df: pd.DataFrame, bid: str, ask: str, last: str = "ultimoPrecio") -> pd.DataFrame:
+    """Tabla de MEP/CCL implicitos (una fila por par) a partir de la salida de transform_bonos."""
+    if bonos_df.empty or "simbolo" not in bonos_df.columns:
+        return pd.DataFrame(columns=FX_COLUMNS)
+
+    with metrics.stage("fx", rows=len(bonos_df)) as m:
+        idx = pair_index(bonos_df["simbolo"].astype(str).to_numpy())
+        m["pairs"] = len(idx.bono)
+        if not len(idx.bono):
+            return pd.DataFrame(columns=FX_COLUMNS)
+
+        def col(name: str) -> np.ndarray:
+            if name not in bonos_df.columns:
+                return np.full(len(bonos_df), np.nan)
+            return pd.to_numeric(bonos_df[name], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+        px_bid, px_ask, px_last = col(bid), col(ask), col(last)
+        p, u = idx.peso_pos, idx.usd_pos
+        ultimo = _ratio(px_last[p], px_last[u])
+        compra = _ratio(px_ask[p], px_bid[u])
+        venta = _ratio(px_bid[p], px_ask[u])
+        with np.errstate(invalid="ignore"):
+            spread = (compra - venta) / ((compra + venta) / 2)
+
+        fx = pd.DataFrame(
+            {
+                "bono": idx.bono,
+                "tipo": idx.tipo,
+                "simbolo_usd": idx.simbolo_usd,
+                "ultimo": ultimo,
+                "compra": compra,
+                "venta": venta,
+                "spread": spread,
+            }
+        )
+        mediana = fx.groupby("tipo")["ultimo"].transform("median")
+        fx["vs_mediana"] = fx["ultimo"] / mediana - 1
+        return fx
+
+
+def summary(fx: pd.DataFrame) -> Dict[str, dict]:
+    """Estadisticas por tipo: pares con precio, mediana/min/max del ultimo y spread medio y maximo."""
+    out = {}
+    for tipo, g in fx.groupby("tipo"):
+        ultimo = g["ultimo"].dropna()
+        out[tipo] = {
+            "pares": int(len(ultimo)),
+            "mediana": float(ultimo.median()) if len(ultimo) else float("nan"),
+            "min": float(ultimo.min()) if len(ultimo) else float("nan"),
+            "max": float(ultimo.max()) if len(ultimo) else float("nan"),
+            "spread_medio": float(g["spread"].mean()),
+            "spread_max": float(g["spread"].max()),
+        }
+    return out
@@ -0,0 +1,246 @@
+"""Maestro de instrumentos: contratos de ROFEX (por CFI code) y miembros de los paneles de IOL.
+
+Se arma a lo sumo una vez por dia y queda en `.cache/`; el resto del dia se responde desde
+memoria o desde esos archivos, sin llamadas REST:
+
+- ROFEX: `GET /rest/instruments/byCFICode` (ROFEX_FUTURES_CFI) solo si el cache no es de
+  hoy y hay token. Se guardan los futuros simples (`DLR/ENE26`; sin pases ni opciones)
+  indexados por simbolo, subyacente y vencimiento, en `instrumentos.json`.
+- IOL: mercado.py registra los simbolos de cada panel que descarga (`record_panel`) en
+  `paneles_iol.json`; se reescribe solo si cambian.
+
+Cada archivo tiene un solo escritor (API_ROFEX el de ROFEX, mercado el de paneles), asi el
+maestro que un proceso tiene en memoria nunca pisa lo que el otro actualizo.
+
+`futures_strip` devuelve los proximos ROFEX_STRIP_SIZE contratos vivos del subyacente. Sin
+cache ni token (primer arranque sin red) se arma con el calendario: un contrato por mes con
+vencimiento a fin de mes.
+"""
+
+import datetime as dt
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+import requests
+from pandas.tseries.offsets import MonthEnd
+
+import resilience
+from config import ROFEX_API_URL, ROFEX_FUTURES_CFI, ROFEX_STRIP_SIZE, ROFEX_UNDERLYING
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = Path(".cache") / "instrumentos.json"
+PANELES_FILE = Path(".cache") / "paneles_iol.json"
+MESES = ("ENE", "FEB", "MAR", "ABR", "MAY", "JUN", "JUL", "AGO", "SEP", "OCT", "NOV", "DIC")
+_FUTURE_RE = re.compile(r"^(?P<underlying>[A-Z0-9.]+)/(?P<mes>[A-Z]{3})(?P<anio>\d{2})$")
+ROFEX_COLUMNS = ["symbol", "underlying", "maturity", "market_id", "cficode"]
+
+# Bloque "Dólar futuro": la columna 1 es el timestamp y cada contrato ocupa 4 (BI/OF size y price)
+BLOCK_FIRST_COLUMN = 2
+BLOCK_WIDTH = 4
+
+
+# --------------------
+# Codigos de contrato
+# --------------------
+def parse_future(symbol: str) -> Tuple[str, pd.Timestamp] | None:
+    """'DLR/ENE26' -> ('DLR', 2026-01-31). None si no es un futuro simple."""
+    m = _FUTURE_RE.match(symbol)
+    if not m or m["mes"] not in MESES:
+        return None
+    month = MESES.index(m["mes"]) + 1
+    return m["underlying"], pd.Timestamp(2000 + int(m["anio"]), month, 1) + MonthEnd(0)
+
+
+def future_symbol(underlying: str, fecha: dt.date) -> str:
+    return f"{underlying}/{MESES[fecha.month - 1]}{fecha.year % 100:02d}"
+
+
+def strip_columns(n: int) -> List[int]:
+    """Columna de inicio de cada contrato en el bloque exportado: 2, 6, 10, ..."""
+    return [BLOCK_FIRST_COLUMN + BLOCK_WIDTH * i for i in range(n)]
+
+
+# --------------------
+# Maestro
+# --------------------
+class InstrumentMaster:
+    """Indice en memoria del maestro de un dia."""
+
+    def __init__(self, fecha: dt.date, rofex: pd.DataFrame, iol: Dict[str, List[str]]) -> None:
+        self.fecha = fecha
+        self.rofex = rofex.set_index("symbol", drop=False).sort_values(["underlying", "maturity"])
+        self.iol = iol
+        self._by_underlying = {u: g for u, g in self.rofex.groupby("underlying", sort=False)}
+
+    def by_symbol(self, symbol: str) -> dict | None:
+        if symbol not in self.rofex.index:
+            return None
+        return self.rofex.loc[symbol].to_dict()
+
+    def by_underlying(self, underlying: str) -> pd.DataFrame:
+        """Contratos del subyacente ordenados por vencimiento."""
+        return self._by_underlying.get(underlying, self.rofex.iloc[0:0])
+
+    def futures_strip(self, underlying: str = ROFEX_UNDERLYING, size: int = ROFEX_STRIP_SIZE, today: dt.date | None = None) -> List[str]:
+        """Proximos `size` contratos que todavia no vencieron."""
+        today = pd.Timestamp(today or dt.date.today())
+        vivos = self.by_underlying(underlying)
+        vivos = vivos[vivos["maturity"] >= today]
+        if not vivos.empty:
+            return vivos["symbol"].iloc[:size].tolist()
+        # Sin maestro de ROFEX: un contrato por mes desde el actual
+        logger.warning("Sin contratos de %s en el maestro; se arma el strip por calendario", underlying)
+        return [future_symbol(underlying, (today + pd.DateOffset(months=i)).date()) for i in range(size)]
+
+    def panel_members(self, instrumento: str, panel: str) -> List[str]:
+        return self.iol.get(f"{instrumento}/{panel}", [])
+
+
+_master: InstrumentMaster | None = None
+
+
+def _empty_rofex() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c == "maturity" else object) for c in ROFEX_COLUMNS})
+
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        if not path.exists():
+            return None
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning("No se pudo leer %s: %s", path, e)
+        return None
+
+
+def _write_json(path: Path, data: dict) -> None:
+    try:
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.warning("No se pudo guardar %s: %s", path, e)
+
+
+def _load_paneles() -> Dict[str, List[str]]:
+    data = _read_json(PANELES_FILE)
+    if data is None:
+        # Caches anteriores guardaban los paneles dentro de instrumentos.json
+        data = _read_json(CACHE_FILE) or {}
+    return data.get("iol", {})
+
+
+def _load_cache() -> InstrumentMaster | None:
+    data = _read_json(CACHE_FILE)
+    if data is None:
+        return None
+    try:
+        rofex = pd.DataFrame(data.get("rofex", []), columns=ROFEX_COLUMNS)
+        rofex["maturity"] = pd.to_datetime(rofex["maturity"])
+        return InstrumentMaster(dt.date.fromisoformat(data["fecha"]), rofex, _load_paneles())
+    except Exception as e:
+        logger.warning("No se pudo leer %s: %s", CACHE_FILE, e)
+        return None
+
+
+def _save_cache(master: InstrumentMaster) -> None:
+    """Solo la parte de ROFEX; los paneles de IOL van en su propio archivo."""
+    data = {
+        "fecha": master.fecha.isoformat(),
+        "rofex": [
+            {**r, "maturity": r["maturity"].date().isoformat()} for r in master.rofex[ROFEX_COLUMNS].to_dict("records")
+        ],
+    }
+    _write_json(CACHE_FILE, data)
+
+
+def fetch_rofex(token: str, cfi: str = ROFEX_FUTURES_CFI) -> pd.DataFrame:
+    """Futuros simples de ROFEX para un CFI code (una llamada REST)."""
+    r = resilience.call(
+        "rofex",
+        lambda: requests.get(
+            f"{ROFEX_API_URL}/rest/instruments/byCFICode",
+            params={"CFICode": cfi},
+            headers={"X-Auth-Token": token},
+            timeout=10,
+        ),
+        "ROFEX instrumentos",
+    )
+    r.raise_for_status()
+    rows = []
+    for inst in r.json().get("instruments", []):
+        ident = inst.get("instrumentId", {})
+        symbol = ident.get("symbol", "")
+        parsed = parse_future(symbol)
+        if parsed is None:
+            continue
+        underlying, maturity = parsed
+        # maturityDate viene como YYYYMMDD; si falta, fin del mes del codigo
+        if inst.get("maturityDate"):
+            maturity = pd.to_datetime(str(inst["maturityDate"]), format="%Y%m%d", errors="coerce")
+            if pd.isna(maturity):
+                maturity = parsed[1]
+        rows.append(
+            {
+                "symbol": symbol,
+                "underlying": underlying,
+                "maturity": maturity,
+                "market_id": ident.get("marketId", "ROFX"),
+                "cficode": inst.get("cficode", cfi),
+            }
+        )
+    if not rows:
+        return _empty_rofex()
+    return pd.DataFrame(rows, columns=ROFEX_COLUMNS)
+
+
+def get_master(rofex_token: str | None = None, today: dt.date | None = None) -> InstrumentMaster:
+    """Maestro del dia: de memoria, del cache en disco o (una vez por dia) de la API de ROFEX."""
+    global _master
+    today = today or dt.date.today()
+    if _master is None:
+        _master = _load_cache()
+    if _master is not None and (_master.fecha >= today or rofex_token is None):
+        return _master
+
+    iol = _master.iol if _master is not None else {}
+    if rofex_token:
+        try:
+            rofex = fetch_rofex(rofex_token)
+            _master = InstrumentMaster(today, rofex, iol)
+            _save_cache(_master)
+            logger.info("Maestro de instrumentos actualizado: %s contratos de ROFEX", len(rofex))
+            return _master
+        except Exception as e:
+            logger.warning("No se pudo actualizar el maestro de ROFEX (%s); se usa el cache", e)
+    if _master is None:
+        _master = InstrumentMaster(dt.date.min, _empty_rofex(), _load_paneles())
+    return _master
+
+
+def record_panel(instrumento: str, panel: str, simbolos: Iterable[str]) -> None:
+    """Registra los simbolos de un panel de IOL; solo escribe el cache si cambiaron."""
+    master = get_master()
+    members = sorted({str(s) for s in simbolos})
+    key = f"{instrumento}/{panel}"
+    if master.iol.get(key) == members:
+        return
+    master.iol[key] = members
+    # Se relee el archivo para no perder paneles que registro otro proceso
+    paneles = _load_paneles()
+    paneles[key] = members
+    _write_json(PANELES_FILE, {"iol": paneles})
+    logger.info("Panel %s: %s simbolos en el maestro", key, len(members))
+
+
+def futures_strip(rofex_token: str | None = None, underlying: str = ROFEX_UNDERLYING, size: int = ROFEX_STRIP_SIZE) -> List[str]:
+    return get_master(rofex_token).futures_strip(underlying, size)
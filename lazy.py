@@ -0,0 +1,52 @@
+"""Imports diferidos para las dependencias pesadas (pandas, pyarrow, gspread, google-auth).
+
+    pd = lazy_import("pandas")
+
+devuelve un modulo sustituto: el import real (`importlib.import_module`) ocurre en el primer
+acceso a un atributo (`pd.DataFrame`). Hasta entonces el modulo no esta en sys.modules, asi
+`import mercado` o `python -m mercado check` no pagan el costo de Sheets ni de pandas si no
+los usan.
+
+Las anotaciones de tipo que nombran estos modulos no deben evaluarse al importar: los
+modulos que los usan declaran `from __future__ import annotations`.
+"""
+
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+
+
+class _LazyModule(ModuleType):
+    """Sustituto de `name`: al primer atributo importa el modulo real y copia su espacio de nombres."""
+
+    def __getattr__(self, attr: str):
+        # import_module toma el lock de import de Python: es seguro desde varios hilos
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Modulo `name` con carga diferida (si ya estaba importado, el mismo modulo)."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return _LazyModule(name)
+
+
+def load(*modules: ModuleType) -> None:
+    """Fuerza la carga de modulos diferidos desde el hilo actual.
+
+    Lo que van a usar los workers (fetch en paralelo, sinks del pipeline) se carga antes
+    desde el hilo principal, asi el costo del import no cae dentro de la etapa medida.
+    """
+    for module in modules:
+        getattr(module, "__file__", None)  # cualquier atributo que falte dispara la carga
+
+
+def is_loaded(name: str) -> bool:
+    """True si el modulo ya se ejecuto (no cuenta los que siguen diferidos)."""
+    return name in sys.modules
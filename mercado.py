@@ -1,25 +1,69 @@
+"""Ciclo IOL -> transformaciones -> Sheets / tickstore / CSV.
+
+    python -m mercado [export]        ciclo completo (lo que corre scheduler.py)
+    python -m mercado fetch [--out d] solo descarga y guarda a disco, sin Sheets
+    python -m mercado check           valida la configuracion de cada subsistema
+
+pandas, requests, gspread, pyarrow y los modulos de cada etapa se importan recien cuando
+la etapa se usa (lazy.py): `import mercado` y `check` no los cargan.
+"""
+
+from __future__ import annotations
+
+import argparse
 import datetime as dt
 import json
 import logging
 import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, List, Tuple
 
-import gspread
-import pandas as pd
-import requests
-from gspread_dataframe import set_with_dataframe
-from google.oauth2.service_account import Credentials
+import config
+import lazy
+import metrics
 from config import (
-    GOOGLE_SERVICE_ACCOUNT_JSON,
-    IOL_PASS,
-    IOL_USER,
-    SHEET_BONOS_ID,
+    BARS_ENABLED,
+    BONOS_PANELS,
+    FX_ENABLED,
+    IOL_BASE_URL,
+    IOL_CACHE_ENABLED,
+    IOL_CACHE_MAX_MB,
+    IOL_CACHE_TTL_COTIZACIONES,
+    IOL_CACHE_TTL_PANELES,
+    IOL_MAX_WORKERS,
+    IOL_JSON_STREAM,
+    IOL_PANEL_COLUMNS,
+    IOL_PANEL_SCHEMA,
+    IOL_TIMEOUT,
+    PIPELINE_CSV_DIR,
+    SHEET_BARS_TAB,
     SHEET_BONOS_TAB,
     SHEET_CLEAR,
+    SHEET_FX_TAB,
+    SHEET_INCREMENTAL,
+    SHEETS_ENABLED,
+    TICKSTORE_ENABLED,
 )
 
+pd = lazy.lazy_import("pandas")
+requests = lazy.lazy_import("requests")
+bars = lazy.lazy_import("bars")
+bond_analytics = lazy.lazy_import("bond_analytics")
+fastjson = lazy.lazy_import("fastjson")
+http_cache = lazy.lazy_import("http_cache")
+implied_fx = lazy.lazy_import("implied_fx")
+instrumentos = lazy.lazy_import("instrumentos")
+panel_schema = lazy.lazy_import("panel_schema")
+pipeline = lazy.lazy_import("pipeline")
+resilience = lazy.lazy_import("resilience")
+sheets = lazy.lazy_import("sheets")
+tickstore = lazy.lazy_import("tickstore")
+
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(exist_ok=True)
@@ -29,12 +73,15 @@ CACHE_DIR.mkdir(exist_ok=True)
 CACHE_ACC_PANEL = CACHE_DIR / "panel_acciones.json"
 
 
+# Modulos auxiliares que loguean en mercado.log junto con este
+_LOGGERS = (__name__, "sheets", "tickstore", "http_cache", "metrics", "resilience", "pipeline", "bond_analytics", "implied_fx", "instrumentos", "bars")
+
+
 def _setup_logging() -> logging.Logger:
     logger = logging.getLogger(__name__)
     if logger.handlers:
         return logger
 
-    logger.setLevel(LOG_LEVEL)
     formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 
     stream_handler = logging.StreamHandler()
@@ -43,21 +90,62 @@ def _setup_logging() -> logging.Logger:
     file_handler = RotatingFileHandler(LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
     file_handler.setFormatter(formatter)
 
-    logger.addHandler(stream_handler)
-    logger.addHandler(file_handler)
+    for name in _LOGGERS:
+        module_logger = logging.getLogger(name)
+        module_logger.setLevel(LOG_LEVEL)
+        module_logger.addHandler(stream_handler)
+        module_logger.addHandler(file_handler)
+        # Tiene sus propios handlers: evita duplicar lineas cuando corre dentro de scheduler.py
+        module_logger.propagate = False
     return logger
 
 
 logger = _setup_logging()
 
+# Estado que se mantiene "caliente" entre ciclos cuando scheduler.py corre en el mismo proceso
+# (el cliente de Google Sheets vive en sheets.py)
+_session: requests.Session | None = None
+_response_cache: http_cache.ResponseCache | None = None
+# La primera llamada puede ocurrir dentro de los workers de fetch_paneles (token en cache)
+_state_lock = threading.Lock()
+
+
+def _get_response_cache() -> http_cache.ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        with _state_lock:
+            if _response_cache is None:
+                _response_cache = http_cache.ResponseCache(max_bytes=int(IOL_CACHE_MAX_MB * 1024 * 1024))
+    return _response_cache
+
+
+def _get_session() -> requests.Session:
+    """Sesion HTTP compartida (keep-alive) para todas las llamadas a IOL."""
+    global _session
+    if _session is None:
+        with _state_lock:
+            if _session is None:
+                session = requests.Session()
+                # Un pool con lugar para todos los workers: cada hilo reutiliza su conexion TLS
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(IOL_MAX_WORKERS, 1))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session  # se publica ya montada: otro hilo no ve una sesion a medias
+    return _session
+
 
 # --------------------
 # IOL Auth / Token
 # --------------------
+TOKEN_CACHE = CACHE_DIR / "iol_token.json"
+TOKEN_MARGIN_SECONDS = 120
+
+
 def pedirtoken() -> dict:
-    url = "https://api.invertironline.com/token"
-    data = {"username": IOL_USER, "password": IOL_PASS, "grant_type": "password"}
-    response = requests.post(url=url, data=data, timeout=10)
+    url = f"{IOL_BASE_URL}/token"
+    data = {"username": config.IOL_USER, "password": config.IOL_PASS, "grant_type": "password"}
+    with metrics.stage("token", grant="password"):
+        response = resilience.call("iol", lambda: _get_session().post(url=url, data=data, timeout=10), "IOL token")
     if not response.ok:
         logger.error("IOL token error %s: %s", response.status_code, response.text[:300])
     response.raise_for_status()
@@ -66,22 +154,82 @@ def pedirtoken() -> dict:
     return token_data
 
 
-def _expires_in_seconds(token: dict) -> float:
-    exp = dt.datetime.strptime(token[".expires"], "%a, %d %b %Y %H:%M:%S GMT").replace(tzinfo=dt.UTC)
+def refrescartoken(refresh_token: str) -> dict:
+    """Renueva el token con el refresh grant (sin enviar usuario/password)."""
+    url = f"{IOL_BASE_URL}/token"
+    data = {"refresh_token": refresh_token, "grant_type": "refresh_token"}
+    with metrics.stage("token", grant="refresh_token"):
+        response = resilience.call("iol", lambda: _get_session().post(url=url, data=data, timeout=10), "IOL refresh token")
+    if not response.ok:
+        logger.warning("IOL refresh token error %s: %s", response.status_code, response.text[:300])
+    response.raise_for_status()
+    token_data = response.json()
+    logger.info("Token de InvertirOnline renovado con refresh_token")
+    return token_data
+
+
+def _expires_in_seconds(token: dict, key: str = ".expires") -> float:
+    """Segundos hasta el vencimiento; 0 si el campo falta o no se puede parsear."""
+    try:
+        exp = dt.datetime.strptime(token[key], "%a, %d %b %Y %H:%M:%S GMT").replace(tzinfo=dt.UTC)
+    except (KeyError, TypeError, ValueError):
+        return 0.0
     ahora = dt.datetime.now(dt.UTC)
     return (exp - ahora).total_seconds()
 
 
+def _load_token_cache() -> dict:
+    """Devuelve el token guardado en disco (o {} si no hay uno valido)."""
+    try:
+        if not TOKEN_CACHE.exists():
+            return {}
+        with TOKEN_CACHE.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) and data.get("access_token") else {}
+    except Exception as e:
+        logger.debug("No se pudo leer cache de token: %s", e)
+        return {}
+
+
+def _save_token_cache(token: dict) -> None:
+    """Guarda el token de forma atomica para que otros procesos lo reutilicen."""
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        tmp = TOKEN_CACHE.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(token, f)
+        try:
+            os.chmod(tmp, 0o600)
+        except OSError:
+            pass
+        os.replace(tmp, TOKEN_CACHE)
+    except Exception as e:
+        logger.debug("No se pudo guardar cache de token: %s", e)
+
+
 def actualizartoken(token: dict) -> dict:
-    if _expires_in_seconds(token) < 120:
-        return pedirtoken()
-    return token
+    """Renueva el token antes de que venza: refresh grant primero, password grant como fallback."""
+    if token and _expires_in_seconds(token) >= TOKEN_MARGIN_SECONDS:
+        return token
+
+    refresh_token = token.get("refresh_token") if token else None
+    if refresh_token and _expires_in_seconds(token, ".refreshexpires") >= TOKEN_MARGIN_SECONDS:
+        try:
+            nuevo = refrescartoken(refresh_token)
+            _save_token_cache(nuevo)
+            return nuevo
+        except Exception as e:
+            metrics.incr("token_retries")
+            logger.warning("Fallo el refresh del token IOL (%s). Se pide token con usuario/password.", e)
+
+    nuevo = pedirtoken()
+    _save_token_cache(nuevo)
+    return nuevo
 
 
 def get_iol_token() -> dict:
-    """Obtiene y renueva token IOL si es necesario."""
-    tk = pedirtoken()
-    return actualizartoken(tk)
+    """Obtiene token IOL reutilizando el cache en disco y renovandolo si esta por vencer."""
+    return actualizartoken(_load_token_cache())
 
 
 # --------------------
@@ -115,19 +263,58 @@ def _save_panel_cache(panel: str) -> None:
 # --------------------
 # IOL Data
 # --------------------
+class _ResilientSession:
+    """Pasa cada session.get por resilience.call: solo los pedidos reales gastan rate limit."""
+
+    def __init__(self, session: requests.Session, what: str):
+        self._session = session
+        self._what = what
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return resilience.call("iol", lambda: self._session.get(url, **kwargs), self._what)
+
+
+def _iol_get_json(
+    url: str,
+    access_token: str,
+    ttl: float,
+    decode: Callable[[bytes], Any] | None = None,
+) -> http_cache.CachedResponse:
+    """GET a IOL via el cache de respuestas (o directo si IOL_CACHE_ENABLED=false)."""
+    headers = {"Authorization": f"Bearer {access_token}"}
+    decode = decode or fastjson.loads
+    # Los hits del cache no pasan por el rate limit ni cuentan para el circuit breaker
+    session = _ResilientSession(_get_session(), f"IOL GET {url.removeprefix(IOL_BASE_URL)}")
+
+    if IOL_CACHE_ENABLED:
+        result = _get_response_cache().get_json(
+            session, url, headers=headers, ttl=ttl, timeout=IOL_TIMEOUT, decode=decode
+        )
+    else:
+        response = session.get(url, headers=headers, timeout=IOL_TIMEOUT)
+        data = decode(response.content) if response.ok else None
+        result = http_cache.CachedResponse(response.status_code, data, changed=True, response=response)
+
+    if result.response is not None:
+        metrics.incr("iol_requests")
+        metrics.incr("iol_bytes", len(result.response.content))
+    if not result.ok:
+        metrics.incr("iol_errors")
+    return result
+
+
 def listar_paneles(pais: str, instrumento: str, access_token: str) -> List[str]:
     """Lista paneles disponibles para un instrumento."""
-    url = f"https://api.invertironline.com/api/v2/{pais}/Titulos/Cotizacion/Paneles/{instrumento}"
-    headers = {"Authorization": f"Bearer {access_token}"}
+    url = f"{IOL_BASE_URL}/api/v2/{pais}/Titulos/Cotizacion/Paneles/{instrumento}"
 
-    r = requests.get(url, headers=headers, timeout=10)
-    logger.info("IOL GET %s -> %s", url, r.status_code)
+    r = _iol_get_json(url, access_token, IOL_CACHE_TTL_PANELES)
+    logger.info("IOL GET %s -> %s%s", url, r.status_code, " (cache)" if r.from_cache else "")
 
     if not r.ok:
         logger.error("Error listando paneles: %s", r.text[:300])
         return []
 
-    data = r.json()
+    data = r.data
 
     if isinstance(data, list):
         if data and isinstance(data[0], str):
@@ -141,41 +328,80 @@ def listar_paneles(pais: str, instrumento: str, access_token: str) -> List[str]:
     return []
 
 
-def panel(instrumento: str, panel_name: str, pais: str, access_token: str) -> pd.DataFrame:
-    url_base = "https://api.invertironline.com/api/v2/"
-    endpoint = f"Cotizaciones/{instrumento}/{panel_name}/{pais}"
-    url = url_base + endpoint
+def _panel_url(instrumento: str, panel_name: str, pais: str) -> str:
+    return f"{IOL_BASE_URL}/api/v2/Cotizaciones/{instrumento}/{panel_name}/{pais}"
 
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url=url, headers=headers, timeout=10)
 
-    logger.info("IOL GET %s -> %s", endpoint, response.status_code)
+def _forget_panel(instrumento: str, panel_name: str, pais: str = "argentina") -> None:
+    """Si la exportacion fallo, el proximo ciclo no debe saltearla por 'sin cambios'."""
+    _get_response_cache().invalidate(_panel_url(instrumento, panel_name, pais))
 
-    if response.status_code == 404:
-        logger.warning("Endpoint no encontrado (404): %s", endpoint)
-        return pd.DataFrame()
 
-    if not response.ok:
-        logger.error(
-            "IOL error %s en %s. Body (primeros 300 chars): %s",
-            response.status_code,
-            endpoint,
-            response.text[:300],
-        )
-        return pd.DataFrame()
+def _panel_columns(instrumento: str, available: List[str]) -> List[str]:
+    """Columnas del payload que se materializan (panel_schema e IOL_PANEL_COLUMNS)."""
+    cols = panel_schema.columns(instrumento, available) if IOL_PANEL_SCHEMA else list(available)
+    if IOL_PANEL_COLUMNS:
+        cols = [c for c in cols if c in IOL_PANEL_COLUMNS]
+    return cols
 
-    try:
-        data = response.json()
-    except Exception as e:
-        logger.error("ERROR: No se pudo decodificar la respuesta como JSON en %s: %s", endpoint, e)
-        logger.debug("Body (primeros 300 chars): %s", response.text[:300])
-        return pd.DataFrame()
 
-    if isinstance(data, dict) and "titulos" in data:
-        return pd.DataFrame(data["titulos"])
+def _decode_panel(body: bytes, instrumento: str):
+    """Body de Cotizaciones -> DataFrame de titulos tipado segun panel_schema.
+
+    Se decodifica directo a DataFrame para que el cache no retenga la lista de dicts; con
+    IOL_JSON_STREAM la lista completa ni siquiera llega a existir.
+    """
+    if IOL_JSON_STREAM:
+        df = fastjson.stream_frame(body, "titulos", keep=lambda c: bool(_panel_columns(instrumento, [c])))
+        if df is None:
+            return fastjson.loads(body)
+    else:
+        data = fastjson.loads(body)
+        if not (isinstance(data, dict) and "titulos" in data):
+            return data
+        titulos = data["titulos"]
+        df = fastjson.records_frame(titulos, _panel_columns(instrumento, fastjson.record_columns(titulos) if titulos else []))
+    return panel_schema.apply(df, instrumento) if IOL_PANEL_SCHEMA else df
+
 
-    logger.error("ERROR: Respuesta inesperada (sin 'titulos') en %s: %s", endpoint, data)
-    return pd.DataFrame()
+def panel(instrumento: str, panel_name: str, pais: str, access_token: str) -> pd.DataFrame:
+    """Cotizaciones del panel. `df.attrs["changed"]` es False si el payload no cambio desde el ultimo GET."""
+    with metrics.stage("fetch", panel=f"{instrumento}/{panel_name}") as m:
+        endpoint = f"Cotizaciones/{instrumento}/{panel_name}/{pais}"
+        url = _panel_url(instrumento, panel_name, pais)
+
+        try:
+            response = _iol_get_json(url, access_token, IOL_CACHE_TTL_COTIZACIONES, decode=lambda body: _decode_panel(body, instrumento))
+        except ValueError as e:
+            logger.error("ERROR: No se pudo decodificar la respuesta como JSON en %s: %s", endpoint, e)
+            return pd.DataFrame()
+
+        logger.info("IOL GET %s -> %s%s", endpoint, response.status_code, "" if response.changed else " (sin cambios)")
+
+        if response.status_code == 404:
+            logger.warning("Endpoint no encontrado (404): %s", endpoint)
+            return pd.DataFrame()
+
+        if not response.ok:
+            logger.error(
+                "IOL error %s en %s. Body (primeros 300 chars): %s",
+                response.status_code,
+                endpoint,
+                response.text[:300],
+            )
+            return pd.DataFrame()
+
+        data = response.data
+
+        if isinstance(data, pd.DataFrame):
+            # Copia liviana: el DataFrame del cache no se modifica (attrs incluidos)
+            df = data.copy(deep=False)
+            df.attrs["changed"] = response.changed
+            m["rows"] = len(df)
+            return df
+
+        logger.error("ERROR: Respuesta inesperada (sin 'titulos') en %s: %s", endpoint, data)
+        return pd.DataFrame()
 
 
 def fetch_bonos(access_token: str) -> pd.DataFrame:
@@ -188,9 +414,51 @@ def fetch_acciones(access_token: str, panel_name: str) -> pd.DataFrame:
     return panel("Acciones", panel_name, "argentina", access_token)
 
 
+def fetch_paneles(
+    specs: List[Tuple[str, str]],
+    access_token: str,
+    pais: str = "argentina",
+) -> Dict[Tuple[str, str], pd.DataFrame]:
+    """Descarga en paralelo los paneles (instrumento, panel_name) sobre la sesion compartida.
+
+    La concurrencia queda acotada por IOL_MAX_WORKERS y cada request usa IOL_TIMEOUT.
+    Un panel que falla devuelve un DataFrame vacio sin afectar al resto.
+    """
+    if not specs:
+        return {}
+
+    # Los workers no deben disparar la primera carga de un modulo diferido en paralelo
+    lazy.load(pd, requests, fastjson, http_cache, panel_schema, resilience)
+    t0 = time.perf_counter()
+    workers = max(1, min(IOL_MAX_WORKERS, len(specs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="iol-fetch") as pool:
+        futures = {spec: pool.submit(panel, spec[0], spec[1], pais, access_token) for spec in specs}
+
+    frames = {}
+    for spec, future in futures.items():
+        try:
+            frames[spec] = future.result()
+        except Exception as e:
+            logger.error("Error descargando panel %s/%s: %s", spec[0], spec[1], e)
+            frames[spec] = pd.DataFrame()
+
+    logger.info("Fetch de %s panel(es) con %s worker(s) en %.2fs", len(specs), workers, time.perf_counter() - t0)
+    return frames
+
+
 # --------------------
 # Google Sheets
 # --------------------
+def _as_frame(df) -> pd.DataFrame:
+    if isinstance(df, dict):
+        return pd.DataFrame([df])
+    if isinstance(df, pd.Series):
+        return df.to_frame().T
+    if df is None:
+        return pd.DataFrame()
+    return df
+
+
 def export_to_sheets_simple(
     clear: bool,
     df: pd.DataFrame,
@@ -199,45 +467,16 @@ def export_to_sheets_simple(
     columna: int,
     fila: int
 ) -> None:
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-
-    if isinstance(df, dict):
-        df = pd.DataFrame([df])
-    elif isinstance(df, pd.Series):
-        df = df.to_frame().T
-    elif df is None:
-        df = pd.DataFrame()
+    df = _as_frame(df)
 
     if df.empty:
         logger.warning("DataFrame vacio para exportar en sheet '%s'. No se exporta.", sheet_name)
         return
 
-    credentials = Credentials.from_service_account_file(GOOGLE_SERVICE_ACCOUNT_JSON, scopes=scopes)
-    gc = gspread.authorize(credentials)
-
-    sh = gc.open_by_key(sheet_id)
-
-    try:
-        worksheet = sh.worksheet(sheet_name)
-    except gspread.WorksheetNotFound:
-        logger.warning("Worksheet '%s' no existe. Creandola...", sheet_name)
-        worksheet = sh.add_worksheet(title=sheet_name, rows=1000, cols=50)
-
-    if clear:
-        worksheet.clear()
-        logger.info("Hoja '%s' limpiada antes de exportar", sheet_name)
-
-    set_with_dataframe(
-        worksheet,
-        df,
-        col=columna,
-        row=fila,
-        include_index=False,
-        include_column_header=True,
-    )
+    with metrics.stage("export", tab=sheet_name, mode="full") as m:
+        sheets.write_frame(df, sheet_id, sheet_name, columna, fila, clear=clear)
+        m["rows"] = df.shape[0]
+        m["cells"] = df.shape[0] * df.shape[1]
 
     logger.info(
         "Datos exportados a Google Sheets (%s / %s). Filas=%s, Cols=%s",
@@ -248,125 +487,389 @@ def export_to_sheets_simple(
     )
 
 
-def export_df_to_sheet(df: pd.DataFrame, tab_name: str) -> None:
+def export_to_sheets_incremental(
+    df: pd.DataFrame,
+    sheet_id: str,
+    sheet_name: str,
+    columna: int = 1,
+    fila: int = 1,
+    key: str | Tuple[str, ...] = "simbolo",
+) -> None:
+    """Exporta solo las celdas que cambiaron desde la ultima escritura (ver sheets.write_frame_incremental)."""
+    df = _as_frame(df)
+
+    if df.empty:
+        logger.warning("DataFrame vacio para exportar en sheet '%s'. No se exporta.", sheet_name)
+        return
+
+    with metrics.stage("export", tab=sheet_name, mode="incremental") as m:
+        rangos = sheets.write_frame_incremental(df, sheet_id, sheet_name, columna, fila, key=key, clear=SHEET_CLEAR)
+        m["rows"] = df.shape[0]
+        if rangos < 0:
+            m["full_writes"] = 1
+        else:
+            m["ranges"] = rangos
+    if rangos == 0:
+        logger.info("Sin cambios en '%s' (%s filas). No se escribe.", sheet_name, df.shape[0])
+    elif rangos < 0:
+        logger.info(
+            "Datos exportados a Google Sheets (%s / %s). Filas=%s, Cols=%s",
+            sheet_id,
+            sheet_name,
+            df.shape[0],
+            df.shape[1],
+        )
+    else:
+        logger.info(
+            "Datos exportados incrementalmente a Google Sheets (%s / %s). Filas=%s, rangos cambiados=%s",
+            sheet_id,
+            sheet_name,
+            df.shape[0],
+            rangos,
+        )
+
+
+def export_df_to_sheet(df: pd.DataFrame, tab_name: str, key: str | Tuple[str, ...] = "simbolo") -> None:
     """Exporta un DataFrame a la hoja indicada usando SHEET_BONOS_ID."""
-    export_to_sheets_simple(SHEET_CLEAR, df, SHEET_BONOS_ID, tab_name, 1, 1)
+    if not SHEETS_ENABLED:
+        logger.debug("SHEETS_ENABLED=false: no se exporta '%s'", tab_name)
+        return
+    if SHEET_INCREMENTAL and not SHEET_CLEAR:
+        export_to_sheets_incremental(df, config.SHEET_BONOS_ID, tab_name, 1, 1, key=key)
+    else:
+        export_to_sheets_simple(SHEET_CLEAR, df, config.SHEET_BONOS_ID, tab_name, 1, 1)
 
 
 # --------------------
 # Transformaciones
 # --------------------
+# Columnas de puntas que ve la planilla (los nombres historicos vienen del parseo por split)
+PUNTAS_COLUMNS = {
+    "cantidadCompra": "puntas_col1_part2",
+    "precioCompra": "puntas_col2_part2",
+    "precioVenta": "puntas_col3_part2",
+    "cantidadVenta": "puntas_col4_part2",
+}
+
+
+def _puntas_to_frame(puntas: pd.Series) -> pd.DataFrame | None:
+    """Normaliza el payload de puntas (dict, lista de dicts o nulo) a columnas float.
+
+    Devuelve None si ninguna fila trae puntas (igual que el parseo anterior, no agrega columnas).
+    """
+    records = [p[0] if isinstance(p, list) and p else p for p in puntas]
+    records = [r if isinstance(r, dict) else {} for r in records]
+    if not any(records):
+        return None
+    frame = pd.DataFrame.from_records(records, columns=list(PUNTAS_COLUMNS), index=puntas.index)
+    frame = frame.apply(pd.to_numeric, errors="coerce").astype("float64")
+    return frame.rename(columns=PUNTAS_COLUMNS)
+
+
 def transform_bonos(bonos_df: pd.DataFrame) -> pd.DataFrame:
     """Aplica las transformaciones actuales sobre Bonos."""
     if bonos_df.empty:
         return bonos_df
 
+    with metrics.stage("transform", rows=len(bonos_df)):
+        return _transform_bonos(bonos_df)
+
+
+def _transform_bonos(bonos_df: pd.DataFrame) -> pd.DataFrame:
+
     columnas_a_eliminar = [
         "puntas",
-        "puntas_col1",
-        "puntas_col2",
-        "puntas_col3",
-        "puntas_col4",
-        "puntas_col1_part1",
         "precioEjercicio",
         "tipoOpcion",
         "fechaVencimiento",
         "mercado",
-        "puntas_col2_part1",
-        "puntas_col3_part1",
-        "puntas_col4_part1",
     ]
 
+    puntas_df = None
     if "puntas" in bonos_df.columns:
-        bonos_df["puntas"] = bonos_df["puntas"].astype(str)
-        split_columns = bonos_df["puntas"].str.split(",", expand=True)
-
-        for idx, col in enumerate(["puntas_col1", "puntas_col2", "puntas_col3", "puntas_col4"]):
-            if idx in split_columns.columns:
-                bonos_df[col] = split_columns[idx]
-
-        if "puntas_col4" in bonos_df.columns:
-            bonos_df["puntas_col4"] = bonos_df["puntas_col4"].str.replace("}", "", regex=False)
-
-        for i in range(1, 5):
-            col_name = f"puntas_col{i}"
-            if col_name in bonos_df.columns:
-                split_again = bonos_df[col_name].str.split(": ", expand=True)
-                if len(split_again.columns) >= 2:
-                    bonos_df[f"{col_name}_part1"] = split_again[0]
-                    bonos_df[f"{col_name}_part2"] = split_again[1]
+        puntas_df = _puntas_to_frame(bonos_df["puntas"])
     else:
         logger.warning("No 'puntas' column found in bonos_df")
 
-    def convert_to_number(x):
-        if pd.isna(x) or x == "":
-            return None
-        try:
-            x = str(x).strip().replace(",", ".")
-            return float(x)
-        except Exception:
-            return None
-
-    for i in range(1, 5):
-        for j in range(1, 3):
-            col_name = f"puntas_col{i}_part{j}"
-            if col_name in bonos_df.columns:
-                bonos_df[col_name] = bonos_df[col_name].apply(convert_to_number)
-
     columnas_existentes = [col for col in columnas_a_eliminar if col in bonos_df.columns]
     if columnas_existentes:
         bonos_df = bonos_df.drop(columns=columnas_existentes)
 
+    if puntas_df is not None:
+        bonos_df = pd.concat([bonos_df, puntas_df], axis=1)
+
     return bonos_df
 
 
+# --------------------
+# Pipeline (sinks en segundo plano)
+# --------------------
+_pipelines: Dict[Tuple[bool, str], pipeline.Pipeline] = {}
+
+
+def _sink_sheets(snap: pipeline.Snapshot) -> None:
+    export_df_to_sheet(snap.frame, snap.tab, snap.sheet_key)
+
+
+def _sink_tickstore(snap: pipeline.Snapshot) -> None:
+    with metrics.stage("tickstore", dataset=snap.dataset):
+        tickstore.append(snap.dataset, snap.instrument, snap.frame, snap.captured_at)
+
+
+def _sink_csv(snap: pipeline.Snapshot, out_dir: str = PIPELINE_CSV_DIR) -> None:
+    path = Path(out_dir) / f"{snap.tab}.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    snap.frame.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _get_pipeline(with_sheets: bool = SHEETS_ENABLED, csv_dir: str = PIPELINE_CSV_DIR) -> pipeline.Pipeline:
+    """Pipeline con los sinks habilitados; vive entre ciclos cuando scheduler.py corre in-process."""
+    key = (with_sheets, csv_dir)
+    pipe = _pipelines.get(key)
+    if pipe is None:
+        pipe = pipeline.Pipeline("mercado")
+        # Cada sink corre en su hilo: su modulo se carga antes, desde este
+        if with_sheets:
+            lazy.load(sheets)
+            pipe.add_sink("sheets", _sink_sheets)
+        if TICKSTORE_ENABLED:
+            lazy.load(tickstore)
+            pipe.add_sink("tickstore", _sink_tickstore)
+        if csv_dir:
+            pipe.add_sink("csv", lambda snap: _sink_csv(snap, csv_dir))
+        if not pipe.sinks:
+            logger.warning("Sin destinos habilitados (Sheets, tickstore, CSV): los paneles solo se descargan")
+        _pipelines[key] = pipe
+    return pipe
+
+
+def _panel_on_error(errores: List[Exception], instrumento: str, panel_name: str) -> Callable[[Exception], None]:
+    """Falla (o descarte) de un sink: cuenta en el ciclo que publico y el proximo no saltea el panel."""
+
+    def on_error(e: Exception) -> None:
+        errores.append(e)
+        _forget_panel(instrumento, panel_name)
+
+    return on_error
+
+
+def _publish(
+    pipe: pipeline.Pipeline, instrumento: str, panel_name: str, tab: str, df: pd.DataFrame, errores: List[Exception]
+) -> None:
+    snap = pipeline.Snapshot(instrumento.lower(), panel_name, tab, df)
+    # Si un sink falla, el proximo ciclo no debe saltear el panel por "sin cambios"
+    pipe.publish((instrumento, panel_name), snap, on_error=_panel_on_error(errores, instrumento, panel_name))
+
+
+def _publish_fx(pipe: pipeline.Pipeline, panel_name: str, tab: str, bonos_df: pd.DataFrame, errores: List[Exception]) -> None:
+    """MEP/CCL implicitos del panel de bonos a su propia pestaña."""
+    fx_df = implied_fx.compute(bonos_df, bid=PUNTAS_COLUMNS["precioCompra"], ask=PUNTAS_COLUMNS["precioVenta"])
+    if fx_df.empty:
+        logger.info("Sin pares peso/dolar en el panel '%s'. No se exporta FX.", panel_name)
+        return
+    for tipo, st in implied_fx.summary(fx_df).items():
+        logger.info(
+            "%s implicito (%s): mediana=%.2f min=%.2f max=%.2f pares=%s spread medio=%.2f%%",
+            tipo,
+            panel_name,
+            st["mediana"],
+            st["min"],
+            st["max"],
+            st["pares"],
+            st["spread_medio"] * 100,
+        )
+        metrics.gauge(f"fx_{tipo.lower()}_mediana", st["mediana"])
+    snap = pipeline.Snapshot("fx", panel_name, tab, fx_df, sheet_key=implied_fx.FX_KEY)
+    # Si falla la exportacion se vuelve a procesar el panel de bonos del que sale
+    pipe.publish(("FX", panel_name), snap, on_error=_panel_on_error(errores, "Bonos", panel_name))
+
+
+def _publish_bars(pipe: pipeline.Pipeline, frames: Dict[Tuple[str, str], pd.DataFrame], errores: List[Exception]) -> None:
+    """Suma el snapshot de cada panel a sus barras intradiarias y publica las que cerraron.
+
+    Las cerradas en el ciclo van al tickstore (historico). Sheets y CSV reciben la ultima barra
+    cerrada de cada panel/simbolo/intervalo: una tabla estable que se escribe incremental.
+    """
+    now_ms = int(time.time() * 1000)
+    cerradas, ultimas = [], []
+    with metrics.stage("bars") as m:
+        for (instrumento, panel_name), df in frames.items():
+            agg = bars.aggregator(f"{instrumento}/{panel_name}")
+            if not df.empty and {"simbolo", "ultimoPrecio"} <= set(df.columns):
+                agg.update_frame(df["simbolo"], now_ms, df["ultimoPrecio"], df.get("volumen"))
+            agg.close_due(now_ms)
+            closed = agg.drain()
+            if not closed.empty:
+                closed.insert(0, "panel", f"{instrumento}/{panel_name}")
+                cerradas.append(closed)
+            latest = agg.latest_frame()
+            if not latest.empty:
+                latest.insert(0, "panel", f"{instrumento}/{panel_name}")
+                ultimas.append(latest)
+        m["rows"] = sum(len(c) for c in cerradas)
+    if not cerradas:
+        return
+    if "tickstore" in pipe.sinks:
+        snap = pipeline.Snapshot("barras", "iol", SHEET_BARS_TAB, pd.concat(cerradas, ignore_index=True))
+        # Clave fija: si el tickstore se atrasa, las cerradas se juntan en un lote (un lugar en la cola)
+        pipe.publish(("barras", "cerradas"), snap, on_error=errores.append, sinks=["tickstore"], merge=pipeline.concat)
+    otros = [s for s in pipe.sinks if s != "tickstore"]
+    if otros:
+        snap = pipeline.Snapshot(
+            "barras", "iol", SHEET_BARS_TAB, pd.concat(ultimas, ignore_index=True), sheet_key=("panel", "simbolo", "intervalo")
+        )
+        pipe.publish(("barras",), snap, on_error=errores.append, sinks=otros)
+
+
+def _resolve_acciones_paneles(access_token: str) -> List[str]:
+    """Paneles de acciones a descargar: ACCIONES_PANEL (lista separada por comas), cache o descubrimiento."""
+    acciones_panel_env = os.getenv("ACCIONES_PANEL", "").strip()
+
+    if acciones_panel_env:
+        paneles = [p.strip() for p in acciones_panel_env.split(",") if p.strip()]
+        logger.info("Usando ACCIONES_PANEL desde env: %s", ", ".join(paneles))
+        return paneles
+
+    cached_panel = _load_panel_cache()
+    if cached_panel:
+        logger.info("Usando panel cacheado: %s", cached_panel)
+        return [cached_panel]
+
+    paneles_acc = listar_paneles("argentina", "Acciones", access_token)
+    if not paneles_acc:
+        logger.warning("No hay paneles disponibles para Acciones. No se exporta.")
+        return []
+    if "Merval" in paneles_acc:
+        acciones_panel = "Merval"
+    else:
+        acciones_panel = paneles_acc[0]
+    _save_panel_cache(acciones_panel)
+    logger.info("Panel de acciones seleccionado: %s", acciones_panel)
+    return [acciones_panel]
+
+
+def _tab_name(base_tab: str, panel_name: str, idx: int) -> str:
+    """El primer panel usa la pestaña configurada; los adicionales, '<tab>_<panel>'."""
+    return base_tab if idx == 0 else f"{base_tab}_{panel_name}"
+
+
 # --------------------
 # Main flow
 # --------------------
-def main() -> None:
+def main(export: bool = True, csv_dir: str = PIPELINE_CSV_DIR) -> None:
+    """Un ciclo. Con export=False (`fetch`) no se escribe Sheets ni se piden sus credenciales."""
+    with_sheets = export and SHEETS_ENABLED
+    config.require("iol")
+    if with_sheets:
+        config.require("sheets")
+    resilience.load_deadline_from_env()
+    metrics.start_cycle()
+    ok = False
+    try:
+        _cycle(with_sheets, csv_dir)
+        ok = True
+    finally:
+        metrics.end_cycle(ok)
+
+
+def _cycle(with_sheets: bool = SHEETS_ENABLED, csv_dir: str = PIPELINE_CSV_DIR) -> None:
     tk = get_iol_token()
     access_token = tk["access_token"]
 
+    acciones_tab = os.getenv("SHEET_ACCIONES_TAB", "ACCIONES")
+    acciones_paneles = _resolve_acciones_paneles(access_token)
+
+    # --- FETCH (todos los paneles en paralelo) ---
+    specs = [("Bonos", p) for p in BONOS_PANELS] + [("Acciones", p) for p in acciones_paneles]
+    frames = fetch_paneles(specs, access_token)
+    # Miembros de cada panel al maestro de instrumentos (solo escribe si cambiaron)
+    for (instrumento, panel_name), df in frames.items():
+        if not df.empty and df.attrs.get("changed", True) and "simbolo" in df.columns:
+            instrumentos.record_panel(instrumento, panel_name, df["simbolo"])
+
+    pipe = _get_pipeline(with_sheets, csv_dir)
+    # Fallas de lo que publica este ciclo (un sink lento puede fallar con snapshots de otro)
+    errores: List[Exception] = []
+    if BARS_ENABLED:
+        _publish_bars(pipe, frames, errores)
+
     # --- BONOS ---
-    bonos_raw = fetch_bonos(access_token)
-    if bonos_raw.empty:
+    if not BONOS_PANELS or frames[("Bonos", BONOS_PANELS[0])].empty:
         logger.error("No llegaron datos de Bonos (result vacio). No se exporta.")
         return
-    bonos_df = transform_bonos(bonos_raw)
-    export_df_to_sheet(bonos_df, SHEET_BONOS_TAB)
+    for idx, panel_name in enumerate(BONOS_PANELS):
+        bonos_raw = frames[("Bonos", panel_name)]
+        if bonos_raw.empty:
+            logger.warning("Bonos vacio para el panel '%s'. No se exporta.", panel_name)
+            continue
+        if not bonos_raw.attrs.get("changed", True):
+            logger.info("Bonos '%s' sin cambios desde el ultimo ciclo. Se omite transformacion y exportacion.", panel_name)
+            continue
+        try:
+            bonos_df = transform_bonos(bonos_raw)
+            bonos_df = bond_analytics.enrich(bonos_df)
+        except Exception:
+            _forget_panel("Bonos", panel_name)
+            raise
+        _publish(pipe, "Bonos", panel_name, _tab_name(SHEET_BONOS_TAB, panel_name, idx), bonos_df, errores)
+        if FX_ENABLED:
+            _publish_fx(pipe, panel_name, _tab_name(SHEET_FX_TAB, panel_name, idx), bonos_df, errores)
 
     # --- ACCIONES ---
-    acciones_tab = os.getenv("SHEET_ACCIONES_TAB", "ACCIONES")
-    acciones_panel_env = os.getenv("ACCIONES_PANEL", "").strip()
-
-    if acciones_panel_env:
-        acciones_panel = acciones_panel_env
-        logger.info("Usando ACCIONES_PANEL desde env: %s", acciones_panel)
-    else:
-        cached_panel = _load_panel_cache()
-        if cached_panel:
-            acciones_panel = cached_panel
-            logger.info("Usando panel cacheado: %s", acciones_panel)
+    for idx, acciones_panel in enumerate(acciones_paneles):
+        acciones_df = frames[("Acciones", acciones_panel)]
+        logger.info("Acciones con panel '%s': filas=%s cols=%s", acciones_panel, acciones_df.shape[0], acciones_df.shape[1])
+
+        if acciones_df.empty:
+            logger.warning("Acciones vacio. No se exporta.")
+        elif not acciones_df.attrs.get("changed", True):
+            logger.info("Acciones '%s' sin cambios desde el ultimo ciclo. Se omite exportacion.", acciones_panel)
         else:
-            paneles_acc = listar_paneles("argentina", "Acciones", access_token)
-            if not paneles_acc:
-                logger.warning("No hay paneles disponibles para Acciones. No se exporta.")
-                return
-            if "Merval" in paneles_acc:
-                acciones_panel = "Merval"
-            else:
-                acciones_panel = paneles_acc[0]
-            _save_panel_cache(acciones_panel)
-            logger.info("Panel de acciones seleccionado: %s", acciones_panel)
-
-    acciones_df = fetch_acciones(access_token, acciones_panel)
-    logger.info("Acciones con panel '%s': filas=%s cols=%s", acciones_panel, acciones_df.shape[0], acciones_df.shape[1])
-
-    if acciones_df.empty:
-        logger.warning("Acciones vacio. No se exporta.")
+            _publish(pipe, "Acciones", acciones_panel, _tab_name(acciones_tab, acciones_panel, idx), acciones_df, errores)
+
+    # Los sinks trabajan en segundo plano; el ciclo espera a que terminen sin pasarse del
+    # deadline. Lo que quede pendiente se coalesce con el snapshot del ciclo siguiente.
+    if not pipe.drain(timeout=min(resilience.remaining(), 3600)):
+        logger.warning("Sinks atrasados al cierre del ciclo: %s", pipe.stats())
+    for sink, st in pipe.stats().items():
+        metrics.gauge(f"pipeline_{sink}_depth", st["depth"])
+        metrics.gauge(f"pipeline_{sink}_coalesced", st["coalesced"])
+        metrics.gauge(f"pipeline_{sink}_dropped", st["dropped"])
+    if errores:
+        raise RuntimeError(f"Fallaron {len(errores)} exportacion(es) en este ciclo (ver log)")
+
+
+# --------------------
+# CLI
+# --------------------
+def check() -> int:
+    """Valida la configuracion de los subsistemas habilitados. No importa pandas ni gspread."""
+    subsystems = ["iol"] + (["sheets"] if SHEETS_ENABLED else []) + (["rofex"] if config.ENABLE_ROFEX else [])
+    estado = config.check(subsystems)
+    for subsystem, error in estado.items():
+        print(f"{subsystem:<8} {'OK' if error is None else error}")
+    return 1 if any(estado.values()) else 0
+
+
+def cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m mercado", description="Ciclo IOL -> Sheets / tickstore / CSV")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("export", help="ciclo completo (default)")
+    p_fetch = sub.add_parser("fetch", help="solo descarga y guarda a disco (tickstore y CSV), sin Sheets")
+    p_fetch.add_argument("--out", default=PIPELINE_CSV_DIR, help="directorio para un CSV por pestaña")
+    sub.add_parser("check", help="valida la configuracion sin conectarse")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "check":
+        return check()
+    if args.cmd == "fetch":
+        main(export=False, csv_dir=args.out)
     else:
-        export_df_to_sheet(acciones_df, acciones_tab)
+        main()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
@@ -0,0 +1,236 @@
+"""Metricas por etapa de cada ciclo del pipeline.
+
+Uso dentro del pipeline:
+    with metrics.stage("fetch", panel="Bonos/BYMA") as m:
+        ...
+        m["rows"] = len(df)
+    metrics.incr("iol_bytes", len(body))
+
+Cada etapa emite una linea JSON en el logger `metrics` (va a mercado.log). Al cerrar el
+ciclo (`end_cycle`) se arma un registro con el total por etapa y los contadores, que se
+agrega a METRICS_FILE (jsonl) y, si METRICS_PROM_FILE esta configurado, se vuelca en
+formato texto de Prometheus (para el textfile collector de node_exporter).
+
+`SessionStats` acumula los registros de una sesion y calcula p50/p95 por etapa; lo usa
+scheduler.py tanto en modo in-process como leyendo METRICS_FILE en modo subprocess.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from config import METRICS_ENABLED, METRICS_FILE, METRICS_PROM_FILE
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cycle: dict | None = None
+_last: dict | None = None
+
+
+def _emit(record: dict) -> None:
+    logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+# --------------------
+# Ciclo
+# --------------------
+def start_cycle() -> None:
+    global _cycle
+    with _lock:
+        _cycle = {"started": time.time(), "t0": time.perf_counter(), "stages": {}, "counters": {}}
+
+
+def end_cycle(ok: bool = True) -> dict | None:
+    """Cierra el ciclo en curso, lo persiste y lo devuelve (None si no habia ciclo)."""
+    global _cycle, _last
+    with _lock:
+        cycle, _cycle = _cycle, None
+    if cycle is None:
+        return None
+
+    record = {
+        "event": "cycle",
+        "started": cycle["started"],
+        "seconds": round(time.perf_counter() - cycle["t0"], 6),
+        "ok": ok,
+        "stages": cycle["stages"],
+        "counters": cycle["counters"],
+    }
+    _last = record
+    if METRICS_ENABLED:
+        _emit(record)
+        _append_jsonl(record)
+        if METRICS_PROM_FILE:
+            _write_prom(record)
+    return record
+
+
+def last_cycle() -> dict | None:
+    return _last
+
+
+# --------------------
+# Etapas y contadores
+# --------------------
+@contextmanager
+def stage(name: str, **labels) -> Iterator[dict]:
+    """Mide una etapa. El dict que devuelve se puede completar (rows, bytes...) y sale en la linea JSON."""
+    extra: dict = {}
+    t0 = time.perf_counter()
+    ok = True
+    try:
+        yield extra
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        with _lock:
+            if _cycle is not None:
+                agg = _cycle["stages"].setdefault(name, {"count": 0, "seconds": 0.0, "max": 0.0})
+                agg["count"] += 1
+                agg["seconds"] = round(agg["seconds"] + seconds, 6)
+                agg["max"] = round(max(agg["max"], seconds), 6)
+                for key, value in extra.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        agg[key] = agg.get(key, 0) + value
+        if METRICS_ENABLED:
+            _emit({"event": "stage", "stage": name, "seconds": round(seconds, 6), "ok": ok, **labels, **extra})
+
+
+def incr(name: str, value: float = 1) -> None:
+    """Suma a un contador del ciclo en curso (reintentos, bytes, filas...)."""
+    with _lock:
+        if _cycle is not None:
+            _cycle["counters"][name] = _cycle["counters"].get(name, 0) + value
+
+
+def gauge(name: str, value: float) -> None:
+    """Fija un valor del ciclo en curso (ej. profundidad de una cola al cierre)."""
+    with _lock:
+        if _cycle is not None:
+            _cycle["counters"][name] = value
+
+
+# --------------------
+# Salidas
+# --------------------
+def _append_jsonl(record: dict) -> None:
+    try:
+        path = Path(METRICS_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except Exception as e:
+        logger.debug("No se pudo escribir %s: %s", METRICS_FILE, e)
+
+
+def _prom_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _write_prom(record: dict) -> None:
+    lines = [
+        "# HELP mercado_cycle_seconds Duracion del ultimo ciclo de mercado.py",
+        "# TYPE mercado_cycle_seconds gauge",
+        f"mercado_cycle_seconds {record['seconds']}",
+        "# TYPE mercado_cycle_ok gauge",
+        f"mercado_cycle_ok {1 if record['ok'] else 0}",
+        "# TYPE mercado_cycle_timestamp_seconds gauge",
+        f"mercado_cycle_timestamp_seconds {record['started']:.3f}",
+        "# HELP mercado_stage_seconds Tiempo total por etapa en el ultimo ciclo",
+        "# TYPE mercado_stage_seconds gauge",
+    ]
+    for name, agg in record["stages"].items():
+        lines.append(f'mercado_stage_seconds{{stage="{name}"}} {agg["seconds"]}')
+    lines.append("# TYPE mercado_stage_count gauge")
+    for name, agg in record["stages"].items():
+        lines.append(f'mercado_stage_count{{stage="{name}"}} {agg["count"]}')
+    for name, value in record["counters"].items():
+        metric = f"mercado_{_prom_name(name)}"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+
+    # Escritura atomica: el collector nunca ve un archivo a medias
+    try:
+        path = Path(METRICS_PROM_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.debug("No se pudo escribir %s: %s", METRICS_PROM_FILE, e)
+
+
+def read_last_cycle(since: float = 0.0, path: str | None = None) -> dict | None:
+    """Ultimo registro de METRICS_FILE iniciado despues de `since` (epoch). Para el modo subprocess."""
+    path = Path(path or METRICS_FILE)
+    if not path.exists():
+        return None
+    try:
+        with path.open("rb") as f:
+            # Alcanza con leer la cola del archivo
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 64 * 1024))
+            lines = f.read().decode("utf-8", errors="replace").splitlines()
+    except OSError:
+        return None
+    for line in reversed(lines):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        return record if record.get("started", 0) >= since else None
+    return None
+
+
+# --------------------
+# Agregado de la sesion
+# --------------------
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+class SessionStats:
+    """Percentiles por etapa sobre los ciclos de una sesion del scheduler."""
+
+    def __init__(self) -> None:
+        self.cycles = 0
+        self.failed = 0
+        self._seconds: Dict[str, List[float]] = {}
+
+    def add(self, record: dict | None) -> None:
+        if not record:
+            return
+        self.cycles += 1
+        if not record.get("ok", True):
+            self.failed += 1
+        self._seconds.setdefault("cycle", []).append(record["seconds"])
+        for name, agg in record.get("stages", {}).items():
+            self._seconds.setdefault(name, []).append(agg["seconds"])
+
+    def summary(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "n": len(values),
+                "p50": round(_percentile(values, 0.5), 4),
+                "p95": round(_percentile(values, 0.95), 4),
+                "max": round(max(values), 4),
+            }
+            for name, values in self._seconds.items()
+        }
+
+    def format(self) -> str:
+        parts = [f"{name} p50={s['p50']:.3f}s p95={s['p95']:.3f}s" for name, s in self.summary().items()]
+        return f"{self.cycles} ciclos ({self.failed} fallidos): " + ", ".join(parts)
@@ -0,0 +1,90 @@
+"""Esquema declarado de los paneles de IOL (Cotizaciones/{instrumento}/{panel}/{pais}).
+
+Se aplica al ingresar el panel (mercado.panel): cada columna declarada toma un dtype
+compacto y estable entre ciclos; las que el esquema no conoce (descripcion, plazo,
+laminaMinima, lote...) pasan tal cual y llegan a la planilla como antes:
+
+- textos repetidos (simbolo, moneda, mercado, tipoOpcion) -> category
+- precios y variaciones -> float64 (float32 alteraria los valores que ve la planilla)
+- volumen y cantidad de operaciones -> Int64 (nullable); si IOL manda decimales, float64
+- fechas -> datetime64 con zona IOL_TZ, parseadas una sola vez (IOL informa hora local de
+  Buenos Aires sin offset; el tickstore las convierte a UTC sin correrlas)
+- puntas queda como objeto (dict/lista) para transform_bonos
+"""
+
+from typing import Dict, List
+
+import pandas as pd
+
+IOL_TZ = "America/Argentina/Buenos_Aires"
+
+PANEL_SCHEMA: Dict[str, str] = {
+    "simbolo": "category",
+    "puntas": "object",
+    "ultimoPrecio": "float64",
+    "variacionPorcentual": "float64",
+    "apertura": "float64",
+    "maximo": "float64",
+    "minimo": "float64",
+    "ultimoCierre": "float64",
+    "volumen": "Int64",
+    "cantidadOperaciones": "Int64",
+    "fecha": "datetime",
+    "tipoOpcion": "category",
+    "precioEjercicio": "float64",
+    "fechaVencimiento": "datetime",
+    "mercado": "category",
+    "moneda": "category",
+}
+
+# transform_bonos descarta estas columnas: no hace falta materializarlas
+_BONOS_DESCARTADAS = ("tipoOpcion", "precioEjercicio", "fechaVencimiento", "mercado")
+
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    "Bonos": {c: t for c, t in PANEL_SCHEMA.items() if c not in _BONOS_DESCARTADAS},
+    "Acciones": PANEL_SCHEMA,
+}
+
+
+def schema_for(instrumento: str) -> Dict[str, str]:
+    return SCHEMAS.get(instrumento, PANEL_SCHEMA)
+
+
+def columns(instrumento: str, available: List[str] | None = None) -> List[str]:
+    """Columnas a materializar: las del payload en su orden, sin las que el instrumento descarta.
+
+    Sin `available` (payload desconocido) devuelve las del esquema.
+    """
+    if available is None:
+        return list(schema_for(instrumento))
+    drop = _BONOS_DESCARTADAS if instrumento == "Bonos" else ()
+    return [c for c in available if c not in drop]
+
+
+def _cast(s: pd.Series, kind: str) -> pd.Series:
+    if kind == "category":
+        return s.astype("category")
+    if kind == "float64":
+        return pd.to_numeric(s, errors="coerce").astype("float64")
+    if kind == "Int64":
+        num = pd.to_numeric(s, errors="coerce").astype("float64")
+        if ((num % 1 == 0) | num.isna()).all():
+            return num.astype("Int64")
+        return num
+    if kind == "datetime":
+        parsed = pd.to_datetime(s, errors="coerce", format="ISO8601")
+        if parsed.dt.tz is None:
+            parsed = parsed.dt.tz_localize(IOL_TZ, ambiguous="NaT", nonexistent="NaT")
+        return parsed
+    return s
+
+
+def apply(df: pd.DataFrame, instrumento: str) -> pd.DataFrame:
+    """Castea las columnas del esquema; las demas pasan sin cambios y en su orden."""
+    if df.empty:
+        return df
+    schema = schema_for(instrumento)
+    out = {col: _cast(df[col], schema[col]) if col in schema else df[col] for col in df.columns}
+    result = pd.DataFrame(out, index=df.index, copy=False)
+    result.attrs = dict(df.attrs)
+    return result
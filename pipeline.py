@@ -0,0 +1,252 @@
+"""Productor/consumidor entre la captura de datos y los destinos lentos (Sheets, tickstore, CSV).
+
+Quien captura publica snapshots con `Pipeline.publish(key, item)` y sigue; cada destino
+("sink") tiene su propia cola y su hilo, asi un Sheets lento no frena ni la captura ni a
+los otros destinos. Las colas coalescen por clave (pestaña, panel, subyacente): si un sink
+se atrasa, de cada clave queda solo el ultimo snapshot pendiente. Ademas estan acotadas
+(PIPELINE_MAX_PENDING claves); si se llenan se descarta la clave pendiente mas vieja y se
+llama a su `on_error` con `Dropped`, igual que si el sink hubiera fallado.
+
+Lo que se acumula en vez de reemplazarse (barras cerradas) se publica con `merge=concat`
+bajo una clave fija: los pendientes se juntan en un solo lote que ocupa un lugar de la
+cola y se escribe entero cuando el sink lo toma.
+
+`stats()` expone profundidad de cola, snapshots coalescidos/descartados y errores por sink.
+Con PIPELINE_ASYNC=false los sinks corren en el mismo hilo que publica (util para depurar).
+"""
+
+import atexit
+import dataclasses
+import datetime as dt
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+import pandas as pd
+
+import metrics
+from config import PIPELINE_ASYNC, PIPELINE_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Snapshot:
+    """Un DataFrame listo para los sinks: dataset/instrument para el tickstore, tab para Sheets/CSV."""
+
+    dataset: str
+    instrument: str
+    tab: str
+    frame: pd.DataFrame
+    captured_at: dt.datetime = field(default_factory=lambda: dt.datetime.now(dt.timezone.utc))
+    # Columnas que identifican cada fila en la escritura incremental de Sheets
+    sheet_key: Tuple[str, ...] = ("simbolo",)
+
+
+class Dropped(Exception):
+    """El snapshot se descarto sin procesar porque la cola del sink estaba llena."""
+
+
+def concat(old: Any, new: Any) -> Any:
+    """`merge` de publish: junta los DataFrames (o Snapshots) pendientes en vez de reemplazarlos."""
+    if isinstance(old, Snapshot):
+        return dataclasses.replace(old, frame=pd.concat([old.frame, new.frame], ignore_index=True))
+    return pd.concat([old, new], ignore_index=True)
+
+
+class CoalescingQueue:
+    """Cola FIFO por clave: un put sobre una clave pendiente reemplaza el item sin cambiar su turno."""
+
+    def __init__(self, maxsize: int = 32) -> None:
+        self.maxsize = max(maxsize, 1)
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._unfinished = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def put(
+        self, key: Hashable, item: Any, merge: Callable[[Any, Any], Any] | None = None
+    ) -> Tuple[Hashable, Any] | None:
+        """Encola `item`; si la clave esta pendiente lo reemplaza (o lo combina con `merge(viejo, nuevo)`).
+
+        Devuelve el (clave, item) desalojado si la cola estaba llena, para avisarle fuera del lock.
+        """
+        evicted = None
+        with self._cond:
+            self.enqueued += 1
+            if key in self._items:
+                self._items[key] = item if merge is None else merge(self._items[key], item)
+                self.coalesced += 1
+                return None
+            if len(self._items) >= self.maxsize:
+                evicted = self._items.popitem(last=False)
+                self._unfinished -= 1
+                self.dropped += 1
+            self._items[key] = item
+            self._unfinished += 1
+            self._cond.notify()
+        return evicted
+
+    def get(self, timeout: float | None = None) -> Tuple[Hashable, Any] | None:
+        """Proximo (clave, item); None si la cola se cerro y quedo vacia (o vencio el timeout)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+            return self._items.popitem(last=False)
+
+    def task_done(self) -> None:
+        with self._cond:
+            self._unfinished -= 1
+            self._cond.notify_all()
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Espera a que se procese todo lo publicado. False si vencio el timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished <= 0, timeout)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class _Sink:
+    def __init__(self, name: str, fn: Callable[[Any], None], maxsize: int) -> None:
+        self.name = name
+        self.fn = fn
+        self.queue = CoalescingQueue(maxsize)
+        self.processed = 0
+        self.errors = 0
+        self.threads: List[threading.Thread] = []
+
+    def run_one(self, key: Hashable, entry: Tuple[Any, Callable | None]) -> None:
+        item, on_error = entry
+        try:
+            self.fn(item)
+            self.processed += 1
+        except Exception as e:
+            self.errors += 1
+            metrics.incr(f"pipeline_{self.name}_errors")
+            logger.error("Sink '%s' fallo con %s: %s", self.name, key, e)
+            self.notify(key, on_error, e)
+
+    def notify(self, key: Hashable, on_error: Callable | None, error: Exception) -> None:
+        if on_error is not None:
+            try:
+                on_error(error)
+            except Exception as cb_error:
+                logger.debug("on_error de %s fallo: %s", key, cb_error)
+
+    def worker(self) -> None:
+        while True:
+            got = self.queue.get()
+            if got is None:
+                return
+            try:
+                self.run_one(*got)
+            finally:
+                self.queue.task_done()
+
+
+class Pipeline:
+    """Fan-out de snapshots a sinks con colas coalescentes y un hilo por sink."""
+
+    def __init__(self, name: str, maxsize: int = PIPELINE_MAX_PENDING, run_async: bool = PIPELINE_ASYNC) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.run_async = run_async
+        self._sinks: Dict[str, _Sink] = {}
+        self._closed = False
+        if run_async:
+            atexit.register(self.close)
+
+    def add_sink(self, name: str, fn: Callable[[Any], None], workers: int = 1) -> None:
+        sink = _Sink(name, fn, self.maxsize)
+        self._sinks[name] = sink
+        if self.run_async:
+            for i in range(max(workers, 1)):
+                t = threading.Thread(target=sink.worker, name=f"{self.name}-{name}-{i}", daemon=True)
+                t.start()
+                sink.threads.append(t)
+
+    @property
+    def sinks(self) -> List[str]:
+        return list(self._sinks)
+
+    def publish(
+        self,
+        key: Hashable,
+        item: Any,
+        on_error: Callable[[Exception], None] | None = None,
+        sinks: Iterable[str] | None = None,
+        merge: Callable[[Any, Any], Any] | None = None,
+    ) -> None:
+        """Entrega el item a todos los sinks (o solo a `sinks`). No bloquea (salvo con PIPELINE_ASYNC=false).
+
+        Con `merge` un item pendiente de la misma clave se combina con el nuevo en vez de reemplazarse.
+        """
+        entry_merge = None
+        if merge is not None:
+            def entry_merge(old, new):
+                return merge(old[0], new[0]), new[1]
+
+        for name, sink in self._sinks.items():
+            if sinks is not None and name not in sinks:
+                continue
+            if self.run_async:
+                evicted = sink.queue.put(key, (item, on_error), entry_merge)
+                if evicted is not None:
+                    old_key, (_, old_on_error) = evicted
+                    logger.warning("Sink '%s' con la cola llena: se descarta %s sin procesar", name, old_key)
+                    sink.notify(old_key, old_on_error, Dropped(f"{name}: {old_key}"))
+            else:
+                sink.run_one(key, (item, on_error))
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """Espera a que los sinks vacien sus colas (timeout total). False si quedo algo pendiente."""
+        deadline = None if timeout is None else time.monotonic() + max(timeout, 0.0)
+        ok = True
+        for sink in self._sinks.values():
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ok = sink.queue.join(left) and ok
+        return ok
+
+    def close(self, timeout: float | None = None) -> None:
+        """Procesa lo pendiente y detiene los hilos (se llama sola al salir del proceso)."""
+        if self._closed:
+            return
+        self._closed = True
+        if not self.drain(timeout):
+            logger.warning("Pipeline '%s' cerrado con snapshots pendientes: %s", self.name, self.stats())
+        for sink in self._sinks.values():
+            sink.queue.close()
+            for t in sink.threads:
+                t.join(1)
+
+    def errors(self) -> int:
+        return sum(s.errors for s in self._sinks.values())
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "depth": len(s.queue),
+                "enqueued": s.queue.enqueued,
+                "coalesced": s.queue.coalesced,
+                "dropped": s.queue.dropped,
+                "processed": s.processed,
+                "errors": s.errors,
+            }
+            for name, s in self._sinks.items()
+        }
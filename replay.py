@@ -0,0 +1,643 @@
+# -*- coding: utf-8 -*-
+"""Grabacion y replay offline de IOL / ROFEX para medir el pipeline sin credenciales.
+
+Fixtures (por defecto en `fixtures/`):
+    iol/<path>.json     body crudo de cada GET a IOL (path con "/" -> "__")
+    cashflows.csv       cronogramas de los bonos sinteticos (CASHFLOWS_FILE, solo `synth`)
+    rofex/md.jsonl      mensajes crudos del WebSocket de Primary, uno por linea
+    rofex/instruments.json  respuesta de /rest/instruments/byCFICode (maestro de instrumentos)
+
+Uso:
+    python replay.py record-iol [--out fixtures]                 (credenciales reales de IOL)
+    python replay.py record-rofex [--symbols DLR/ENE26,DLR/FEB26] [--seconds 60]
+    python replay.py synth [--out fixtures] [--rows 3000]         (fixtures sinteticos)
+    python replay.py serve [--fixtures fixtures] [--latency 0.05] [--fault-rate 0.1] [--ws-rate 200]
+
+`serve` levanta un stand-in HTTP (token IOL, paneles, auth ROFEX) y otro WebSocket
+(market data) en localhost e imprime las variables IOL_BASE_URL / ROFEX_API_URL /
+ROFEX_WS_URL para apuntar mercado.py o API_ROFEX.PY a ellos. `FakeSheetsClient`
+reemplaza a gspread (ver sheets.use_client) y cuenta llamadas y celdas.
+"""
+
+import argparse
+import base64
+import datetime as dt
+import hashlib
+import json
+import random
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+
+FIXTURES_DIR = Path("fixtures")
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _fixture_name(path: str) -> str:
+    return path.split("?", 1)[0].strip("/").replace("/", "__") + ".json"
+
+
+# --------------------
+# Datos sinteticos
+# --------------------
+def synthetic_titulos(rows: int, seed: int = 7, prefix: str = "B") -> List[dict]:
+    """Titulos con la forma de la respuesta de Cotizaciones de IOL (puntas como dict)."""
+    rnd = random.Random(seed)
+    titulos = []
+    for i in range(rows):
+        precio = round(rnd.uniform(50, 150000), 2)
+        puntas = None
+        if rnd.random() > 0.1:
+            puntas = {
+                "cantidadCompra": float(rnd.randint(1, 500000)),
+                "precioCompra": round(precio * 0.995, 2),
+                "precioVenta": round(precio * 1.005, 2),
+                "cantidadVenta": float(rnd.randint(1, 500000)),
+            }
+        titulos.append(
+            {
+                "simbolo": f"{prefix}{i:05d}",
+                "puntas": puntas,
+                "ultimoPrecio": precio,
+                "variacionPorcentual": round(rnd.uniform(-5, 5), 2),
+                "apertura": precio,
+                "maximo": precio * 1.01,
+                "minimo": precio * 0.99,
+                "ultimoCierre": precio,
+                "volumen": float(rnd.randint(0, 10**7)),
+                "cantidadOperaciones": rnd.randint(0, 5000),
+                "fecha": "2025-12-15T16:59:58.12",
+                "tipoOpcion": None,
+                "precioEjercicio": 0,
+                "fechaVencimiento": None,
+                "mercado": "1",
+                "moneda": "1",
+                "descripcion": f"Bono sintetico {i}",
+                "plazo": "T1",
+                "laminaMinima": 1,
+                "lote": 1,
+            }
+        )
+    return titulos
+
+
+def synthetic_md(messages: int, symbols: List[str], depth: int = 2, seed: int = 11) -> List[dict]:
+    """Mensajes Md de Primary repartidos entre los simbolos (book, ultimo operado y volumen del dia)."""
+    rnd = random.Random(seed)
+    volumen: Dict[str, int] = {}
+    out = []
+    for n in range(messages):
+        mid = 1000 + rnd.uniform(-5, 5)
+        symbol = symbols[n % len(symbols)]
+        volumen[symbol] = volumen.get(symbol, 0) + rnd.randint(0, 50)
+        out.append(
+            {
+                "type": "Md",
+                "timestamp": 1718000000000 + n,
+                "instrumentId": {"marketId": "ROFX", "symbol": symbol},
+                "marketData": {
+                    "BI": [{"price": round(mid - 0.5 - i, 2), "size": rnd.randint(1, 500)} for i in range(depth)],
+                    "OF": [{"price": round(mid + 0.5 + i, 2), "size": rnd.randint(1, 500)} for i in range(depth)],
+                    "LA": {"price": round(mid + rnd.uniform(-0.5, 0.5), 2), "size": rnd.randint(1, 50)},
+                    "TV": volumen[symbol],
+                },
+            }
+        )
+    return out
+
+
+def synthetic_fx_pairs(titulos: List[dict], mep: float = 1200.0, ccl: float = 1230.0, seed: int = 17) -> List[dict]:
+    """Especies D (MEP) y C (cable) de cada titulo, con precio en dolares = pesos / tipo de cambio +-1%."""
+    rnd = random.Random(seed)
+    out = []
+    for t in titulos:
+        for sufijo, fx in (("D", mep), ("C", ccl)):
+            precio = round(t["ultimoPrecio"] / fx * rnd.uniform(0.99, 1.01), 4)
+            puntas = None
+            if t["puntas"] is not None:
+                puntas = dict(t["puntas"], precioCompra=round(precio * 0.998, 4), precioVenta=round(precio * 1.002, 4))
+            out.append(
+                dict(
+                    t,
+                    simbolo=t["simbolo"] + sufijo,
+                    puntas=puntas,
+                    ultimoPrecio=precio,
+                    apertura=precio,
+                    maximo=precio * 1.01,
+                    minimo=precio * 0.99,
+                    ultimoCierre=precio,
+                    moneda="2",
+                )
+            )
+    return out
+
+
+def synthetic_cashflows(titulos: List[dict], seed: int = 13, start: dt.date | None = None) -> List[dict]:
+    """Cronogramas semestrales (formato de CASHFLOWS_FILE) con valor nominal escalado para que
+    `ultimoPrecio` quede cerca de una TIR entre 5% y 40%. Moneda ARS: aplican al ticker exacto."""
+    rnd = random.Random(seed)
+    start = start or dt.date.today()
+    out = []
+    for t in titulos:
+        pagos = rnd.randint(2, 20)
+        tasa = rnd.uniform(0.0, 0.12) / 2
+        tir = rnd.uniform(0.05, 0.40)
+        # Un pago ya cobrado (para el cupon corrido) y el resto cada ~182 dias
+        fechas = [start + dt.timedelta(days=182 * i - rnd.randint(1, 170)) for i in range(pagos + 1)]
+        saldo, flujos = 1.0, []
+        for fecha in fechas:
+            amort = 1.0 / (pagos + 1)
+            flujos.append((fecha, saldo * tasa, amort))
+            saldo -= amort
+        pv = sum((c + a) / (1 + tir) ** ((f - start).days / 365) for f, c, a in flujos[1:])
+        escala = t["ultimoPrecio"] / pv
+        for fecha, cupon, amort in flujos:
+            out.append(
+                {
+                    "ticker": t["simbolo"],
+                    "fecha": fecha.isoformat(),
+                    "cupon": round(cupon * escala, 6),
+                    "amortizacion": round(amort * escala, 6),
+                    "moneda": "ARS",
+                }
+            )
+    return out
+
+
+def write_cashflows(path: Path, flows: List[dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        f.write("ticker,fecha,cupon,amortizacion,moneda\n")
+        for r in flows:
+            f.write(f"{r['ticker']},{r['fecha']},{r['cupon']},{r['amortizacion']},{r['moneda']}\n")
+
+
+_MESES = ("ENE", "FEB", "MAR", "ABR", "MAY", "JUN", "JUL", "AGO", "SEP", "OCT", "NOV", "DIC")
+
+
+def synthetic_strip(size: int = 5, underlying: str = "DLR", today: dt.date | None = None) -> List[str]:
+    """Contratos mensuales desde el mes actual, con los mismos codigos que instrumentos.py."""
+    today = today or dt.date.today()
+    out = []
+    for i in range(size):
+        year, month = divmod(today.month - 1 + i, 12)
+        out.append(f"{underlying}/{_MESES[month]}{(today.year + year) % 100:02d}")
+    return out
+
+
+def synthetic_instruments(symbols: List[str], cfi: str = "FXXXSX") -> dict:
+    """Respuesta de byCFICode: los futuros del strip mas un pase (que el maestro descarta)."""
+    instruments = [{"instrumentId": {"marketId": "ROFX", "symbol": s}, "cficode": cfi} for s in symbols]
+    if len(symbols) > 1:
+        instruments.append({"instrumentId": {"marketId": "ROFX", "symbol": f"{symbols[0]}/{symbols[1].split('/')[1]}"}, "cficode": cfi})
+    return {"status": "OK", "instruments": instruments}
+
+
+def write_synthetic_fixtures(out: Path, rows: int = 3000) -> None:
+    iol = out / "iol"
+    iol.mkdir(parents=True, exist_ok=True)
+    # Un decimo de los bonos con sus especies D y C, para el MEP/CCL implicito
+    pares = rows // 10
+    bonos = synthetic_titulos(max(rows - 2 * pares, 1), seed=1, prefix="B")
+    panels = {
+        "api/v2/Cotizaciones/Bonos/BYMA/argentina": bonos + synthetic_fx_pairs(bonos[:pares]),
+        "api/v2/Cotizaciones/Acciones/Merval/argentina": synthetic_titulos(max(rows // 30, 1), seed=2, prefix="A"),
+    }
+    for path, titulos in panels.items():
+        (iol / _fixture_name(path)).write_text(json.dumps({"titulos": titulos}), encoding="utf-8")
+    write_cashflows(out / "cashflows.csv", synthetic_cashflows(bonos))
+    (iol / _fixture_name("api/v2/argentina/Titulos/Cotizacion/Paneles/Acciones")).write_text(
+        json.dumps(["Merval", "General"]), encoding="utf-8"
+    )
+
+    rofex = out / "rofex"
+    rofex.mkdir(parents=True, exist_ok=True)
+    symbols = synthetic_strip()
+    (rofex / "instruments.json").write_text(json.dumps(synthetic_instruments(symbols)), encoding="utf-8")
+    with (rofex / "md.jsonl").open("w", encoding="utf-8") as f:
+        for msg in synthetic_md(5000, symbols):
+            f.write(json.dumps(msg) + "\n")
+
+
+# --------------------
+# Grabacion
+# --------------------
+def record_iol(out: Path) -> None:
+    """Guarda los paneles configurados (BONOS_PANELS / ACCIONES_PANEL) tal como los devuelve IOL."""
+    import mercado
+    from config import BONOS_PANELS, IOL_BASE_URL
+
+    tk = mercado.get_iol_token()
+    headers = {"Authorization": f"Bearer {tk['access_token']}"}
+    paths = [f"api/v2/Cotizaciones/Bonos/{p}/argentina" for p in BONOS_PANELS]
+    paths += [f"api/v2/Cotizaciones/Acciones/{p}/argentina" for p in mercado._resolve_acciones_paneles(tk["access_token"])]
+    paths.append("api/v2/argentina/Titulos/Cotizacion/Paneles/Acciones")
+
+    iol = out / "iol"
+    iol.mkdir(parents=True, exist_ok=True)
+    for path in paths:
+        r = mercado._get_session().get(f"{IOL_BASE_URL}/{path}", headers=headers, timeout=30)
+        print(f"GET {path} -> {r.status_code} ({len(r.content)} bytes)")
+        if r.ok:
+            (iol / _fixture_name(path)).write_bytes(r.content)
+
+
+def record_rofex(out: Path, symbols: List[str], seconds: float) -> None:
+    """Graba el maestro de instrumentos y los mensajes crudos del WebSocket de Primary durante `seconds`.
+
+    Sin `symbols` se suscribe al strip activo del maestro.
+    """
+    import requests
+    import websocket as ws
+
+    import instrumentos
+    from config import ROFEX_API_URL, ROFEX_FUTURES_CFI, ROFEX_PASS, ROFEX_USER, ROFEX_WS_URL
+    from rofex_stream import build_smd_message
+
+    r = requests.post(f"{ROFEX_API_URL}/auth/getToken", headers={"X-Username": ROFEX_USER, "X-Password": ROFEX_PASS}, timeout=10)
+    r.raise_for_status()
+    token = r.headers["X-Auth-Token"]
+
+    rofex = out / "rofex"
+    rofex.mkdir(parents=True, exist_ok=True)
+    r = requests.get(
+        f"{ROFEX_API_URL}/rest/instruments/byCFICode",
+        params={"CFICode": ROFEX_FUTURES_CFI},
+        headers={"X-Auth-Token": token},
+        timeout=30,
+    )
+    if r.ok:
+        (rofex / "instruments.json").write_bytes(r.content)
+
+    symbols = symbols or instrumentos.futures_strip(token)
+    conn = ws.create_connection(ROFEX_WS_URL, header={"X-Auth-Token": token}, timeout=1)
+    conn.send(build_smd_message(symbols))
+    count = 0
+    deadline = time.monotonic() + seconds
+    with (rofex / "md.jsonl").open("w", encoding="utf-8") as f:
+        while time.monotonic() < deadline:
+            try:
+                raw = conn.recv()
+            except ws.WebSocketTimeoutException:
+                continue
+            if raw:
+                f.write(raw.strip() + "\n")
+                count += 1
+    conn.close()
+    print(f"{count} mensajes grabados en {rofex / 'md.jsonl'}")
+
+
+# --------------------
+# Stand-in HTTP (IOL + auth ROFEX)
+# --------------------
+class _Faults:
+    def __init__(self, latency: float, fault_rate: float, seed: int) -> None:
+        self.latency = latency
+        self.fault_rate = fault_rate
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def roll(self) -> bool:
+        with self._lock:
+            return self._rnd.random() < self.fault_rate
+
+
+def _make_http_handler(fixtures: Path, faults: _Faults, stats: Dict[str, int]):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002 - firma de BaseHTTPRequestHandler
+            pass
+
+        def _send(self, status: int, body: bytes = b"", headers: Dict[str, str] | None = None) -> None:
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def _prelude(self) -> bool:
+            stats["requests"] = stats.get("requests", 0) + 1
+            if faults.latency:
+                time.sleep(faults.latency)
+            if faults.roll():
+                stats["faults"] = stats.get("faults", 0) + 1
+                status = random.choice((429, 503))
+                self._send(status, b'{"error":"fault injected"}', {"Retry-After": "1", "Content-Type": "application/json"})
+                return False
+            return True
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            if not self._prelude():
+                return
+            if self.path.startswith("/token"):
+                expires = (dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=1)).strftime("%a, %d %b %Y %H:%M:%S GMT")
+                body = json.dumps(
+                    {
+                        "access_token": "standin-access",
+                        "refresh_token": "standin-refresh",
+                        "token_type": "bearer",
+                        ".expires": expires,
+                        ".refreshexpires": expires,
+                    }
+                ).encode()
+                self._send(200, body, {"Content-Type": "application/json"})
+            elif self.path.startswith("/auth/getToken"):
+                self._send(200, b"", {"X-Auth-Token": "standin-rofex"})
+            else:
+                self._send(404)
+
+        def do_GET(self):
+            if not self._prelude():
+                return
+            if self.path.startswith("/rest/instruments/byCFICode"):
+                path = fixtures / "rofex" / "instruments.json"
+            else:
+                path = fixtures / "iol" / _fixture_name(self.path)
+            if not path.exists():
+                self._send(404, b'{"error":"fixture not found"}', {"Content-Type": "application/json"})
+                return
+            body = path.read_bytes()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", {"ETag": etag})
+                return
+            stats["bytes"] = stats.get("bytes", 0) + len(body)
+            self._send(200, body, {"Content-Type": "application/json", "ETag": etag})
+
+    return Handler
+
+
+# --------------------
+# Stand-in WebSocket (market data ROFEX)
+# --------------------
+def _recv_exact(conn: socket.socket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = conn.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("socket cerrado")
+        buf += chunk
+    return buf
+
+
+def _ws_recv_frame(conn: socket.socket) -> tuple:
+    b1, b2 = _recv_exact(conn, 2)
+    length = b2 & 0x7F
+    if length == 126:
+        length = int.from_bytes(_recv_exact(conn, 2), "big")
+    elif length == 127:
+        length = int.from_bytes(_recv_exact(conn, 8), "big")
+    mask = _recv_exact(conn, 4) if b2 & 0x80 else b"\x00\x00\x00\x00"
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(_recv_exact(conn, length)))
+    return b1 & 0x0F, payload
+
+
+def _ws_send_text(conn: socket.socket, text: str) -> None:
+    payload = text.encode("utf-8")
+    header = bytearray([0x81])
+    n = len(payload)
+    if n < 126:
+        header.append(n)
+    elif n < 65536:
+        header.append(126)
+        header += n.to_bytes(2, "big")
+    else:
+        header.append(127)
+        header += n.to_bytes(8, "big")
+    conn.sendall(bytes(header) + payload)
+
+
+def _make_ws_handler(messages: List[dict], rate: float, faults: _Faults, stats: Dict[str, int]):
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            conn = self.request
+            data = b""
+            while b"\r\n\r\n" not in data:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                data += chunk
+            headers = {}
+            for line in data.decode("latin-1").split("\r\n")[1:]:
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+            accept = base64.b64encode(hashlib.sha1((headers.get("sec-websocket-key", "") + _WS_GUID).encode()).digest()).decode()
+            conn.sendall(
+                (
+                    "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                    f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+                ).encode()
+            )
+            stats["ws_connections"] = stats.get("ws_connections", 0) + 1
+
+            # Primer frame del cliente: la suscripcion smd
+            opcode, payload = _ws_recv_frame(conn)
+            if opcode == 0x8:
+                return
+            stats["subscriptions"] = stats.get("subscriptions", 0) + 1
+
+            interval = 1.0 / rate if rate > 0 else 0.0
+            next_send = time.monotonic()
+            i = 0
+            try:
+                while messages:
+                    if faults.roll():
+                        stats["ws_drops"] = stats.get("ws_drops", 0) + 1
+                        return
+                    msg = dict(messages[i % len(messages)])
+                    msg["timestamp"] = int(time.time() * 1000)
+                    _ws_send_text(conn, json.dumps(msg))
+                    stats["ws_messages"] = stats.get("ws_messages", 0) + 1
+                    i += 1
+                    if interval:
+                        next_send += interval
+                        time.sleep(max(0.0, next_send - time.monotonic()))
+            except OSError:
+                return
+
+    return Handler
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StandIn:
+    """Stand-in local de IOL (HTTP) y Primary (HTTP auth + WebSocket) servido desde fixtures."""
+
+    def __init__(
+        self,
+        fixtures: Path = FIXTURES_DIR,
+        latency: float = 0.0,
+        fault_rate: float = 0.0,
+        ws_rate: float = 0.0,
+        ws_drop_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        seed: int = 3,
+    ) -> None:
+        self.fixtures = Path(fixtures)
+        self.stats: Dict[str, int] = {}
+        md_path = self.fixtures / "rofex" / "md.jsonl"
+        messages = []
+        if md_path.exists():
+            with md_path.open("r", encoding="utf-8") as f:
+                messages = [json.loads(line) for line in f if line.strip()]
+        self._http = ThreadingHTTPServer((host, 0), _make_http_handler(self.fixtures, _Faults(latency, fault_rate, seed), self.stats))
+        self._http.daemon_threads = True
+        self._ws = _ThreadingTCPServer((host, 0), _make_ws_handler(messages, ws_rate, _Faults(0.0, ws_drop_rate, seed + 1), self.stats))
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def http_url(self) -> str:
+        host, port = self._http.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def ws_url(self) -> str:
+        host, port = self._ws.server_address[:2]
+        return f"ws://{host}:{port}/"
+
+    def env(self) -> Dict[str, str]:
+        return {"IOL_BASE_URL": self.http_url, "ROFEX_API_URL": self.http_url, "ROFEX_WS_URL": self.ws_url}
+
+    def start(self) -> "StandIn":
+        for server in (self._http, self._ws):
+            t = threading.Thread(target=server.serve_forever, daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self) -> None:
+        for server in (self._http, self._ws):
+            server.shutdown()
+            server.server_close()
+
+
+# --------------------
+# Fake Google Sheets
+# --------------------
+class FakeWorksheet:
+    """Lo minimo de gspread.Worksheet que usan sheets.py y gspread_dataframe."""
+
+    def __init__(self, owner: "FakeSheetsClient", title: str, rows: int = 1000, cols: int = 50) -> None:
+        self._owner = owner
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+
+    def _call(self, cells: int = 0) -> None:
+        self._owner.calls += 1
+        self._owner.cells += cells
+        if self._owner.latency:
+            time.sleep(self._owner.latency)
+
+    def resize(self, rows=None, cols=None):
+        self.row_count = rows or self.row_count
+        self.col_count = cols or self.col_count
+        self._call()
+
+    def add_rows(self, rows):
+        self.row_count += rows
+        self._call()
+
+    def clear(self):
+        self._call()
+
+    def update_cells(self, cell_list, value_input_option=None):
+        self._call(len(cell_list))
+
+    def update(self, values, range_name=None, **kwargs):
+        self._call(sum(len(r) for r in values))
+
+    def batch_update(self, data, **kwargs):
+        self._call(sum(len(r) for d in data for r in d["values"]))
+
+
+class _FakeSpreadsheet:
+    def __init__(self, owner: "FakeSheetsClient") -> None:
+        self._owner = owner
+
+    def worksheet(self, title):
+        self._owner.calls += 1
+        return self._owner.worksheets.setdefault(title, FakeWorksheet(self._owner, title))
+
+    def add_worksheet(self, title, rows=1000, cols=50):
+        self._owner.calls += 1
+        return self._owner.worksheets.setdefault(title, FakeWorksheet(self._owner, title, rows, cols))
+
+
+class FakeSheetsClient:
+    """Reemplazo de gspread.Client: cuenta llamadas a la API y celdas escritas."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls = 0
+        self.cells = 0
+        self.worksheets: Dict[str, FakeWorksheet] = {}
+
+    def open_by_key(self, key):
+        self.calls += 1
+        return _FakeSpreadsheet(self)
+
+
+# --------------------
+# CLI
+# --------------------
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_rec_iol = sub.add_parser("record-iol", help="graba los paneles configurados desde IOL")
+    p_rec_iol.add_argument("--out", type=Path, default=FIXTURES_DIR)
+
+    p_rec_rofex = sub.add_parser("record-rofex", help="graba mensajes del WebSocket de Primary")
+    p_rec_rofex.add_argument("--out", type=Path, default=FIXTURES_DIR)
+    p_rec_rofex.add_argument("--symbols", default="", help="lista separada por comas (default: strip activo)")
+    p_rec_rofex.add_argument("--seconds", type=float, default=60)
+
+    p_synth = sub.add_parser("synth", help="genera fixtures sinteticos")
+    p_synth.add_argument("--out", type=Path, default=FIXTURES_DIR)
+    p_synth.add_argument("--rows", type=int, default=3000)
+
+    p_serve = sub.add_parser("serve", help="levanta el stand-in local")
+    p_serve.add_argument("--fixtures", type=Path, default=FIXTURES_DIR)
+    p_serve.add_argument("--latency", type=float, default=0.0, help="segundos agregados a cada request HTTP")
+    p_serve.add_argument("--fault-rate", type=float, default=0.0, help="probabilidad de 429/503 por request")
+    p_serve.add_argument("--ws-rate", type=float, default=0.0, help="mensajes/s del WebSocket (0 = sin limite)")
+    p_serve.add_argument("--ws-drop-rate", type=float, default=0.0, help="probabilidad de cortar el WebSocket por mensaje")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "record-iol":
+        record_iol(args.out)
+    elif args.cmd == "record-rofex":
+        record_rofex(args.out, [s.strip() for s in args.symbols.split(",") if s.strip()], args.seconds)
+    elif args.cmd == "synth":
+        write_synthetic_fixtures(args.out, args.rows)
+        print(f"Fixtures sinteticos en {args.out}")
+    elif args.cmd == "serve":
+        standin = StandIn(args.fixtures, args.latency, args.fault_rate, args.ws_rate, args.ws_drop_rate).start()
+        for k, v in standin.env().items():
+            print(f"{k}={v}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            standin.stop()
+            print(json.dumps(standin.stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""Reintentos, rate limiting y circuit breaker para las llamadas a IOL, ROFEX y Sheets.
+
+`call(host, fn)` ejecuta `fn()` respetando, para ese host logico ("iol", "rofex", "sheets"):
+- un token bucket (requests por segundo con rafaga acotada);
+- un circuit breaker: despues de CIRCUIT_FAILURES fallas transitorias seguidas se deja de
+  llamar durante CIRCUIT_RESET_SECONDS y luego se prueba con una sola llamada;
+- reintentos con backoff exponencial con jitter ("full jitter") ante 429/5xx o errores de
+  red, respetando `Retry-After` cuando el servidor lo manda;
+- el deadline del ciclo: si la espera del proximo reintento termina despues del deadline
+  (el proximo slot del scheduler) no se reintenta.
+
+`fn` puede devolver una respuesta con `status_code` (requests.Response, CachedResponse):
+si se agotan los reintentos se devuelve la ultima respuesta y el que llama la maneja como
+siempre. Si `fn` levanta una excepcion no transitoria se propaga sin reintentar.
+"""
+
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, TypeVar
+
+import requests
+
+import metrics
+from config import (
+    CIRCUIT_FAILURES,
+    CIRCUIT_RESET_SECONDS,
+    IOL_MAX_WORKERS,
+    IOL_RATE_PER_SEC,
+    RETRY_BASE_SECONDS,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_SECONDS,
+    SHEETS_RATE_PER_MIN,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# El scheduler pasa el deadline del ciclo (epoch) a mercado.py por este env en modo subprocess
+DEADLINE_ENV = "MERCADO_DEADLINE"
+
+
+class CircuitOpenError(RuntimeError):
+    """El host tuvo demasiadas fallas seguidas; no se llama hasta que venza el reset."""
+
+
+# --------------------
+# Deadline del ciclo
+# --------------------
+_deadline: float | None = None
+
+
+def set_deadline(at: float | None) -> None:
+    """Fija el deadline del ciclo como epoch (time.time()); None lo quita."""
+    global _deadline
+    _deadline = at
+
+
+def load_deadline_from_env() -> None:
+    value = os.getenv(DEADLINE_ENV)
+    if value:
+        try:
+            set_deadline(float(value))
+        except ValueError:
+            logger.warning("%s invalido: %s", DEADLINE_ENV, value)
+
+
+def remaining() -> float:
+    """Segundos hasta el deadline (infinito si no hay)."""
+    return float("inf") if _deadline is None else _deadline - time.time()
+
+
+# --------------------
+# Token bucket y circuit breaker
+# --------------------
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Toma un token esperando lo necesario. Devuelve los segundos esperados."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int, reset_seconds: float) -> None:
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._count = 0
+        self._opened_at: float | None = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            # Half-open: vencido el reset se deja pasar una sola llamada de prueba
+            if not self._trial and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._trial = True
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self._count = 0
+            self._opened_at = None
+            self._trial = False
+
+    def abort_trial(self) -> None:
+        """La llamada de prueba termino en un error no transitorio: se vuelve a abrir por otro reset.
+
+        Sin esto `_trial` quedaria en True y `allow()` no dejaria pasar ninguna llamada mas.
+        """
+        with self._lock:
+            if self._trial:
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def failure(self) -> bool:
+        """Registra una falla transitoria. Devuelve True si el circuito se acaba de abrir."""
+        with self._lock:
+            self._count += 1
+            if self._trial or (self._opened_at is None and self._count >= self.failures):
+                self._opened_at = time.monotonic()
+                self._trial = False
+                return True
+            return False
+
+
+class _Host:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(CIRCUIT_FAILURES, CIRCUIT_RESET_SECONDS)
+
+
+_hosts: Dict[str, _Host] = {}
+_hosts_lock = threading.Lock()
+
+
+def _host(name: str) -> _Host:
+    with _hosts_lock:
+        host = _hosts.get(name)
+        if host is None:
+            if name == "iol":
+                host = _Host(IOL_RATE_PER_SEC, max(IOL_MAX_WORKERS, 1))
+            elif name == "sheets":
+                # Cuota de escritura de Sheets por minuto; se permite una rafaga corta
+                host = _Host(SHEETS_RATE_PER_MIN / 60.0, 10)
+            else:
+                host = _Host(1.0, 3)
+            _hosts[name] = host
+        return host
+
+
+# --------------------
+# Reintentos
+# --------------------
+def _retry_after(headers) -> float | None:
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _headers_of(obj):
+    headers = getattr(obj, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(obj, "response", None), "headers", None)
+    return headers
+
+
+def _transient_exception(e: Exception) -> bool:
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return True
+    # requests.HTTPError y gspread APIError traen la respuesta
+    return getattr(getattr(e, "response", None), "status_code", None) in RETRYABLE_STATUS
+
+
+def backoff(attempt: int) -> float:
+    """Espera del reintento `attempt` (1, 2, ...): uniforme entre 0 y base * 2^(attempt-1), acotada."""
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempt - 1)))
+
+
+def call(host: str, fn: Callable[[], T], what: str = "") -> T:
+    """Ejecuta fn() con rate limit, circuit breaker y reintentos para el host logico."""
+    h = _host(host)
+    what = what or host
+    attempt = 0
+    while True:
+        attempt += 1
+        if not h.breaker.allow():
+            metrics.incr(f"{host}_circuit_rejected")
+            raise CircuitOpenError(f"Circuito abierto para {host}: se omite {what}")
+
+        waited = h.bucket.acquire()
+        if waited:
+            metrics.incr(f"{host}_throttled_seconds", waited)
+
+        result = None
+        error: Exception | None = None
+        try:
+            result = fn()
+        except Exception as e:
+            if not _transient_exception(e):
+                h.breaker.abort_trial()
+                raise
+            error = e
+
+        status = getattr(result, "status_code", None) if error is None else None
+        if error is None and status not in RETRYABLE_STATUS:
+            h.breaker.success()
+            return result
+
+        if h.breaker.failure():
+            metrics.incr(f"{host}_circuit_opened")
+            logger.error("Circuito abierto para %s despues de fallas seguidas (%s s de pausa)", host, CIRCUIT_RESET_SECONDS)
+
+        reason = str(error) if error is not None else f"HTTP {status}"
+        wait = _retry_after(_headers_of(error if error is not None else result))
+        if wait is None:
+            wait = backoff(attempt)
+        if attempt >= RETRY_MAX_ATTEMPTS or wait >= remaining() or h.breaker.is_open:
+            if wait >= remaining():
+                logger.warning("%s fallo (%s) y no queda tiempo antes del proximo slot para reintentar", what, reason)
+            else:
+                logger.warning("%s fallo (%s) despues de %s intento(s)", what, reason, attempt)
+            if error is not None:
+                raise error
+            return result
+
+        metrics.incr(f"{host}_retries")
+        logger.warning("%s fallo (%s). Reintento %s de %s en %.1fs", what, reason, attempt, RETRY_MAX_ATTEMPTS - 1, wait)
+        time.sleep(wait)
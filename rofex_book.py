@@ -0,0 +1,124 @@
+"""Order books de ROFEX en arrays numericos preasignados.
+
+Cada simbolo ocupa una fila fija en matrices (simbolos x profundidad) de precio y tamaño
+para bids (BI) y offers (OF). Las actualizaciones de `marketData` escriben en el lugar;
+el DataFrame se arma solo cuando se exporta o se toma un snapshot.
+"""
+
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+FRAME_COLUMNS = ["timestamp", "BI_size", "BI_price", "OF_price", "OF_size"]
+
+
+class BookStore:
+    """Books de profundidad fija por simbolo. No es thread-safe: el que escribe sincroniza."""
+
+    __slots__ = ("depth", "_index", "_symbols", "bid_px", "bid_sz", "ask_px", "ask_sz", "ts")
+
+    def __init__(self, depth: int = 2, symbols: Iterable[str] = (), capacity: int = 8) -> None:
+        symbols = list(symbols)
+        capacity = max(capacity, len(symbols), 1)
+        self.depth = depth
+        self._index: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self.bid_px = np.full((capacity, depth), np.nan)
+        self.bid_sz = np.full((capacity, depth), np.nan)
+        self.ask_px = np.full((capacity, depth), np.nan)
+        self.ask_sz = np.full((capacity, depth), np.nan)
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        for symbol in symbols:
+            self._row(symbol)
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._index
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._symbols)
+
+    def _row(self, symbol: str) -> int:
+        row = self._index.get(symbol)
+        if row is not None:
+            return row
+        row = len(self._symbols)
+        if row == self.ts.shape[0]:
+            self._grow(2 * row)
+        self._index[symbol] = row
+        self._symbols.append(symbol)
+        return row
+
+    def _grow(self, capacity: int) -> None:
+        def _pad(arr: np.ndarray, fill) -> np.ndarray:
+            out = np.full((capacity,) + arr.shape[1:], fill, dtype=arr.dtype)
+            out[: arr.shape[0]] = arr
+            return out
+
+        self.bid_px = _pad(self.bid_px, np.nan)
+        self.bid_sz = _pad(self.bid_sz, np.nan)
+        self.ask_px = _pad(self.ask_px, np.nan)
+        self.ask_sz = _pad(self.ask_sz, np.nan)
+        self.ts = _pad(self.ts, 0)
+
+    # --------------------
+    # Actualizacion
+    # --------------------
+    @staticmethod
+    def _fill(px: np.ndarray, sz: np.ndarray, levels: list, depth: int) -> None:
+        px[:] = np.nan
+        sz[:] = np.nan
+        for i, level in enumerate(levels[:depth]):
+            px[i] = level.get("price", np.nan)
+            sz[i] = level.get("size", np.nan)
+
+    def update(self, symbol: str, market_data: dict, timestamp) -> None:
+        """Aplica un `marketData` de Primary. Un lado ausente en el mensaje no se toca."""
+        row = self._row(symbol)
+        if "BI" in market_data:
+            self._fill(self.bid_px[row], self.bid_sz[row], market_data["BI"] or [], self.depth)
+        if "OF" in market_data:
+            self._fill(self.ask_px[row], self.ask_sz[row], market_data["OF"] or [], self.depth)
+        self.ts[row] = int(timestamp or 0)
+
+    # --------------------
+    # Lectura
+    # --------------------
+    def top(self, symbol: str) -> tuple:
+        """(timestamp_ms, mejor bid, mejor offer) del simbolo."""
+        row = self._index[symbol]
+        return int(self.ts[row]), float(self.bid_px[row, 0]), float(self.ask_px[row, 0])
+
+    def copy(self) -> "BookStore":
+        clone = BookStore.__new__(BookStore)
+        clone.depth = self.depth
+        clone._index = dict(self._index)
+        clone._symbols = list(self._symbols)
+        n = len(self._symbols)
+        clone.bid_px = self.bid_px[:n].copy()
+        clone.bid_sz = self.bid_sz[:n].copy()
+        clone.ask_px = self.ask_px[:n].copy()
+        clone.ask_sz = self.ask_sz[:n].copy()
+        clone.ts = self.ts[:n].copy()
+        return clone
+
+    def to_frame(self, symbol: str) -> pd.DataFrame:
+        """Book del simbolo con las columnas que exporta API_ROFEX."""
+        row = self._index[symbol]
+        return pd.DataFrame(
+            {
+                "timestamp": pd.to_datetime(np.full(self.depth, self.ts[row] / 1000), unit="s"),
+                "BI_size": self.bid_sz[row],
+                "BI_price": self.bid_px[row],
+                "OF_price": self.ask_px[row],
+                "OF_size": self.ask_sz[row],
+            },
+            columns=FRAME_COLUMNS,
+        )
+
+    def to_frames(self) -> Dict[str, pd.DataFrame]:
+        return {symbol: self.to_frame(symbol) for symbol in self._symbols}
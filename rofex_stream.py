@@ -0,0 +1,181 @@
+"""Sesion de market data de ROFEX (Primary) en modo streaming.
+
+Se suscribe una sola vez a todos los simbolos con un unico mensaje `smd` y un hilo en
+segundo plano consume las actualizaciones incrementales sobre un BookStore en memoria
+(ver rofex_book.py). Quien exporta toma snapshots cuando quiere, sin re-suscribir.
+
+Con un BarAggregator (bars.py) cada mensaje actualiza tambien las barras OHLCV/VWAP de su
+simbolo; en ese caso se piden ademas las entradas LA (ultimo operado) y TV (volumen del dia).
+"""
+
+import json
+import logging
+import threading
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import websocket as ws
+
+from bars import BarAggregator
+from rofex_book import BookStore
+
+logger = logging.getLogger(__name__)
+
+
+def build_smd_message(symbols: List[str], depth: int = 2, market_id: str = "ROFX", entries: List[str] | None = None) -> str:
+    """Mensaje de suscripcion a market data para todos los simbolos a la vez."""
+    return json.dumps(
+        {
+            "type": "smd",
+            "level": 1,
+            "entries": entries or ["BI", "OF"],
+            "products": [{"symbol": s, "marketId": market_id} for s in symbols],
+            "depth": depth,
+        }
+    )
+
+
+class MarketDataStream:
+    """Consume el WebSocket de Primary en un hilo y mantiene el ultimo book por simbolo."""
+
+    def __init__(
+        self,
+        token: str,
+        symbols: List[str],
+        url: str,
+        depth: int = 2,
+        market_id: str = "ROFX",
+        recv_timeout: float = 5.0,
+        max_reconnects: int = 5,
+        bars: BarAggregator | None = None,
+    ) -> None:
+        self.token = token
+        self.symbols = list(symbols)
+        self.url = url
+        self.depth = depth
+        self.market_id = market_id
+        self.recv_timeout = recv_timeout
+        self.max_reconnects = max_reconnects
+
+        self.messages = 0
+        self.failed = False
+        self._books = BookStore(depth=depth, symbols=self.symbols)
+        self._bars = bars
+        self.entries = ["BI", "OF", "LA", "TV"] if bars is not None else ["BI", "OF"]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._first_update = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._conn = None
+
+    # --------------------
+    # Ciclo de vida
+    # --------------------
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rofex-md", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._close()
+
+    def _close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _connect(self) -> None:
+        logger.info("Conectando WebSocket %s y suscribiendo %s simbolos...", self.url, len(self.symbols))
+        # El timeout de socket hace que recv() bloquee sin girar la CPU y permite cortar con stop()
+        self._conn = ws.create_connection(self.url, header={"X-Auth-Token": self.token}, timeout=self.recv_timeout)
+        self._conn.send(build_smd_message(self.symbols, self.depth, self.market_id, self.entries))
+
+    def _run(self) -> None:
+        errors = 0
+        while not self._stop.is_set():
+            try:
+                if self._conn is None:
+                    self._connect()
+                raw = self._conn.recv()
+            except ws.WebSocketTimeoutException:
+                continue
+            except Exception as e:
+                self._close()
+                if self._stop.is_set():
+                    break
+                errors += 1
+                logger.warning("WebSocket ROFEX caido (%s). Reconexion %s de %s en 5s...", e, errors, self.max_reconnects)
+                if errors >= self.max_reconnects:
+                    logger.error("Se alcanzo el limite de %s reconexiones. Se detiene el streaming.", self.max_reconnects)
+                    self.failed = True
+                    break
+                self._stop.wait(5)
+                continue
+
+            errors = 0
+            if raw:
+                self.on_message(raw)
+        self._close()
+
+    # --------------------
+    # Mensajes y snapshots
+    # --------------------
+    def on_message(self, raw: str) -> None:
+        try:
+            msg = json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.error("Mensaje ROFEX no es JSON: %s", e)
+            return
+        market_data = msg.get("marketData")
+        symbol = (msg.get("instrumentId") or {}).get("symbol")
+        if market_data is None or symbol is None:
+            logger.debug("Mensaje ROFEX ignorado: %s", str(msg)[:200])
+            return
+        with self._lock:
+            self._books.update(symbol, market_data, msg.get("timestamp"))
+            if self._bars is not None:
+                self._update_bars(symbol, market_data, msg.get("timestamp"))
+            self.messages += 1
+        self._first_update.set()
+
+    def _update_bars(self, symbol: str, market_data: dict, timestamp) -> None:
+        """Ultimo operado y volumen acumulado del dia a las barras.
+
+        Sin `LA` no hay precio operado: el punto medio del book no es una operacion y
+        ensuciaria OHLC y VWAP, asi que solo se acumula el volumen.
+        """
+        last = market_data.get("LA") or {}
+        price = last.get("price")
+        volume = market_data.get("TV")
+        if isinstance(volume, dict):
+            volume = volume.get("size")
+        ts = int(timestamp or 0) or int(last.get("date") or 0)
+        if ts:
+            self._bars.update(symbol, ts, np.nan if price is None else float(price), np.nan if volume is None else float(volume))
+
+    def closed_bars(self, now_ms: int) -> pd.DataFrame:
+        """Cierra las barras vencidas a `now_ms` y devuelve las cerradas sin publicar."""
+        with self._lock:
+            self._bars.close_due(now_ms)
+            return self._bars.drain()
+
+    def snapshot(self) -> BookStore:
+        """Copia consistente de todos los books (se puede leer sin el lock)."""
+        with self._lock:
+            return self._books.copy()
+
+    def snapshot_frames(self) -> Dict[str, pd.DataFrame]:
+        """Books con al menos una actualizacion, como DataFrames listos para exportar."""
+        books = self.snapshot()
+        return {sym: books.to_frame(sym) for sym in books.symbols if books.top(sym)[0] > 0}
+
+    def wait_first_update(self, timeout: float) -> bool:
+        """Espera a tener al menos un book (util antes del primer flush)."""
+        return self._first_update.wait(timeout)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import datetime as dt
+import json
 import logging
 import os
 import subprocess
@@ -12,7 +13,9 @@ try:
 except Exception:
     ZoneInfo = None
 
-from config import MERCADO_EVERY_MIN, MERCADO_END, MERCADO_START
+import metrics
+import resilience
+from config import MERCADO_EVERY_MIN, MERCADO_END, MERCADO_OVERRUN, MERCADO_START, MERCADO_SUBPROCESS
 
 AR_TZ = ZoneInfo("America/Argentina/Buenos_Aires") if ZoneInfo else None
 
@@ -26,6 +29,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+USE_SUBPROCESS = MERCADO_SUBPROCESS or "--subprocess" in sys.argv
+
+# Modulo mercado importado una sola vez (modo in-process)
+_mercado = None
+
+# p50/p95 por etapa de todos los ciclos de la sesion
+_session_stats = metrics.SessionStats()
+
 
 def is_market_hours(now: dt.datetime | None = None) -> bool:
     if now is None:
@@ -41,15 +52,100 @@ def is_market_hours(now: dt.datetime | None = None) -> bool:
     return MERCADO_START <= now.time() <= MERCADO_END
 
 
-def run_mercado() -> None:
+# Los reintentos de un ciclo tienen que terminar este margen antes del proximo slot
+DEADLINE_MARGIN_SECONDS = 5
+
+
+def _run_mercado_subprocess(deadline: float | None) -> None:
+    env = dict(os.environ)
+    if deadline is not None:
+        env[resilience.DEADLINE_ENV] = str(deadline)
+    subprocess.run([sys.executable, "mercado.py"], check=True, env=env)
+
+
+def _run_mercado_inprocess(deadline: float | None) -> None:
+    global _mercado
+    if _mercado is None:
+        t0 = time.perf_counter()
+        import mercado
+
+        _mercado = mercado
+        logger.info("mercado importado en %.2fs (solo la primera vez)", time.perf_counter() - t0)
+    resilience.set_deadline(deadline)
     try:
-        logger.info("Ejecutando mercado.py...")
-        subprocess.run([sys.executable, "mercado.py"], check=True)
+        _mercado.main()
+    finally:
+        resilience.set_deadline(None)
+
+
+def _now() -> dt.datetime:
+    return dt.datetime.now(AR_TZ) if AR_TZ else dt.datetime.now()
+
+
+def slots_for_day(day: dt.date) -> list[dt.datetime]:
+    """Horarios de corrida del dia alineados al reloj: MERCADO_START + k * MERCADO_EVERY_MIN."""
+    step = dt.timedelta(minutes=MERCADO_EVERY_MIN)
+    slot = dt.datetime.combine(day, MERCADO_START, tzinfo=AR_TZ)
+    end = dt.datetime.combine(day, MERCADO_END, tzinfo=AR_TZ)
+    slots = []
+    while slot <= end:
+        slots.append(slot)
+        slot += step
+    return slots
+
+
+def next_slot(after: dt.datetime, inclusive: bool = True) -> dt.datetime | None:
+    """Primer slot de hoy >= after (o > after si inclusive=False). None si ya cerro."""
+    for slot in slots_for_day(after.date()):
+        if slot > after or (inclusive and slot == after):
+            return slot
+    return None
+
+
+def current_slot(now: dt.datetime) -> dt.datetime | None:
+    """Ultimo slot de hoy <= now. None si todavia no abrio."""
+    previos = [slot for slot in slots_for_day(now.date()) if slot <= now]
+    return previos[-1] if previos else None
+
+
+def _sleep_until(target: dt.datetime) -> None:
+    # Dormir en tramos para re-sincronizar con el reloj (suspension, ajuste NTP)
+    while True:
+        remaining = (target - _now()).total_seconds()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, 300))
+
+
+def _collect_metrics(started: float) -> None:
+    # En subprocess el registro del ciclo se lee de METRICS_FILE; in-process queda en memoria
+    record = metrics.read_last_cycle(since=started) if USE_SUBPROCESS else metrics.last_cycle()
+    if record is None or record.get("started", 0) < started:
+        return
+    _session_stats.add(record)
+    logger.info("Metricas de la sesion: %s", _session_stats.format())
+
+
+def run_mercado(next_due: dt.datetime | None = None) -> None:
+    """Corre un ciclo. Con `next_due` (proximo slot) los reintentos no se extienden hasta pisarlo."""
+    modo = "subprocess" if USE_SUBPROCESS else "in-process"
+    started = time.time()
+    t0 = time.perf_counter()
+    deadline = next_due.timestamp() - DEADLINE_MARGIN_SECONDS if next_due is not None else None
+    try:
+        logger.info("Ejecutando mercado.py (%s)...", modo)
+        if USE_SUBPROCESS:
+            _run_mercado_subprocess(deadline)
+        else:
+            _run_mercado_inprocess(deadline)
         logger.info("mercado.py ejecutado exitosamente")
     except subprocess.CalledProcessError as e:
         logger.error("Error al ejecutar mercado.py: %s", str(e))
     except Exception as e:
         logger.error("Error inesperado: %s", str(e))
+    finally:
+        logger.info("Ciclo mercado.py (%s): %.2fs de reloj", modo, time.perf_counter() - t0)
+        _collect_metrics(started)
 
 
 def _is_interactive() -> bool:
@@ -87,6 +183,11 @@ def run_test() -> int:
         ok = is_market_hours(when)
         print(f"{label:14} | {when.isoformat()} | weekday={when.weekday()} | ok={ok}")
 
+    print(f"=== TEST next_slot() cada {MERCADO_EVERY_MIN} min ===")
+    for label, when in cases[2:]:
+        slot = next_slot(when)
+        print(f"{label:14} | {when.isoformat()} | next_slot={slot.strftime('%H:%M') if slot else None}")
+
     return 0
 
 
@@ -95,7 +196,7 @@ def main() -> None:
     if "--test" in sys.argv or os.getenv("RUN_MERCADO_TEST") == "1":
         raise SystemExit(run_test())
 
-    logger.info("Iniciando programador de mercado.py")
+    logger.info("Iniciando programador de mercado.py (modo %s)", "subprocess" if USE_SUBPROCESS else "in-process")
     logger.info(
         "Horario de ejecucion: %s - %s",
         MERCADO_START.strftime("%H:%M"),
@@ -118,31 +219,62 @@ def main() -> None:
             logger.info("No se forzó ejecución. Saliendo.")
             return
 
-    # Loop scheduler normal
+    # Loop scheduler alineado a slots de reloj
+    now = _now()
+    due = current_slot(now) if is_market_hours(now) else next_slot(now)
+    missed_slots: set[dt.datetime] = set()
     while True:
         try:
-            now = dt.datetime.now(AR_TZ) if AR_TZ else dt.datetime.now()
+            now = _now()
 
-            if is_market_hours(now):
-                run_mercado()
-                logger.info("Esperando %s minutos hasta la próxima ejecucion...", MERCADO_EVERY_MIN)
-                time.sleep(MERCADO_EVERY_MIN * 60)
-                continue
-
-            # Fuera de horario: si es finde, cortamos
             if now.weekday() >= 5:
                 logger.info("Fin de semana. Programa finalizado por hoy.")
                 break
 
-            # Antes de abrir: polling cada 60s
-            if now.time() < MERCADO_START:
-                logger.info("Aún no abre el mercado. Revisando cada 60s...")
-                time.sleep(60)
+            if due is None:
+                logger.info(
+                    "Fuera del horario de mercado (%s). Programa finalizado por hoy. Slots perdidos en la sesion: %s",
+                    MERCADO_END.strftime("%H:%M"),
+                    len(missed_slots),
+                )
+                if _session_stats.cycles:
+                    logger.info("Resumen por etapa: %s", json.dumps(_session_stats.summary()))
+                break
+
+            if now < due:
+                if now.time() < MERCADO_START:
+                    logger.info("Aún no abre el mercado. Esperando hasta la apertura (%s)...", due.strftime("%H:%M"))
+                else:
+                    logger.info("Próxima ejecucion en el slot %s", due.strftime("%H:%M"))
+                _sleep_until(due)
                 continue
 
-            # Ya cerró: cortamos
-            logger.info("Fuera del horario de mercado (%s). Programa finalizado por hoy.", MERCADO_END.strftime("%H:%M"))
-            break
+            logger.info("Slot %s: inicio con %.1fs de retraso", due.strftime("%H:%M"), (now - due).total_seconds())
+            following = next_slot(due, inclusive=False)
+            run_mercado(following)
+
+            ended = _now()
+            missed = [slot for slot in slots_for_day(due.date()) if following and following <= slot <= ended]
+            if not missed:
+                due = following
+                continue
+
+            missed_slots.update(missed)
+            logger.warning(
+                "El ciclo del slot %s termino a las %s y se paso de %s slot(s) (politica %s)",
+                due.strftime("%H:%M"),
+                ended.strftime("%H:%M:%S"),
+                len(missed),
+                MERCADO_OVERRUN,
+            )
+            if MERCADO_OVERRUN == "coalesce":
+                # Una sola corrida ya mismo en representacion de todos los slots perdidos
+                due = missed[-1]
+            elif MERCADO_OVERRUN == "immediate":
+                # Corre cada slot perdido uno detras del otro hasta ponerse al dia
+                due = missed[0]
+            else:
+                due = next_slot(ended, inclusive=False)
 
         except KeyboardInterrupt:
             logger.info("Programa detenido por el usuario")
@@ -150,6 +282,7 @@ def main() -> None:
         except Exception as e:
             logger.error("Error en el bucle principal: %s", str(e))
             time.sleep(60)
+            due = next_slot(_now())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,399 @@
+"""Gateway de Google Sheets compartido por mercado.py y API_ROFEX.PY.
+
+Mantiene un unico cliente gspread autorizado por proceso y cachea los handles de
+spreadsheet y worksheet. Ante un error se invalidan los handles de esa planilla para
+que la proxima llamada los vuelva a resolver.
+
+gspread, gspread_dataframe y google-auth se importan recien al primer uso (lazy.py).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import os
+import re
+import threading
+from numbers import Integral, Real
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple, TypeVar
+
+import numpy as np
+import pandas as pd
+
+import config
+import metrics
+import resilience
+from lazy import lazy_import
+
+gspread = lazy_import("gspread")
+gspread_dataframe = lazy_import("gspread_dataframe")
+service_account = lazy_import("google.oauth2.service_account")
+
+logger = logging.getLogger(__name__)
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+SNAPSHOT_DIR = Path(".cache") / "sheets"
+# Las fechas con zona se escriben como hora local de Buenos Aires, sin offset
+SHEETS_TZ = "America/Argentina/Buenos_Aires"
+
+T = TypeVar("T")
+
+_lock = threading.RLock()
+_client: gspread.Client | None = None
+_spreadsheets: Dict[str, gspread.Spreadsheet] = {}
+_worksheets: Dict[Tuple[str, str], gspread.Worksheet] = {}
+
+
+# --------------------
+# Cliente y handles
+# --------------------
+def get_client() -> gspread.Client:
+    """Cliente gspread autorizado una sola vez por proceso."""
+    global _client
+    with _lock:
+        if _client is None:
+            credentials = service_account.Credentials.from_service_account_file(config.GOOGLE_SERVICE_ACCOUNT_JSON, scopes=SCOPES)
+            _client = gspread.authorize(credentials)
+        return _client
+
+
+def use_client(client) -> None:
+    """Reemplaza el cliente (ej. el FakeSheetsClient de replay.py) y descarta los handles cacheados."""
+    global _client
+    with _lock:
+        _client = client
+        invalidate()
+
+
+def get_spreadsheet(sheet_id: str) -> gspread.Spreadsheet:
+    with _lock:
+        sh = _spreadsheets.get(sheet_id)
+        if sh is None:
+            sh = get_client().open_by_key(sheet_id)
+            _spreadsheets[sheet_id] = sh
+        return sh
+
+
+def get_worksheet(sheet_id: str, sheet_name: str, rows: int = 1000, cols: int = 50) -> gspread.Worksheet:
+    """Worksheet cacheada; si la pestaña no existe la crea (una sola vez)."""
+    with _lock:
+        ws = _worksheets.get((sheet_id, sheet_name))
+        if ws is None:
+            sh = get_spreadsheet(sheet_id)
+            try:
+                ws = sh.worksheet(sheet_name)
+            except gspread.WorksheetNotFound:
+                logger.warning("Worksheet '%s' no existe. Creandola...", sheet_name)
+                ws = sh.add_worksheet(title=sheet_name, rows=rows, cols=cols)
+            _worksheets[(sheet_id, sheet_name)] = ws
+        return ws
+
+
+def invalidate(sheet_id: str | None = None) -> None:
+    """Descarta handles cacheados (de una planilla o de todas)."""
+    with _lock:
+        if sheet_id is None:
+            _spreadsheets.clear()
+            _worksheets.clear()
+            return
+        _spreadsheets.pop(sheet_id, None)
+        for key in [k for k in _worksheets if k[0] == sheet_id]:
+            del _worksheets[key]
+
+
+def _is_stale_handle_error(e: Exception) -> bool:
+    if isinstance(e, gspread.WorksheetNotFound):
+        return True
+    if isinstance(e, gspread.exceptions.APIError):
+        return getattr(e.response, "status_code", None) in (400, 404)
+    return False
+
+
+def with_worksheet(sheet_id: str, sheet_name: str, fn: Callable[[gspread.Worksheet], T]) -> T:
+    """Ejecuta fn(worksheet). Ante un error invalida los handles; si el handle estaba
+    vencido (pestaña borrada o recreada) reintenta una vez con handles nuevos."""
+    def _call():
+        # 429/5xx se reintentan con backoff dentro de resilience.call (misma pestaña, mismos datos)
+        return resilience.call("sheets", lambda: fn(get_worksheet(sheet_id, sheet_name)), f"Sheets '{sheet_name}'")
+
+    try:
+        return _call()
+    except Exception as e:
+        invalidate(sheet_id)
+        if not _is_stale_handle_error(e):
+            raise
+        metrics.incr("sheets_retries")
+        logger.warning("Handle de '%s' vencido (%s). Reintentando con handles nuevos.", sheet_name, e)
+        return _call()
+
+
+# --------------------
+# Escritura completa
+# --------------------
+def cell_value(value):
+    """Mismo valor de celda que escribe set_with_dataframe, serializable a JSON."""
+    if pd.isnull(value) is True:
+        return ""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, Integral):
+        return int(value)
+    if isinstance(value, Real):
+        return float(value)
+    return str(value)
+
+
+def _blank_ranges(prev_extent: List[int], new_extent: List[int], fila: int, columna: int) -> List[dict]:
+    """Rangos en blanco para lo que una escritura anterior (filas x columnas) deja fuera de la nueva."""
+    prev_h, prev_w = prev_extent
+    new_h, new_w = new_extent
+    data = []
+    if prev_w > new_w and min(prev_h, new_h) > 0:
+        # Columnas que sobran a la derecha, en las filas que siguen ocupadas
+        start = gspread.utils.rowcol_to_a1(fila, columna + new_w)
+        end = gspread.utils.rowcol_to_a1(fila + min(prev_h, new_h) - 1, columna + prev_w - 1)
+        data.append({"range": f"{start}:{end}", "values": [[""] * (prev_w - new_w)] * min(prev_h, new_h)})
+    if prev_h > new_h and prev_w > 0:
+        start = gspread.utils.rowcol_to_a1(fila + new_h, columna)
+        end = gspread.utils.rowcol_to_a1(fila + prev_h - 1, columna + prev_w - 1)
+        data.append({"range": f"{start}:{end}", "values": [[""] * prev_w] * (prev_h - new_h)})
+    return data
+
+
+def _local_times(df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas datetime con zona -> hora local de SHEETS_TZ sin zona (como se veian antes)."""
+    tz_cols = [c for c in df.columns if isinstance(df[c].dtype, pd.DatetimeTZDtype)]
+    if not tz_cols:
+        return df
+    df = df.copy(deep=False)
+    for c in tz_cols:
+        df[c] = df[c].dt.tz_convert(SHEETS_TZ).dt.tz_localize(None)
+    return df
+
+
+def write_frame(
+    df: pd.DataFrame,
+    sheet_id: str,
+    sheet_name: str,
+    columna: int = 1,
+    fila: int = 1,
+    clear: bool = False,
+    prev_extent: List[int] | None = None,
+) -> None:
+    """Escribe el DataFrame completo (con encabezado) anclado en (fila, columna).
+
+    `prev_extent` ([filas, columnas] de la escritura anterior, encabezado incluido) blanquea
+    lo que quedaria de una escritura mas grande, sin limpiar la hoja entera.
+    """
+    blank = _blank_ranges(prev_extent, [len(df) + 1, df.shape[1]], fila, columna) if prev_extent and not clear else []
+    df = _local_times(df)
+
+    def _write(worksheet: gspread.Worksheet) -> None:
+        if clear:
+            worksheet.clear()
+            logger.info("Hoja '%s' limpiada antes de exportar", sheet_name)
+        gspread_dataframe.set_with_dataframe(
+            worksheet,
+            df,
+            col=columna,
+            row=fila,
+            include_index=False,
+            include_column_header=True,
+        )
+        if blank:
+            worksheet.batch_update(blank, value_input_option="USER_ENTERED")
+
+    with_worksheet(sheet_id, sheet_name, _write)
+
+
+def write_block(sheet_id: str, sheet_name: str, fila: int, columna: int, values: List[list]) -> None:
+    """Escribe una matriz de valores anclada en (fila, columna) en una sola llamada (atomica para lectores)."""
+    if not values:
+        return
+    width = max(len(r) for r in values)
+    values = [list(r) + [""] * (width - len(r)) for r in values]
+    start = gspread.utils.rowcol_to_a1(fila, columna)
+    end = gspread.utils.rowcol_to_a1(fila + len(values) - 1, columna + width - 1)
+
+    def _write(worksheet: gspread.Worksheet) -> None:
+        if worksheet.row_count < fila + len(values) - 1 or worksheet.col_count < columna + width - 1:
+            worksheet.resize(
+                max(worksheet.row_count, fila + len(values) - 1),
+                max(worksheet.col_count, columna + width - 1),
+            )
+        worksheet.update(values, f"{start}:{end}", value_input_option="USER_ENTERED")
+
+    with_worksheet(sheet_id, sheet_name, _write)
+
+
+# --------------------
+# Escritura incremental
+# --------------------
+def _snapshot_path(sheet_id: str, sheet_name: str) -> Path:
+    return SNAPSHOT_DIR / (re.sub(r"[^\w.-]", "_", f"{sheet_id}_{sheet_name}") + ".json")
+
+
+def _load_snapshot(sheet_id: str, sheet_name: str) -> dict:
+    """Ultimo contenido escrito en la pestaña (o {} si no hay o es de otro dia)."""
+    path = _snapshot_path(sheet_id, sheet_name)
+    try:
+        if not path.exists():
+            return {}
+        with path.open("r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        # Una reescritura completa por dia corrige cualquier edicion manual de la planilla
+        if snapshot.get("date") != dt.date.today().isoformat():
+            return {}
+        return snapshot
+    except Exception as e:
+        logger.debug("No se pudo leer snapshot de '%s': %s", sheet_name, e)
+        return {}
+
+
+def _save_snapshot(sheet_id: str, sheet_name: str, snapshot: dict) -> None:
+    try:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        path = _snapshot_path(sheet_id, sheet_name)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({**snapshot, "date": dt.date.today().isoformat()}, f)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.debug("No se pudo guardar snapshot de '%s': %s", sheet_name, e)
+
+
+def _drop_snapshot(sheet_id: str, sheet_name: str) -> None:
+    try:
+        _snapshot_path(sheet_id, sheet_name).unlink(missing_ok=True)
+    except OSError as e:
+        logger.debug("No se pudo borrar snapshot de '%s': %s", sheet_name, e)
+
+
+def _column_cells(s: pd.Series) -> list:
+    """cell_value de una columna completa; vectorizado para float/int numpy y category."""
+    dtype = s.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind == "f":
+        values = s.to_numpy()
+        cells = values.tolist()
+        for i in np.flatnonzero(np.isnan(values)):
+            cells[i] = ""
+        return cells
+    if isinstance(dtype, np.dtype) and dtype.kind in "iu":
+        return s.to_numpy().tolist()
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = [cell_value(v) for v in dtype.categories]
+        return ["" if code < 0 else categories[code] for code in s.cat.codes.tolist()]
+    return [cell_value(v) for v in s.to_numpy(object)]
+
+
+def _frame_rows(df: pd.DataFrame) -> List[list]:
+    if df.shape[1] == 0:
+        return [[] for _ in range(len(df))]
+    df = _local_times(df)
+    columns = [_column_cells(df.iloc[:, j]) for j in range(df.shape[1])]
+    return [list(row) for row in zip(*columns)]
+
+
+def _changed_ranges(prev_rows: List[list], new_rows: List[list], fila: int, columna: int) -> List[dict]:
+    """Un rango por fila con cambios, desde la primera hasta la ultima celda distinta.
+
+    Las filas que desaparecen se blanquean. `fila` es la primera fila de datos en la hoja.
+    """
+    width = max((len(r) for r in prev_rows + new_rows), default=0)
+    data = []
+    for i in range(max(len(prev_rows), len(new_rows))):
+        old = prev_rows[i] if i < len(prev_rows) else []
+        new = new_rows[i] if i < len(new_rows) else []
+        old = old + [""] * (width - len(old))
+        new = new + [""] * (width - len(new))
+        changed = [j for j in range(width) if old[j] != new[j]]
+        if not changed:
+            continue
+        first, last = changed[0], changed[-1]
+        start = gspread.utils.rowcol_to_a1(fila + i, columna + first)
+        end = gspread.utils.rowcol_to_a1(fila + i, columna + last)
+        data.append({"range": f"{start}:{end}", "values": [new[first : last + 1]]})
+    return data
+
+
+def _row_keys(df: pd.DataFrame, key_cols: List[str]) -> List[str]:
+    if len(key_cols) == 1:
+        return [str(k) for k in df[key_cols[0]]]
+    return ["|".join(str(v) for v in row) for row in zip(*(df[c] for c in key_cols))]
+
+
+def write_frame_incremental(
+    df: pd.DataFrame,
+    sheet_id: str,
+    sheet_name: str,
+    columna: int = 1,
+    fila: int = 1,
+    key: str | Sequence[str] = "simbolo",
+    clear: bool = False,
+) -> int:
+    """Escribe solo las celdas que cambiaron desde la ultima escritura, en un unico batch_update.
+
+    Las filas se ubican por `key` (ticker, o varias columnas como simbolo+intervalo): las
+    claves ya escritas mantienen su orden, las nuevas se agregan al final y las filas que
+    sobran se blanquean. Si no hay snapshot del
+    dia, cambian las columnas o la clave no sirve, hace la escritura completa; esa tambien
+    blanquea lo que sobre de la escritura anterior (o limpia la hoja si no se sabe que hay).
+    Devuelve la cantidad de rangos escritos (0 si no hubo cambios, -1 si fue completa).
+    """
+    header = [str(c) for c in df.columns]
+    key_cols = [key] if isinstance(key, str) else list(key)
+    usable_key = set(key_cols) <= set(df.columns) and not df.duplicated(subset=key_cols).any()
+    keys_now = _row_keys(df, key_cols) if usable_key else []
+    prev = _load_snapshot(sheet_id, sheet_name)
+
+    if not usable_key or "keys" not in prev or prev.get("header") != header or prev.get("anchor") != [fila, columna]:
+        prev_extent = None
+        if prev.get("anchor") == [fila, columna]:
+            prev_extent = prev.get("extent") or [len(prev.get("rows", [])) + 1, len(prev.get("header", []))]
+        # Sin clave ni registro de la escritura anterior no hay forma de saber que filas sobran
+        clear_all = clear or (not usable_key and prev_extent is None)
+        try:
+            write_frame(df, sheet_id, sheet_name, columna, fila, clear=clear_all, prev_extent=prev_extent)
+        except Exception:
+            _drop_snapshot(sheet_id, sheet_name)
+            raise
+        snapshot = {"header": header, "anchor": [fila, columna], "extent": [len(df) + 1, len(header)]}
+        if usable_key:
+            snapshot.update({"keys": keys_now, "rows": _frame_rows(df)})
+        _save_snapshot(sheet_id, sheet_name, snapshot)
+        return -1
+
+    # Orden estable: las claves ya escritas mantienen su orden, las nuevas van al final
+    present = set(keys_now)
+    layout = [k for k in prev["keys"] if k in present]
+    known = set(layout)
+    layout += [k for k in keys_now if k not in known]
+
+    by_key = dict(zip(keys_now, _frame_rows(df)))
+    new_rows = [by_key[k] for k in layout]
+    prev_rows = prev["rows"]
+
+    data = _changed_ranges(prev_rows, new_rows, fila + 1, columna)
+    if not data:
+        return 0
+
+    def _write(worksheet: gspread.Worksheet) -> None:
+        needed_rows = fila + max(len(prev_rows), len(new_rows))
+        if worksheet.row_count < needed_rows:
+            worksheet.add_rows(needed_rows - worksheet.row_count)
+        worksheet.batch_update(data, value_input_option="USER_ENTERED")
+
+    try:
+        with_worksheet(sheet_id, sheet_name, _write)
+    except Exception:
+        # Ya no sabemos que quedo en la hoja: la proxima vez se reescribe completa
+        _drop_snapshot(sheet_id, sheet_name)
+        raise
+
+    _save_snapshot(sheet_id, sheet_name, {"header": header, "anchor": [fila, columna], "keys": layout, "rows": new_rows})
+    return len(data)
@@ -0,0 +1,57 @@
+import datetime as dt
+
+import numpy as np
+import pytest
+
+import bond_analytics
+
+SETTLE = dt.date(2026, 1, 1)
+
+CSV = """ticker,fecha,cupon,amortizacion,moneda,emision
+BULLET,2025-07-01,5,0,ARS,
+BULLET,2026-07-01,5,0,ARS,
+BULLET,2027-01-01,5,100,ARS,
+NUEVO,2026-03-01,4,0,ARS,
+NUEVO,2026-09-01,4,100,ARS,
+EMITIDO,2026-03-01,4,0,ARS,2025-10-15
+EMITIDO,2026-09-01,4,100,ARS,
+"""
+
+
+@pytest.fixture
+def tabla(tmp_path, monkeypatch):
+    path = tmp_path / "cashflows.csv"
+    path.write_text(CSV)
+    monkeypatch.setattr(bond_analytics, "CASHFLOWS_FILE", str(path))
+    monkeypatch.setattr(bond_analytics, "_table_key", None)
+    bond_analytics._settled.clear()
+
+
+def _row(simbolo, precio):
+    return bond_analytics.analyze(np.array([simbolo], dtype=object), np.array([precio]), SETTLE).iloc[0]
+
+
+def test_tir_y_duracion_contra_calculo_a_mano(tabla):
+    # Flujos futuros: 5 en 181 dias y 105 en 365 dias; precio a una TIR del 10%
+    t1, t2 = 181 / 365, 1.0
+    pv1, pv2 = 5 / 1.1**t1, 105 / 1.1**t2
+    precio = pv1 + pv2
+    row = _row("BULLET", precio)
+    assert row["tir"] == pytest.approx(0.10, abs=1e-9)
+    assert row["duracion_modificada"] == pytest.approx((t1 * pv1 + t2 * pv2) / precio / 1.1, rel=1e-9)
+    # Cupon corrido: 184 de 365 dias desde el pago del 2025-07-01
+    assert row["valor_tecnico"] == pytest.approx(100 + 5 * 184 / 365)
+    assert row["paridad"] == pytest.approx(precio / row["valor_tecnico"])
+
+
+def test_cupon_corrido_del_primer_periodo_sin_emision(tabla):
+    # Sin pagos previos: el periodo arranca en 2026-03-01 - (2026-09-01 - 2026-03-01) = 2025-08-29
+    inicio = np.datetime64("2026-03-01") - (np.datetime64("2026-09-01") - np.datetime64("2026-03-01"))
+    periodo = (np.datetime64("2026-03-01") - inicio).astype(int)
+    corrido = (np.datetime64(SETTLE) - inicio).astype(int)
+    assert _row("NUEVO", 100)["valor_tecnico"] == pytest.approx(100 + 4 * corrido / periodo)
+
+
+def test_cupon_corrido_del_primer_periodo_desde_la_emision(tabla):
+    # 78 de 137 dias entre la emision (2025-10-15) y el primer cupon (2026-03-01)
+    assert _row("EMITIDO", 100)["valor_tecnico"] == pytest.approx(100 + 4 * 78 / 137)
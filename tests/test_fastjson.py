@@ -0,0 +1,36 @@
+import json
+
+import pandas as pd
+import pytest
+
+import fastjson
+
+TITULOS = [
+    {"simbolo": "AL30", "puntas": {"precioCompra": 71.0}, "ultimoPrecio": 71.5},
+    {"simbolo": "GD30", "ultimoPrecio": 75.0, "plazo": "T1"},
+    {"simbolo": "AE38", "puntas": None, "ultimoPrecio": 80.25, "plazo": "T0"},
+]
+
+
+@pytest.mark.parametrize("batch", [1, 2, 256])
+def test_stream_frame_igual_a_dataframe_de_dicts(batch, monkeypatch):
+    monkeypatch.setattr(fastjson._stream_columns, "__defaults__", (batch,))
+    body = json.dumps({"otro": [1, {"x": 2}], "titulos": TITULOS}).encode()
+    pd.testing.assert_frame_equal(fastjson.stream_frame(body), pd.DataFrame(TITULOS))
+
+
+def test_stream_frame_proyecta_columnas():
+    body = json.dumps({"titulos": TITULOS})
+    df = fastjson.stream_frame(body, keep=lambda c: c != "puntas")
+    pd.testing.assert_frame_equal(df, pd.DataFrame(TITULOS).drop(columns="puntas"))
+
+
+def test_stream_frame_sin_titulos_devuelve_none():
+    assert fastjson.stream_frame(b"[1, 2]") is None
+    assert fastjson.stream_frame(b'{"titulos": null}') is None
+
+
+@pytest.mark.parametrize("body", [b'{"titulos": [{"a": 1}', b'{"titulos": [{"a": 1} {"a": 2}]}', b'{"titulos" [1]}'])
+def test_stream_frame_json_invalido(body):
+    with pytest.raises(ValueError):
+        fastjson.stream_frame(body)
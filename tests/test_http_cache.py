@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+import http_cache
+
+
+class _Response:
+    def __init__(self, status_code=200, body=b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode()
+
+
+class _Session:
+    """Devuelve las respuestas encoladas y guarda los headers de cada GET."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        return self.responses.pop(0)
+
+
+def _body(**data):
+    return json.dumps(data).encode()
+
+
+def test_304_reutiliza_lo_decodificado():
+    cache = http_cache.ResponseCache()
+    session = _Session(
+        _Response(200, _body(titulos=[1]), {"ETag": '"v1"', "Last-Modified": "Mon, 15 Dec 2025 17:00:00 GMT"}),
+        _Response(304),
+    )
+    decoded = []
+
+    def decode(body):
+        decoded.append(body)
+        return json.loads(body)
+
+    first = cache.get_json(session, "u", decode=decode)
+    second = cache.get_json(session, "u", decode=decode)
+
+    assert first.changed and first.data == {"titulos": [1]}
+    assert session.requests[1][1]["If-None-Match"] == '"v1"'
+    assert session.requests[1][1]["If-Modified-Since"] == "Mon, 15 Dec 2025 17:00:00 GMT"
+    assert second.ok and not second.changed and second.from_cache
+    assert second.data is first.data
+    assert len(decoded) == 1 and cache.revalidated == 1
+
+
+def test_body_igual_sin_validadores_no_cambia():
+    cache = http_cache.ResponseCache()
+    session = _Session(_Response(200, _body(titulos=[1])), _Response(200, _body(titulos=[1])), _Response(200, _body(titulos=[2])))
+
+    first = cache.get_json(session, "u")
+    same = cache.get_json(session, "u")
+    other = cache.get_json(session, "u")
+
+    assert "If-None-Match" not in session.requests[1][1]
+    assert not same.changed and same.data is first.data
+    assert other.changed and other.data == {"titulos": [2]}
+    assert (cache.misses, cache.revalidated) == (2, 1)
+
+
+def test_ttl_responde_sin_ir_a_la_red():
+    cache = http_cache.ResponseCache()
+    session = _Session(_Response(200, _body(a=1)))
+    cache.get_json(session, "u", ttl=60)
+    hit = cache.get_json(session, "u", ttl=60)
+    assert hit.from_cache and not hit.changed
+    assert len(session.requests) == 1 and cache.hits == 1
+
+
+def test_desaloja_lo_menos_usado_por_tamano():
+    body = _body(x="a" * 90)  # ~100 bytes
+    cache = http_cache.ResponseCache(max_bytes=2 * len(body) + 10)
+    session = _Session(*[_Response(200, body) for _ in range(3)])
+
+    cache.get_json(session, "a")
+    cache.get_json(session, "b")
+    cache._get("a")  # "a" pasa a ser la mas reciente
+    cache.get_json(session, "c")
+
+    assert len(cache) == 2
+    assert cache._get("b") is None
+    assert cache._get("a") is not None and cache._get("c") is not None
+    assert cache._bytes == 2 * len(body)
+
+
+def test_error_http_no_se_cachea_e_invalidate_olvida():
+    cache = http_cache.ResponseCache()
+    session = _Session(_Response(503, b"caido"), _Response(200, _body(a=1)), _Response(200, _body(a=1)))
+
+    error = cache.get_json(session, "u")
+    assert not error.ok and len(cache) == 0
+
+    cache.get_json(session, "u")
+    cache.invalidate("u")
+    again = cache.get_json(session, "u")
+    assert again.changed
+
+
+def test_json_invalido_se_propaga():
+    cache = http_cache.ResponseCache()
+    with pytest.raises(ValueError):
+        cache.get_json(_Session(_Response(200, b"{no es json")), "u")
+    assert len(cache) == 0
@@ -0,0 +1,67 @@
+import math
+
+import pandas as pd
+import pytest
+
+import implied_fx
+
+# simbolo, ultimo, bid, ask
+PANEL = [
+    ("AL30", 120000.0, 119500.0, 120500.0),
+    ("AL30D", 100.0, 99.0, 101.0),
+    ("AL30C", 96.0, 95.0, 97.0),
+    ("GD30", 130000.0, 129000.0, 131000.0),
+    ("GD30D", 104.0, 103.0, 105.0),
+    ("TX26", 1500.0, 1490.0, 1510.0),  # sin especie en dolares
+    ("XD", 10.0, 9.0, 11.0),  # "X" no existe: no hay par
+    ("AE38D", 70.0, 69.0, 71.0),  # falta la especie en pesos
+]
+
+# bono, tipo, simbolo_usd, ultimo, compra (ask pesos / bid usd), venta (bid pesos / ask usd)
+ESPERADO = [
+    ("AL30", "CCL", "AL30C", 120000 / 96, 120500 / 95, 119500 / 97),
+    ("AL30", "MEP", "AL30D", 120000 / 100, 120500 / 99, 119500 / 101),
+    ("GD30", "MEP", "GD30D", 130000 / 104, 131000 / 103, 129000 / 105),
+]
+
+
+def _panel(rows=PANEL):
+    return pd.DataFrame(rows, columns=["simbolo", "ultimoPrecio", "bid", "ask"])
+
+
+def test_pares_y_cruce_de_puntas():
+    fx = implied_fx.compute(_panel(), bid="bid", ask="ask")
+    assert list(fx.columns) == implied_fx.FX_COLUMNS
+    assert not fx.duplicated(subset=list(implied_fx.FX_KEY)).any()
+    assert len(fx) == len(ESPERADO)
+    for row, (bono, tipo, usd, ultimo, compra, venta) in zip(fx.itertuples(index=False), ESPERADO):
+        assert (row.bono, row.tipo, row.simbolo_usd) == (bono, tipo, usd)
+        assert row.ultimo == pytest.approx(ultimo)
+        assert row.compra == pytest.approx(compra)
+        assert row.venta == pytest.approx(venta)
+        assert row.spread == pytest.approx((compra - venta) / ((compra + venta) / 2))
+
+
+def test_precio_faltante_o_cero_da_nan():
+    rows = [("AL30", 120000.0, 0.0, 120500.0), ("AL30D", None, 99.0, 101.0)]
+    fx = implied_fx.compute(_panel(rows), bid="bid", ask="ask")
+    assert math.isnan(fx["ultimo"].iloc[0])
+    assert math.isnan(fx["venta"].iloc[0])
+    assert fx["compra"].iloc[0] == pytest.approx(120500 / 99)
+
+
+def test_summary_por_tipo():
+    fx = implied_fx.compute(_panel(), bid="bid", ask="ask")
+    st = implied_fx.summary(fx)
+    assert set(st) == {"MEP", "CCL"}
+    assert st["MEP"]["pares"] == 2
+    assert st["MEP"]["mediana"] == pytest.approx((1200 + 130000 / 104) / 2)
+    assert st["MEP"]["min"] == pytest.approx(1200)
+    assert st["CCL"]["max"] == pytest.approx(1250)
+    mep = fx[fx["tipo"] == "MEP"]
+    assert mep["vs_mediana"].tolist() == pytest.approx((mep["ultimo"] / st["MEP"]["mediana"] - 1).tolist())
+
+
+def test_panel_sin_pares():
+    fx = implied_fx.compute(_panel([("TX26", 1500.0, 1490.0, 1510.0)]), bid="bid", ask="ask")
+    assert fx.empty and list(fx.columns) == implied_fx.FX_COLUMNS
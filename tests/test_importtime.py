@@ -0,0 +1,18 @@
+import json
+
+import bench
+
+
+def test_import_mercado_within_budget(tmp_path):
+    # Mejor de 3 para no fallar por ruido de la maquina
+    runs = [bench._importtime("import mercado", tmp_path)["mercado"] / 1000 for _ in range(3)]
+    assert min(runs) <= bench.IMPORT_BUDGET_MS
+
+
+def test_import_mercado_defers_heavy_modules(tmp_path):
+    code = f"import json, sys, mercado; print(json.dumps([m for m in {bench.HEAVY_MODULES!r} if m in sys.modules]))"
+    r, _ = bench._run_clean(["-c", code], tmp_path)
+    assert r.returncode == 0, r.stderr
+    eager = json.loads(r.stdout)
+    assert not {"pandas", "gspread", "pyarrow"} & set(eager)
+    assert eager == []
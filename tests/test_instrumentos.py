@@ -0,0 +1,30 @@
+import datetime as dt
+
+import pandas as pd
+
+import instrumentos
+
+
+def test_record_panel_does_not_clobber_rofex_master(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentos, "CACHE_FILE", tmp_path / "instrumentos.json")
+    monkeypatch.setattr(instrumentos, "PANELES_FILE", tmp_path / "paneles_iol.json")
+    monkeypatch.setattr(instrumentos, "_master", None)
+    hoy = dt.date(2026, 1, 5)
+    viejo = instrumentos.InstrumentMaster(hoy - dt.timedelta(days=1), instrumentos._empty_rofex(), {})
+    instrumentos._save_cache(viejo)
+    instrumentos.record_panel("acciones", "merval", ["GGAL"])  # mercado queda con el maestro de ayer
+
+    # API_ROFEX actualiza el maestro del dia en otro proceso
+    rofex = pd.DataFrame(
+        [{"symbol": "DLR/ENE26", "underlying": "DLR", "maturity": pd.Timestamp("2026-01-30"), "market_id": "ROFX", "cficode": "FXXXSX"}]
+    )
+    instrumentos._save_cache(instrumentos.InstrumentMaster(hoy, rofex, {}))
+
+    instrumentos.record_panel("bonos", "soberanos", ["AL30"])
+
+    monkeypatch.setattr(instrumentos, "_master", None)
+    master = instrumentos.get_master(today=hoy)
+    assert master.fecha == hoy
+    assert list(master.rofex["symbol"]) == ["DLR/ENE26"]
+    assert master.panel_members("acciones", "merval") == ["GGAL"]
+    assert master.panel_members("bonos", "soberanos") == ["AL30"]
@@ -0,0 +1,25 @@
+import pandas as pd
+
+import panel_schema
+import tickstore
+
+
+def test_fecha_de_iol_es_hora_de_buenos_aires():
+    df = panel_schema.apply(pd.DataFrame({"simbolo": ["AL30"], "fecha": ["2025-12-15T16:59:58"]}), "Bonos")
+    assert str(df["fecha"].dt.tz) == panel_schema.IOL_TZ
+    # En el tickstore queda en UTC sin correr la hora: 16:59 en Buenos Aires = 19:59 UTC
+    fecha = tickstore._normalize(df)["fecha"].iloc[0]
+    assert fecha == pd.Timestamp("2025-12-15 19:59:58", tz="UTC")
+
+
+def test_columnas_fuera_del_esquema_pasan_sin_cambios():
+    payload = ["simbolo", "descripcion", "ultimoPrecio", "mercado", "plazo", "laminaMinima", "lote"]
+    cols = panel_schema.columns("Bonos", payload)
+    assert cols == ["simbolo", "descripcion", "ultimoPrecio", "plazo", "laminaMinima", "lote"]
+    df = pd.DataFrame([["AL30", "Bono Rep. Argentina", "71.5", "T1", 1, 1]], columns=cols)
+    out = panel_schema.apply(df, "Bonos")
+    assert list(out.columns) == cols
+    assert out["ultimoPrecio"].dtype == "float64"
+    assert out["simbolo"].dtype == "category"
+    assert out["descripcion"].iloc[0] == "Bono Rep. Argentina"
+    assert out["plazo"].dtype == df["plazo"].dtype
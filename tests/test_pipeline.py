@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pandas as pd
+
+import pipeline
+
+
+def _blocked_pipeline(maxsize: int):
+    gate = threading.Event()
+    seen = []
+
+    def sink(item):
+        gate.wait(5)
+        seen.append(item)
+
+    pipe = pipeline.Pipeline("test", maxsize=maxsize, run_async=True)
+    pipe.add_sink("lento", sink)
+    return pipe, gate, seen
+
+
+def test_barras_se_juntan_sin_desalojar_paneles():
+    pipe, gate, seen = _blocked_pipeline(maxsize=2)
+    pipe.publish("ocupa", "primero")  # el worker lo toma y queda bloqueado
+    while len(pipe._sinks["lento"].queue):
+        time.sleep(0.001)
+    pipe.publish("Bonos", "bonos")
+    for i in range(5):
+        pipe.publish("barras", pd.DataFrame({"n": [i]}), merge=pipeline.concat)
+    gate.set()
+    assert pipe.drain(5)
+    pipe.close()
+
+    assert pipe.stats()["lento"]["dropped"] == 0
+    assert "bonos" in seen
+    barras = [x for x in seen if isinstance(x, pd.DataFrame)]
+    assert len(barras) == 1 and barras[0]["n"].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_cola_llena_avisa_al_descartado():
+    pipe, gate, seen = _blocked_pipeline(maxsize=1)
+    pipe.publish("ocupa", "primero")
+    while len(pipe._sinks["lento"].queue):
+        time.sleep(0.001)
+    errores = []
+    pipe.publish("Bonos", "bonos", on_error=errores.append)
+    pipe.publish("Acciones", "acciones")  # desaloja Bonos
+    gate.set()
+    assert pipe.drain(5)
+    pipe.close()
+
+    assert len(errores) == 1 and isinstance(errores[0], pipeline.Dropped)
+    assert seen == ["primero", "acciones"]
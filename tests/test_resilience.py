@@ -0,0 +1,75 @@
+import time
+
+import pytest
+import requests
+
+import resilience
+
+
+@pytest.fixture
+def host():
+    name = "test-breaker"
+    h = resilience._Host(1000.0, 10)
+    h.breaker = resilience.CircuitBreaker(failures=1, reset_seconds=0.05)
+    resilience._hosts[name] = h
+    yield name
+    resilience._hosts.pop(name, None)
+
+
+def _caida():
+    raise requests.ConnectionError("caido")
+
+
+def _json_invalido():
+    raise ValueError("body no es JSON")
+
+
+def test_trial_con_error_no_transitorio_no_deja_el_circuito_abierto(host):
+    with pytest.raises(requests.ConnectionError):
+        resilience.call(host, _caida)
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.call(host, lambda: "ok")
+
+    time.sleep(0.06)
+    # Llamada de prueba (half-open) que falla con un error no transitorio
+    with pytest.raises(ValueError):
+        resilience.call(host, _json_invalido)
+    # Se vuelve a abrir por otro reset, no para siempre
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.call(host, lambda: "ok")
+
+    time.sleep(0.06)
+    assert resilience.call(host, lambda: "ok") == "ok"
+    assert not resilience._hosts[host].breaker.is_open
+
+
+def test_hit_del_cache_de_iol_no_pasa_por_el_circuito(monkeypatch):
+    import http_cache
+    import mercado
+
+    class _Response:
+        status_code = 200
+        ok = True
+        content = b'{"titulos": []}'
+        headers = {}
+
+    class _Session:
+        calls = 0
+
+        def get(self, url, headers=None, timeout=None):
+            self.calls += 1
+            return _Response()
+
+    session = _Session()
+    monkeypatch.setattr(mercado, "IOL_CACHE_ENABLED", True)
+    monkeypatch.setattr(mercado, "_session", session)
+    monkeypatch.setattr(mercado, "_response_cache", http_cache.ResponseCache())
+    h = resilience._Host(1000.0, 10)
+    monkeypatch.setitem(resilience._hosts, "iol", h)
+
+    url = f"{mercado.IOL_BASE_URL}/api/v2/test"
+    assert mercado._iol_get_json(url, "token", ttl=60).data == {"titulos": []}
+    h.breaker = resilience.CircuitBreaker(failures=1, reset_seconds=60)
+    h.breaker.failure()  # circuito abierto: un GET real se rechazaria
+    assert mercado._iol_get_json(url, "token", ttl=60).from_cache
+    assert session.calls == 1
@@ -0,0 +1,18 @@
+import types
+
+import bars
+import rofex_stream
+
+
+def test_message_without_last_trade_only_adds_volume():
+    store = bars.BarStore(1)
+    stream = types.SimpleNamespace(_bars=store)
+    t0 = 1_767_000_000_000 - 1_767_000_000_000 % 60_000
+    rofex_stream.MarketDataStream._update_bars(stream, "DLR/ENE26", {"LA": {"price": 1500.0}, "TV": 10}, t0)
+    rofex_stream.MarketDataStream._update_bars(stream, "DLR/ENE26", {"LA": {"price": 1510.0}, "TV": 14}, t0 + 1_000)
+    rofex_stream.MarketDataStream._update_bars(stream, "DLR/ENE26", {"TV": 20, "BI": [{"price": 1400.0}]}, t0 + 2_000)
+    store.close_due(t0 + 60_000)
+    bar = store.drain().iloc[0]
+    assert (bar["apertura"], bar["maximo"], bar["minimo"], bar["cierre"]) == (1500.0, 1510.0, 1500.0, 1510.0)
+    assert bar["volumen"] == 10.0
+    assert bar["vwap"] == 1510.0
@@ -0,0 +1,30 @@
+import pandas as pd
+
+import sheets
+
+
+def test_escritura_completa_sin_clave_blanquea_lo_que_sobra(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheets, "SNAPSHOT_DIR", tmp_path)
+    llamadas = []
+    monkeypatch.setattr(sheets, "write_frame", lambda df, *a, **kw: llamadas.append(kw))
+
+    largo = pd.DataFrame({"bono": ["AL30", "AL30", "GD30"], "tipo": ["MEP", "CCL", "MEP"]})
+    sheets.write_frame_incremental(largo, "id", "FX")
+    # Sin registro previo ni clave unica: se limpia la hoja
+    assert llamadas[-1] == {"clear": True, "prev_extent": None}
+
+    sheets.write_frame_incremental(largo.iloc[:1], "id", "FX")
+    assert llamadas[-1] == {"clear": False, "prev_extent": [4, 2]}
+
+
+def test_blank_ranges():
+    assert sheets._blank_ranges([4, 3], [2, 2], 1, 1) == [
+        {"range": "C1:C2", "values": [[""], [""]]},
+        {"range": "A3:C4", "values": [["", "", ""], ["", "", ""]]},
+    ]
+    assert sheets._blank_ranges([2, 2], [4, 3], 1, 1) == []
+
+
+def test_fechas_con_zona_se_escriben_en_hora_local():
+    df = pd.DataFrame({"fecha": pd.to_datetime(["2025-12-15 19:59:58"]).tz_localize("UTC")})
+    assert sheets._frame_rows(df) == [["2025-12-15 16:59:58"]]
@@ -0,0 +1,178 @@
+"""Almacen local de series de tiempo (append-only, columnar).
+
+Cada snapshot se agrega como un archivo Arrow IPC nuevo dentro de
+`TICKSTORE_DIR/<dataset>/date=YYYY-MM-DD/instrument=<instrumento>/`. Los archivos no se
+reescriben nunca (salvo `compact`, que junta los de una particion en uno solo). La
+lectura usa memory-map y filtra por particion (fecha, instrumento) y por simbolo/rango
+de tiempo sobre el scan de pyarrow.dataset.
+
+Datasets que escribe el pipeline:
+    bonos, acciones  -> paneles de IOL (instrument = nombre del panel)
+    rofex_book       -> snapshots del book de ROFEX (instrument = subyacente, ej. DLR)
+    barras           -> barras OHLCV/VWAP cerradas (bars.py; instrument = iol o el subyacente)
+"""
+
+import datetime as dt
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from config import TICKSTORE_DIR
+
+logger = logging.getLogger(__name__)
+
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string()), ("instrument", pa.string())]), flavor="hive")
+_FILESYSTEM = fs.LocalFileSystem(use_mmap=True)
+
+
+def _safe(value: str) -> str:
+    return re.sub(r"[^\w.-]", "_", str(value))
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipos estables entre snapshots para que todos los archivos compartan esquema."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_bool_dtype(s):
+            out[col] = s
+        elif pd.api.types.is_numeric_dtype(s):
+            out[col] = s.astype("float64")
+        elif isinstance(s.dtype, pd.DatetimeTZDtype):
+            out[col] = s.dt.tz_convert("UTC")
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            # Solo llegan sin zona los timestamps de epoch (book de ROFEX), que son UTC; las
+            # fechas de IOL vienen con zona desde panel_schema
+            out[col] = s.dt.tz_localize("UTC")
+        else:
+            # dicts/listas (ej. puntas de acciones) y textos quedan como string
+            out[col] = s.map(lambda v: None if v is None or (isinstance(v, float) and pd.isna(v)) else str(v)).astype("string")
+    return pd.DataFrame(out, index=df.index)
+
+
+def append(dataset: str, instrument: str, df: pd.DataFrame, captured_at: dt.datetime | None = None) -> Path | None:
+    """Agrega un snapshot como archivo nuevo de la particion del dia. Nunca levanta excepciones."""
+    if df is None or df.empty:
+        return None
+    try:
+        captured_at = captured_at or dt.datetime.now(dt.timezone.utc)
+        frame = _normalize(df)
+        frame.insert(0, "captured_at", pd.Timestamp(captured_at).tz_convert("UTC"))
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+
+        part_dir = Path(TICKSTORE_DIR) / dataset / f"date={captured_at.date().isoformat()}" / f"instrument={_safe(instrument)}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        path = part_dir / f"part-{captured_at:%H%M%S%f}-{uuid.uuid4().hex[:8]}.arrow"
+        tmp = path.with_suffix(".tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+        return path
+    except Exception as e:
+        logger.error("No se pudo guardar snapshot en tickstore (%s/%s): %s", dataset, instrument, e)
+        return None
+
+
+def append_frames(dataset: str, instrument: str, frames: Dict[str, pd.DataFrame], captured_at: dt.datetime | None = None) -> Path | None:
+    """Junta DataFrames por simbolo (ej. books de ROFEX) en un solo archivo con columnas simbolo/level."""
+    parts = []
+    for symbol, df in frames.items():
+        if df is None or df.empty:
+            continue
+        part = df.reset_index(drop=True)
+        part.insert(0, "level", range(len(part)))
+        part.insert(0, "simbolo", symbol)
+        parts.append(part)
+    if not parts:
+        return None
+    return append(dataset, instrument, pd.concat(parts, ignore_index=True), captured_at)
+
+
+def _files(dataset: str) -> List[str]:
+    base = Path(TICKSTORE_DIR) / dataset
+    return sorted(str(p) for p in base.glob("date=*/instrument=*/*.arrow")) if base.exists() else []
+
+
+def open_dataset(dataset: str) -> ds.Dataset | None:
+    """Dataset Arrow (memory-mapped) con el esquema unificado de todos los archivos."""
+    files = _files(dataset)
+    if not files:
+        return None
+    base = str(Path(TICKSTORE_DIR) / dataset)
+    factory = ds.FileSystemDatasetFactory(
+        _FILESYSTEM,
+        files,
+        ds.IpcFileFormat(),
+        ds.FileSystemFactoryOptions(partition_base_dir=base, partitioning=PARTITIONING),
+    )
+    schemas = factory.inspect_schemas()
+    schema = pa.unify_schemas(schemas, promote_options="permissive")
+    return factory.finish(schema)
+
+
+def read(
+    dataset: str,
+    symbols: Iterable[str] | None = None,
+    start: dt.datetime | None = None,
+    end: dt.datetime | None = None,
+    instrument: str | None = None,
+    columns: List[str] | None = None,
+) -> pd.DataFrame:
+    """Lee un rango de tiempo/simbolos. Las fechas podan particiones antes de abrir archivos."""
+    data = open_dataset(dataset)
+    if data is None:
+        return pd.DataFrame()
+
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start).tz_convert("UTC") if pd.Timestamp(start).tzinfo else pd.Timestamp(start, tz="UTC")
+        conditions.append(ds.field("date") >= start.date().isoformat())
+        conditions.append(ds.field("captured_at") >= pa.scalar(start.to_pydatetime(), pa.timestamp("ns", tz="UTC")))
+    if end is not None:
+        end = pd.Timestamp(end).tz_convert("UTC") if pd.Timestamp(end).tzinfo else pd.Timestamp(end, tz="UTC")
+        conditions.append(ds.field("date") <= end.date().isoformat())
+        conditions.append(ds.field("captured_at") <= pa.scalar(end.to_pydatetime(), pa.timestamp("ns", tz="UTC")))
+    if instrument is not None:
+        conditions.append(ds.field("instrument") == _safe(instrument))
+    if symbols is not None:
+        conditions.append(pc.is_in(ds.field("simbolo"), pa.array(list(symbols), pa.string())))
+
+    expr = None
+    for cond in conditions:
+        expr = cond if expr is None else expr & cond
+    return data.to_table(columns=columns, filter=expr).to_pandas()
+
+
+def compact(dataset: str, date: dt.date) -> int:
+    """Junta los archivos de cada particion del dia en uno solo. Devuelve cuantos archivos reemplazo."""
+    replaced = 0
+    day_dir = Path(TICKSTORE_DIR) / dataset / f"date={date.isoformat()}"
+    for part_dir in sorted(day_dir.glob("instrument=*")):
+        files = sorted(part_dir.glob("part-*.arrow"))
+        if len(files) < 2:
+            continue
+        tables = []
+        for f in files:
+            # Lectura con copia (sin memory-map) para poder borrar los archivos despues, tambien en Windows
+            with pa.OSFile(str(f), "rb") as source:
+                tables.append(pa.ipc.open_file(source).read_all())
+        table = pa.concat_tables(tables, promote_options="permissive")
+        path = part_dir / f"part-{files[0].stem[5:]}-compact.arrow"
+        tmp = path.with_suffix(".tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+        for f in files:
+            if f != path:
+                f.unlink()
+        replaced += len(files)
+    return replaced